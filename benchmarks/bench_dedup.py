@@ -0,0 +1,68 @@
+"""
+Benchmark of the duplicate detection: contacts with a share of near-duplicates
+(the phone in another formatting, the email in other case, a typo in the name) are blocked, scored and clustered.
+
+run from the project folder: python benchmarks/bench_dedup.py [number of contacts]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "contactbook")]
+
+from dedup import find_duplicates  # noqa: E402
+
+SYLLABLES = ["an", "na", "jo", "hn", "ma", "ri", "ka", "te", "ol", "ga", "ser", "gii", "ev", "ge", "ny", "ly", "vo", "dym"]
+DUPLICATE_SHARE = 0.05
+
+
+def name(generator: random.Random) -> str:
+    return "".join(generator.choice(SYLLABLES) for _ in range(generator.randint(2, 4)))
+
+
+def contact(generator: random.Random) -> dict:
+    digits = str(generator.randrange(10 ** 9, 10 ** 10))
+    firstname, lastname = name(generator), name(generator)
+    return {
+        "firstname": firstname,
+        "lastname": lastname,
+        "phone": f"+38 ({digits[:3]}) {digits[3:6]}-{digits[6:8]}-{digits[8:]}",
+        "birthday": "",
+        "address": "",
+        "email": f"{firstname}.{lastname}@mail.com" if generator.random() < 0.5 else "",
+        "status": "",
+        "note": "",
+    }
+
+
+def duplicate(generator: random.Random, original: dict) -> dict:
+    copy = dict(original)
+    copy["phone"] = "".join(char for char in original["phone"] if char.isdigit())[2:]
+    copy["email"] = original["email"].upper()
+    position = generator.randrange(len(copy["lastname"]))
+    copy["lastname"] = copy["lastname"][:position] + copy["lastname"][position + 1:]
+    return copy
+
+
+def main(count: int):
+    generator = random.Random(1)
+    records = {}
+    for rid in range(count):
+        if rid and generator.random() < DUPLICATE_SHARE:
+            records[rid] = duplicate(generator, records[generator.randrange(rid)])
+        else:
+            records[rid] = contact(generator)
+    start = time.perf_counter()
+    report = find_duplicates(records)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{count:,} contacts: {elapsed:.1f} s, {report.blocks:,} shared blocks, "
+        f"{report.compared:,} pairs compared, {len(report.clusters):,} clusters, "
+        f"{sum(len(cluster) - 1 for cluster in report.clusters):,} duplicates"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,67 @@
+"""
+Benchmark of the typo tolerant name search: time to build the symmetric delete index
+and time per top-10 search, compared with measuring the distance to every name.
+
+run from the project folder: python benchmarks/bench_fuzzy.py [number of contacts]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "contactbook")]
+
+from indexes import FuzzyIndex, edit_distance  # noqa: E402
+
+SYLLABLES = ["an", "na", "jo", "hn", "ma", "ri", "ka", "te", "ol", "ga", "ser", "gii", "ev", "ge", "ny", "ly", "vo", "dym"]
+
+
+def name(generator: random.Random) -> str:
+    return "".join(generator.choice(SYLLABLES) for _ in range(generator.randint(2, 4)))
+
+
+def typo(generator: random.Random, word: str) -> str:
+    position = generator.randrange(len(word))
+    return word[:position] + word[position + 1:]
+
+
+def main(count: int):
+    generator = random.Random(1)
+    records = {
+        rid: {"firstname": name(generator), "lastname": name(generator)}
+        for rid in range(count)
+    }
+    index = FuzzyIndex(["firstname", "lastname"])
+    start = time.perf_counter()
+    index.build(records)
+    print(f"build {count:,} contacts: {time.perf_counter() - start:.1f} s, "
+          f"{len(index.word_counts):,} distinct words, {len(index.deletes):,} variants")
+
+    queries = [typo(generator, records[generator.randrange(count)]["lastname"]) for _ in range(200)]
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, 10)
+    elapsed = (time.perf_counter() - start) / len(queries)
+    print(f"indexed search, one word: {elapsed * 1000:.3f} ms per query")
+
+    pairs = [
+        f"{typo(generator, records[rid]['firstname'])} {records[rid]['lastname']}"
+        for rid in (generator.randrange(count) for _ in range(200))
+    ]
+    start = time.perf_counter()
+    for query in pairs:
+        index.search(query, 10)
+    elapsed = (time.perf_counter() - start) / len(pairs)
+    print(f"indexed search, first and last name: {elapsed * 1000:.3f} ms per query")
+
+    words = list(index.word_counts)
+    start = time.perf_counter()
+    for query in queries[:3]:
+        [word for word in words if edit_distance(query, word, 2) <= 2]
+    elapsed = (time.perf_counter() - start) / 3
+    print(f"scan of all distinct words: {elapsed * 1000:.1f} ms per query")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
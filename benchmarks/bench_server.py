@@ -0,0 +1,85 @@
+"""
+Benchmark of the serve mode: keep-alive clients on threads read contacts by name and search them
+while one client adds contacts, against a server holding a generated contactbook in memory.
+
+run from the project folder: python benchmarks/bench_server.py [number of contacts]
+"""
+import asyncio
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "contactbook")]
+
+from main import BotServer  # noqa: E402
+from server import SERVER_HOST, JsonServer  # noqa: E402
+
+READERS = 8
+DURATION = 5.0
+
+
+def client(port: int, paths, writes: bool, counts: list, stop: threading.Event):
+    connection = http.client.HTTPConnection(SERVER_HOST, port)
+    count = 0
+    while not stop.is_set():
+        if writes:
+            body = json.dumps({"firstname": f"new{count}", "lastname": "writer"})
+            connection.request("POST", "/contacts", body)
+        else:
+            connection.request("GET", paths[count % len(paths)])
+        connection.getresponse().read()
+        count += 1
+    counts.append(count)
+
+
+def main(count: int):
+    os.chdir(tempfile.mkdtemp())
+    bot = BotServer()
+    for i in range(count):
+        bot.contactbook.add({
+            "firstname": f"firstname{i}",
+            "lastname": f"lastname{i}",
+            "phone": f"+38050{i:07d}",
+            "birthday": "",
+            "address": f"street {i}",
+            "email": f"user{i}@mail.com",
+            "status": "friend",
+            "note": "",
+        })
+    generator = random.Random(1)
+    paths = []
+    for _ in range(1000):
+        i = generator.randrange(count)
+        paths.append(f"/contacts/firstname{i}/lastname{i}")
+        paths.append(f"/contacts?parameter=email&pattern=user{i}@&limit=5")
+    server = JsonServer(bot.routes, [(bot.contactbook, bot.contact_file)], save_interval=1.0)
+    ports = []
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(server.serve(0, ports.append),), daemon=True).start()
+    while not ports:
+        time.sleep(0.01)
+    for writers in (0, 1):
+        reads, written, stop = [], [], threading.Event()
+        threads = [threading.Thread(target=client, args=(ports[0], paths, False, reads, stop)) for _ in range(READERS)]
+        threads += [threading.Thread(target=client, args=(ports[0], paths, True, written, stop)) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        print(
+            f"{count:,} contacts, {READERS} readers, {writers} writer: "
+            f"{sum(reads) / DURATION:,.0f} reads/s, {sum(written) / DURATION:,.0f} writes/s"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
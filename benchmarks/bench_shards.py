@@ -0,0 +1,64 @@
+"""
+Benchmark of the sharded contact storage: reading the shards inline and with the process pool,
+and saving one changed contact compared with rewriting the single save file.
+
+run from the project folder: python benchmarks/bench_shards.py [number of contacts]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "contactbook")]
+
+import shards  # noqa: E402
+from main import FIELDS_CONTACT, Contactbook, ShardedContactbook  # noqa: E402
+
+
+def record(i: int) -> dict:
+    return {
+        "firstname": f"firstname{i}",
+        "lastname": f"lastname{i}",
+        "phone": f"+38050{i:07d}",
+        "birthday": "01.01.1990",
+        "address": f"street {i}",
+        "email": f"user{i}@mail.com",
+        "status": "friend",
+        "note": "",
+    }
+
+
+def timed(action) -> float:
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+def main(count: int):
+    os.chdir(tempfile.mkdtemp())
+    sharded = ShardedContactbook()
+    single = Contactbook()
+    books = (("single file", single, "single"), ("sharded", sharded, "sharded"))
+    for name, book, file_name in books:
+        book.data = [record(i) for i in range(count)]
+        book._reindex()
+        book._dirty = None
+        book.save(file_name)
+    _, paths = shards.read_manifest("sharded")
+    shards.POOL_MIN_SIZE = float("inf")
+    inline = timed(lambda: shards.read_shards(paths, FIELDS_CONTACT))
+    shards.POOL_MIN_SIZE = 0
+    pooled = timed(lambda: shards.read_shards(paths, FIELDS_CONTACT))
+    print(
+        f"{count:,} contacts in {sharded.shard_count} shards, {os.cpu_count()} cores: "
+        f"read {inline:.2f} s inline, {pooled:.2f} s with the process pool"
+    )
+    for name, book, file_name in books:
+        book.edit("firstname1", "lastname1", "phone", "0501111111")
+        print(f"{name}: save after one edit {timed(lambda: book.save(file_name)) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,54 @@
+"""
+Memory benchmark of the two Contactbook storage layouts: dictionaries and compact slotted records.
+
+run from the project folder: python benchmarks/bench_storage_memory.py [number of contacts]
+"""
+import sys
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "contactbook")]
+
+from main import Contactbook, RecordContactbook  # noqa: E402
+
+
+def fill(contactbook: Contactbook, count: int):
+    for i in range(count):
+        contactbook.data.append(
+            contactbook._make_record(
+                RecordContactbook(
+                    f"firstname{i}",
+                    f"lastname{i}",
+                    f"+38050{i:07d}",
+                    "01.01.1990",
+                    f"street {i}",
+                    f"user{i}@mail.com",
+                    "friend",
+                    "",
+                )
+            )
+        )
+
+
+def measure(compact: bool, count: int) -> int:
+    tracemalloc.start()
+    contactbook = Contactbook(compact=compact)
+    fill(contactbook, count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dict_size = measure(False, count)
+    compact_size = measure(True, count)
+    print(f"contacts: {count}")
+    print(f"dict records:    {dict_size / 2 ** 20:8.1f} MiB, {dict_size / count:6.0f} B/contact")
+    print(f"slotted records: {compact_size / 2 ** 20:8.1f} MiB, {compact_size / count:6.0f} B/contact")
+    print(f"saved: {(1 - compact_size / dict_size) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark of the full text search of the notebook: notes of words drawn with Zipf frequencies,
+so a few words are in almost every note, are indexed and searched for rare words, common words and phrases.
+
+run from the project folder: python benchmarks/bench_text_search.py [number of notes]
+"""
+import random
+import sys
+import time
+from itertools import accumulate
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "contactbook")]
+
+from main import NoteBook, RecordNotebook  # noqa: E402
+
+VOCABULARY = 20000
+WORDS_PER_NOTE = 30
+QUERIES = ["word5000 word12000", "word17 word250 word9000", "word1 word3", '"word0 word1"', "word0"]
+
+
+def main(count: int):
+    generator = random.Random(1)
+    vocabulary = [f"word{i}" for i in range(VOCABULARY)]
+    weights = list(accumulate(1 / (rank + 1) for rank in range(VOCABULARY)))
+    notebook = NoteBook()
+    start = time.perf_counter()
+    for i in range(count):
+        text = " ".join(generator.choices(vocabulary, cum_weights=weights, k=WORDS_PER_NOTE))
+        notebook.add(RecordNotebook(f"note{i}", text, ""))
+    print(f"{count:,} notes indexed while added in {time.perf_counter() - start:.1f} s")
+    for query in QUERIES:
+        start = time.perf_counter()
+        found = notebook.search_notes(query)
+        print(f"{query}: {(time.perf_counter() - start) * 1000:.1f} ms, {len(found)} notes")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,82 @@
+"""
+Throughput benchmark of contact validation in records per second:
+uncompiled re.match calls as the field classes used to make, the precompiled rules
+checked record by record, and the same rules checked column by column over batches.
+
+run from the project folder: python benchmarks/bench_validation.py [number of contacts]
+"""
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "contactbook")]
+
+from transfer import BATCH_SIZE, batched  # noqa: E402
+from validation import (  # noqa: E402
+    BIRTHDAY_PATTERN,
+    CONTACT_VALIDATOR,
+    EMAIL_PATTERN,
+    NAME_PATTERN,
+    PHONE_PATTERN,
+    STATUS_TYPES,
+)
+
+
+def make_records(count: int) -> list:
+    records = []
+    for i in range(count):
+        records.append(
+            {
+                "firstname": f"firstname{i}",
+                "lastname": f"lastname{i % 1000}",
+                "phone": f"+38050{i:07d}" if i % 10 else "123",
+                "birthday": f"{i % 28 + 1:02d}.{i % 12 + 1:02d}.19{i % 100:02d}",
+                "address": f"street {i}",
+                "email": f"user{i}@mail.com" if i % 3 else "",
+                "status": STATUS_TYPES[i % 4],
+                "note": "",
+            }
+        )
+    return records
+
+
+def uncompiled(record: dict) -> list:
+    errors = []
+    for field, pattern in (
+        ("firstname", NAME_PATTERN),
+        ("lastname", NAME_PATTERN),
+        ("phone", PHONE_PATTERN),
+        ("birthday", BIRTHDAY_PATTERN),
+        ("email", EMAIL_PATTERN),
+    ):
+        value = record[field]
+        if field in ("firstname", "lastname") or value != "":
+            if not re.match(pattern, value):
+                errors.append(f"incorrect {field} - '{value}'")
+    if record["status"] not in STATUS_TYPES:
+        errors.append(f"incorrect status - '{record['status']}'")
+    return errors
+
+
+def measure(name: str, count: int, run):
+    start = time.perf_counter()
+    invalid = run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28}{count / elapsed:>14,.0f} records/s  {invalid} invalid")
+
+
+def main(count: int):
+    records = make_records(count)
+    measure("re.match per record", count,
+            lambda: sum(1 for record in records if uncompiled(record)))
+    measure("compiled rules per record", count,
+            lambda: sum(1 for record in records if CONTACT_VALIDATOR.errors(record)))
+    measure("compiled rules per batch", count,
+            lambda: sum(len(CONTACT_VALIDATOR.validate_batch(batch))
+                        for batch in batched(records, BATCH_SIZE)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
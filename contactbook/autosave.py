@@ -0,0 +1,97 @@
+__author__ = "VadimTrubay"
+
+import threading
+import time
+from typing import Optional
+
+from logs import log
+
+
+class Autosaver:
+    def __init__(self, book, file_name: str, delay: float):
+        """
+        The __init__ function starts saving a book in the background once it has been left alone for a while.
+        Every change pushes the save back by the delay, so a burst of changes is written once.
+        The menu loop holds lock while a command runs. The thread takes it only for prepare_save,
+        which copies what has to be written, and writes the copy after letting it go,
+        so a save of any size never keeps the menu waiting.
+        A book that cannot be written from another thread (background_save is False) is saved right away instead.
+        :param self: Represent the instance of the class
+        :param book: The Contactbook or NoteBook to save
+        :param file_name: str: The save file name without the extension
+        :param delay: float: Seconds without changes before the book is saved
+        """
+        self.book = book
+        self.file_name = file_name
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.error: Optional[Exception] = None
+        self._condition = threading.Condition()
+        self._due = None
+        self._closed = False
+        self._thread = None
+        if book.background_save:
+            self._thread = threading.Thread(target=self._run, name=f"autosave {file_name}", daemon=True)
+            self._thread.start()
+
+    def touch(self):
+        """
+        The touch function tells the autosaver the book has changed.
+        :param self: Represent the instance of the class
+        """
+        if self._thread is None:
+            self.book.save(self.file_name)
+            log(f"'{self.file_name}' saved")
+            return
+        with self._condition:
+            self._due = time.monotonic() + self.delay
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (self._due is None or time.monotonic() < self._due):
+                    self._condition.wait(None if self._due is None else self._due - time.monotonic())
+                if self._closed:
+                    return
+                self._due = None
+            self._save()
+
+    def _save(self):
+        with self.lock:
+            # save_lock is taken before the menu goes on, so the saves are written in the order they were prepared
+            self.book.save_lock.acquire()
+            try:
+                write = self.book.prepare_save(self.file_name, wait=False)
+            except Exception as e:
+                self.book.save_lock.release()
+                self._failed(e)
+                return
+            if write is None:
+                # another session is saving to the same files, try again after the delay
+                self.book.save_lock.release()
+                self.touch()
+                return
+        try:
+            write()
+            log(f"'{self.file_name}' autosaved")
+        except Exception as e:
+            self._failed(e)
+        finally:
+            self.book.save_lock.release()
+
+    def _failed(self, error: Exception):
+        self.error = error
+        log(f"autosave of '{self.file_name}' failed: {error}")
+
+    def close(self):
+        """
+        The close function stops the background thread, waiting for a save in progress to finish.
+        Changes made since the last autosave are left to the final save of the caller.
+        :param self: Represent the instance of the class
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
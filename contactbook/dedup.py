@@ -0,0 +1,231 @@
+__author__ = "VadimTrubay"
+
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Mapping, Set, Tuple
+
+from indexes import PHONE_TAIL_LENGTH, PhoneIndex, edit_distance
+
+THRESHOLD = 0.6
+MAX_BLOCK = 100
+WINDOW = 10
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+PHONE_WEIGHT = 0.35
+EMAIL_WEIGHT = 0.35
+NAME_WEIGHT = 0.5
+BIRTHDAY_WEIGHT = 0.15
+BIRTHDAY_CONFLICT = 0.3
+MIN_NAME_SIMILARITY = 0.6
+
+
+def soundex(word: str) -> str:
+    """
+    The soundex function turns a name into its Soundex code, the same for names that sound alike,
+    for example both "robert" and "rupert" give "r163".
+    :param word: str: The name
+    :return: The first letter followed by three digits, or an empty string if the name has no letters
+    """
+    letters = [char for char in word.lower() if "a" <= char <= "z"]
+    if not letters:
+        return ""
+    code = [letters[0]]
+    previous = SOUNDEX_CODES.get(letters[0], "")
+    for char in letters[1:]:
+        digit = SOUNDEX_CODES.get(char, "")
+        if digit and digit != previous:
+            code.append(digit)
+            if len(code) == 4:
+                break
+        if char not in "hw":
+            previous = digit
+    return "".join(code).ljust(4, "0")
+
+
+class Features:
+    __slots__ = ("digits", "email", "firstname", "lastname", "name", "birthday")
+
+    def __init__(self, record: Mapping):
+        """
+        The __init__ function prepares the parts of a contact compared by the duplicate detection, once per contact.
+        :param self: Represent the instance of the class
+        :param record: Mapping: The contact
+        """
+        self.digits = PhoneIndex.normalize(record["phone"])
+        self.email = record["email"].strip().lower()
+        self.firstname = record["firstname"]
+        self.lastname = record["lastname"]
+        self.name = f"{self.firstname} {self.lastname}".lower()
+        self.birthday = record["birthday"]
+
+    def blocking_keys(self, threshold: float) -> Iterator[Tuple[str, str]]:
+        """
+        The blocking_keys function lists the keys a duplicate of the contact is likely to share with it.
+        Only contacts sharing a key are compared, which keeps the comparisons close to linear.
+        :param self: Represent the instance of the class
+        :param threshold: float: The score from which contacts count as duplicates
+        :return: An iterator of (kind, key) tuples: the last digits of the phone, the email, the sound of the name
+        """
+        if len(self.digits) >= PHONE_TAIL_LENGTH:
+            yield "phone", self.digits[-PHONE_TAIL_LENGTH:]
+        if self.email:
+            yield "email", self.email
+        if threshold <= NAME_WEIGHT:
+            sound = soundex(self.firstname) + soundex(self.lastname)
+            if sound:
+                yield "name", sound
+        elif self.birthday:
+            # a similar name alone scores below the threshold: without the same phone or email,
+            # which have blocks of their own, only the same birthday can make up the difference
+            sound = soundex(self.firstname) + soundex(self.lastname)
+            if sound:
+                yield "name", f"{sound} {self.birthday}"
+
+
+def name_similarity(first: Features, second: Features) -> float:
+    """
+    The name_similarity function compares the names of two contacts, 1 for the same name.
+    First and last names are compared apart, so the usual duplicate with one name spelled
+    differently costs one short edit distance instead of one over the whole name.
+    :param first: Features: The first contact
+    :param second: Features: The second contact
+    :return: 1 minus the edits per character of the longer name, 0 below MIN_NAME_SIMILARITY
+    """
+    longest = max(len(first.name), len(second.name))
+    limit = int(longest * (1 - MIN_NAME_SIMILARITY))
+    distance = 0
+    for one, other in ((first.firstname, second.firstname), (first.lastname, second.lastname)):
+        if one != other:
+            distance += edit_distance(one.lower(), other.lower(), limit - distance)
+            if distance > limit:
+                return 0.0
+    return 1 - distance / longest
+
+
+def score(first: Features, second: Features, threshold: float = THRESHOLD) -> float:
+    """
+    The score function rates how likely two contacts are the same person, from 0 to 1.
+    The same phone (in any formatting) and the same email weigh 0.35 each, a similar name up to 0.5,
+    the same birthday 0.15, and two different birthdays take 0.3 off.
+    The name is compared last and only if it can still lift the score over the threshold.
+    :param first: Features: The first contact
+    :param second: Features: The second contact
+    :param threshold: float: The score from which contacts count as duplicates
+    :return: The score
+    """
+    result = 0.0
+    if len(first.digits) >= PHONE_TAIL_LENGTH and len(second.digits) >= PHONE_TAIL_LENGTH:
+        tail = first.digits[-PHONE_TAIL_LENGTH:] == second.digits[-PHONE_TAIL_LENGTH:]
+        if tail and (first.digits.endswith(second.digits) or second.digits.endswith(first.digits)):
+            result += PHONE_WEIGHT
+    if first.email and first.email == second.email:
+        result += EMAIL_WEIGHT
+    if first.birthday and second.birthday:
+        result += BIRTHDAY_WEIGHT if first.birthday == second.birthday else -BIRTHDAY_CONFLICT
+    if result + NAME_WEIGHT >= threshold:
+        result += NAME_WEIGHT * name_similarity(first, second)
+    return max(0.0, min(1.0, result))
+
+
+class DuplicateReport:
+    def __init__(self):
+        """
+        The __init__ function creates an empty report of a duplicate search.
+        :param self: Represent the instance of the class
+        """
+        self.clusters = []
+        self.scores = []
+        self.blocks = 0
+        self.compared = 0
+
+
+def _candidate_pairs(blocks: Iterable[List[int]], features: Dict[int, Features]) -> Iterator[Tuple[int, int]]:
+    for members in blocks:
+        if len(members) <= MAX_BLOCK:
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    yield first, second
+        else:
+            # a very common key: compare each contact with its neighbours in name order only
+            members = sorted(members, key=lambda rid: (features[rid].name, rid))
+            for i, first in enumerate(members):
+                for second in members[i + 1: i + 1 + WINDOW]:
+                    yield (first, second) if first < second else (second, first)
+
+
+def find_duplicates(records: Dict[int, Mapping], threshold: float = THRESHOLD) -> DuplicateReport:
+    """
+    The find_duplicates function finds the groups of contacts that are probably the same person.
+    Contacts are put into blocks by the last digits of the phone, the email and the Soundex code of the name,
+    only contacts of a common block are scored, and pairs scoring at least the threshold are joined into clusters.
+    :param records: Dict[int, Mapping]: The contacts by id
+    :param threshold: float: The score from which contacts count as duplicates
+    :return: A DuplicateReport with the clusters as lists of ids in ascending order, largest cluster first,
+        and the score of the weakest pair that joined each cluster
+    """
+    report = DuplicateReport()
+    features = {}
+    blocks = defaultdict(list)
+    for rid, record in records.items():
+        features[rid] = feature = Features(record)
+        for key in feature.blocking_keys(threshold):
+            blocks[key].append(rid)
+    shared = [members for members in blocks.values() if len(members) > 1]
+    report.blocks = len(shared)
+    del blocks
+
+    parents = {}
+
+    def root(rid: int) -> int:
+        while parents.get(rid, rid) != rid:
+            parents[rid] = parents.get(parents[rid], parents[rid])
+            rid = parents[rid]
+        return rid
+
+    seen: Set[Tuple[int, int]] = set()
+    matches = []
+    for pair in _candidate_pairs(shared, features):
+        if pair in seen:
+            continue
+        seen.add(pair)
+        report.compared += 1
+        value = score(features[pair[0]], features[pair[1]], threshold)
+        if value >= threshold:
+            matches.append((pair[0], value))
+            first, second = root(pair[0]), root(pair[1])
+            if first != second:
+                parents[max(first, second)] = min(first, second)
+    clusters = defaultdict(list)
+    for rid in sorted(parents.keys() | set(parents.values())):
+        clusters[root(rid)].append(rid)
+    weakest = {}
+    for rid, value in matches:
+        cluster = root(rid)
+        weakest[cluster] = min(weakest.get(cluster, value), value)
+    for cluster in sorted(clusters, key=lambda cluster: (-len(clusters[cluster]), cluster)):
+        report.clusters.append(clusters[cluster])
+        report.scores.append(weakest[cluster])
+    return report
+
+
+def merge_records(records: List[Mapping], fields: List[str]) -> Dict:
+    """
+    The merge_records function folds a cluster of duplicates into one contact.
+    Every field keeps the first non-empty value in the order of the records, notes are joined.
+    :param records: List[Mapping]: The duplicates, the one to keep first
+    :param fields: List[str]: The fields of a contact
+    :return: The merged contact dictionary
+    """
+    merged = {}
+    for field in fields:
+        values = [record[field] for record in records if record[field]]
+        if field == "note":
+            merged[field] = "; ".join(dict.fromkeys(values))
+        else:
+            merged[field] = values[0] if values else ""
+    return merged
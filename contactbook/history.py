@@ -0,0 +1,60 @@
+__author__ = "VadimTrubay"
+
+from collections import deque
+from typing import Callable, Optional
+
+UNDO_LEVELS = 100
+
+
+class History:
+    def __init__(self, levels: int = UNDO_LEVELS):
+        """
+        The __init__ function creates an empty undo and redo history.
+        Every change of a book is kept as the operation that reverts it, not as a copy of the book,
+        so a step costs as much as the change itself: a deleted record is kept as that record,
+        a cleared book as its old list and indexes, which are swapped back in on undo.
+        :param self: Represent the instance of the class
+        :param levels: int: How many changes can be undone, the oldest are forgotten first
+        """
+        self.undo_steps = deque(maxlen=levels)
+        self.redo_steps = []
+
+    def record(self, description: str, inverse: tuple):
+        """
+        The record function remembers a change made to the book, which makes the changes undone before it final.
+        :param self: Represent the instance of the class
+        :param description: str: What the change was, for example "delete 'ann lee'"
+        :param inverse: tuple: The operation that reverts the change
+        """
+        self.undo_steps.append((description, inverse))
+        self.redo_steps.clear()
+
+    def undo(self, apply: Callable[[tuple], tuple]) -> Optional[str]:
+        """
+        The undo function reverts the last change.
+        :param self: Represent the instance of the class
+        :param apply: Callable[[tuple], tuple]: Runs an operation on the book and returns the operation reverting it
+        :return: The description of the reverted change, or None if there is nothing to undo
+        """
+        if not self.undo_steps:
+            return None
+        description, operation = self.undo_steps.pop()
+        self.redo_steps.append((description, apply(operation)))
+        return description
+
+    def redo(self, apply: Callable[[tuple], tuple]) -> Optional[str]:
+        """
+        The redo function makes the last undone change again.
+        :param self: Represent the instance of the class
+        :param apply: Callable[[tuple], tuple]: Runs an operation on the book and returns the operation reverting it
+        :return: The description of the change, or None if there is nothing to redo
+        """
+        if not self.redo_steps:
+            return None
+        description, operation = self.redo_steps.pop()
+        self.undo_steps.append((description, apply(operation)))
+        return description
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
@@ -0,0 +1,904 @@
+__author__ = "VadimTrubay"
+
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import date, datetime
+from heapq import heapify, heappop, nlargest, nsmallest
+from math import log
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+PHONE_TAIL_LENGTH = 7
+NONZERO_BYTE = re.compile(b"[^\x00]")
+NON_DIGIT = re.compile(r"[^0-9]")
+WORD = re.compile(r"\w+")
+PHRASE = re.compile(r'"([^"]*)"')
+TAG_SEPARATOR = re.compile(r"[\s,;]+")
+
+
+class NgramIndex:
+    def __init__(self, fields: List[str], n: int = 3):
+        """
+        The __init__ function creates an empty n-gram inverted index.
+        For every field it maps each n-character substring to the ids of the records containing it.
+        :param self: Represent the instance of the class
+        :param fields: List[str]: The record fields to index
+        :param n: int: The length of the grams
+        """
+        self.n = n
+        self.postings = {field: defaultdict(set) for field in fields}
+
+    def grams(self, text: str) -> Set[str]:
+        """
+        The grams function splits a text into the set of its n-character substrings.
+        :param self: Represent the instance of the class
+        :param text: str: The text to split
+        :return: A set of grams, empty if the text is shorter than n
+        """
+        return {text[i: i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def add(self, rid: int, record: Dict):
+        for field, postings in self.postings.items():
+            for gram in self.grams(record[field]):
+                postings[gram].add(rid)
+
+    def remove(self, rid: int, record: Dict):
+        for field, postings in self.postings.items():
+            for gram in self.grams(record[field]):
+                ids = postings.get(gram)
+                if ids is not None:
+                    ids.discard(rid)
+                    if not ids:
+                        del postings[gram]
+
+    def clear(self):
+        for postings in self.postings.values():
+            postings.clear()
+
+    def build(self, records: Dict[int, Dict]):
+        self.clear()
+        for rid, record in records.items():
+            self.add(rid, record)
+
+    def candidates(self, field: str, pattern: str) -> Optional[Set[int]]:
+        """
+        The candidates function narrows a substring search down to the records sharing all grams of the pattern.
+        Every record containing the pattern is among the candidates, but candidates still need the substring check.
+        :param self: Represent the instance of the class
+        :param field: str: The field to search in
+        :param pattern: str: The substring to look for
+        :return: A set of record ids, or None if the index can not help and the caller has to scan
+        """
+        postings = self.postings.get(field)
+        if postings is None or len(pattern) < self.n:
+            return None
+        lists = []
+        for gram in self.grams(pattern):
+            ids = postings.get(gram)
+            if not ids:
+                return set()
+            lists.append(ids)
+        lists.sort(key=len)
+        result = set(lists[0])
+        for ids in lists[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+
+def anniversary(birth_day: date, year: int) -> date:
+    """
+    The anniversary function returns the date a birthday falls on in the given year.
+    Leap-day birthdays are celebrated on the 28th of February in non-leap years.
+    :param birth_day: date: The date of birth
+    :param year: int: The year of the anniversary
+    :return: The date of the birthday in that year
+    """
+    try:
+        return birth_day.replace(year=year)
+    except ValueError:
+        return date(year, 2, 28)
+
+
+def next_anniversary(birth_day: date, current_date: date) -> date:
+    """
+    The next_anniversary function returns the first birthday on or after the current date.
+    :param birth_day: date: The date of birth
+    :param current_date: date: The date to count from
+    :return: The date of the next birthday
+    """
+    next_day = anniversary(birth_day, current_date.year)
+    if next_day < current_date:
+        next_day = anniversary(birth_day, current_date.year + 1)
+    return next_day
+
+
+def calendar_ranges(start: date, end: date) -> Iterator[Tuple[int, Tuple[int, int], Tuple[int, int]]]:
+    """
+    The calendar_ranges function splits an interval of dates into one (month, day) range per calendar year.
+    In non-leap years a range ending on the 28th of February is stretched over the 29th,
+    because leap-day birthdays are celebrated on the 28th then.
+    :param start: date: The first day of the interval
+    :param end: date: The last day of the interval
+    :return: An iterator of (year, first (month, day), last (month, day)) tuples
+    """
+    for year in range(start.year, end.year + 1):
+        first = max(start, date(year, 1, 1))
+        last = min(end, date(year, 12, 31))
+        last_day = (last.month, last.day)
+        if last_day == (2, 28) and anniversary(date(2000, 2, 29), year).day == 28:
+            last_day = (2, 29)
+        yield year, (first.month, first.day), last_day
+
+
+class BirthdayIndex:
+    def __init__(self):
+        """
+        The __init__ function creates an empty birthday calendar.
+        The calendar is a list of (month, day, id) tuples kept sorted, so a range of days is a binary search away.
+        New birthdays wait in a pending list and are merged in with one sort by the next query,
+        so adding many contacts in a row does not shift the calendar for each of them.
+        The ids of the records without a valid birthday are kept sorted as well, for the birthday order of the pages.
+        :param self: Represent the instance of the class
+        """
+        self.calendar = []
+        self.pending = []
+        self.dates = {}
+        self.undated = []
+
+    def __len__(self) -> int:
+        return len(self.dates) + len(self.undated)
+
+    @staticmethod
+    def parse(birthday: str) -> Optional[date]:
+        try:
+            return datetime.strptime(birthday, "%d.%m.%Y").date()
+        except ValueError:
+            return None
+
+    def add(self, rid: int, record: Dict):
+        birth_day = self.parse(record["birthday"])
+        if birth_day is not None:
+            self.dates[rid] = birth_day
+            self.pending.append((birth_day.month, birth_day.day, rid))
+        else:
+            insort(self.undated, rid)
+
+    def remove(self, rid: int, record: Dict):
+        birth_day = self.dates.pop(rid, None)
+        if birth_day is None:
+            position = bisect_left(self.undated, rid)
+            if position < len(self.undated) and self.undated[position] == rid:
+                del self.undated[position]
+        else:
+            entry = (birth_day.month, birth_day.day, rid)
+            position = bisect_left(self.calendar, entry)
+            if position < len(self.calendar) and self.calendar[position] == entry:
+                del self.calendar[position]
+            else:
+                self.pending.remove(entry)
+
+    def _merge(self):
+        if self.pending:
+            self.calendar.extend(self.pending)
+            self.calendar.sort()
+            self.pending.clear()
+
+    def clear(self):
+        self.calendar.clear()
+        self.pending.clear()
+        self.dates.clear()
+        self.undated.clear()
+
+    def build(self, records: Dict[int, Dict]):
+        """
+        The build function fills the calendar from scratch, sorting it once instead of inserting record by record.
+        :param self: Represent the instance of the class
+        :param records: Dict[int, Dict]: The records by id
+        """
+        self.clear()
+        for rid, record in records.items():
+            birth_day = self.parse(record["birthday"])
+            if birth_day is not None:
+                self.dates[rid] = birth_day
+                self.calendar.append((birth_day.month, birth_day.day, rid))
+            else:
+                self.undated.append(rid)
+        self.calendar.sort()
+        self.undated.sort()
+
+    def ordered(self) -> Tuple[List[Tuple[int, int, int]], List[int]]:
+        """
+        The ordered function gives the calendar in the order of the days of the year
+        and the ids of the records without a valid birthday.
+        These are the lists the index keeps up to date, not copies, so nothing is sorted again.
+        :param self: Represent the instance of the class
+        :return: The sorted (month, day, id) calendar and the sorted ids without a birthday
+        """
+        self._merge()
+        return self.calendar, self.undated
+
+    def next_birthday(self, rid: int, current_date: date) -> Optional[date]:
+        """
+        The next_birthday function returns the first birthday of a record on or after the current date.
+        :param self: Represent the instance of the class
+        :param rid: int: The id of the record
+        :param current_date: date: The date to count from
+        :return: The date of the next birthday or None if the record has no valid birthday
+        """
+        birth_day = self.dates.get(rid)
+        if birth_day is None:
+            return None
+        return next_anniversary(birth_day, current_date)
+
+    def on_days(self, ranges: List[Tuple[Tuple[int, int], Tuple[int, int]]]) -> Set[int]:
+        """
+        The on_days function finds the records born on some days of the year, whatever the year.
+        :param self: Represent the instance of the class
+        :param ranges: List[Tuple[Tuple[int, int], Tuple[int, int]]]: ((month, day), (month, day)) ranges, both ends included
+        :return: A set of record ids
+        """
+        self._merge()
+        ids = set()
+        for first, last in ranges:
+            low = bisect_left(self.calendar, first)
+            high = bisect_right(self.calendar, (*last, float("inf")))
+            ids.update(rid for _, _, rid in self.calendar[low:high])
+        return ids
+
+    def between(self, start: date, end: date) -> List[Tuple[date, int]]:
+        """
+        The between function finds all birthdays falling between two dates, both inclusive.
+        Each calendar year of the interval is a single range scan over the sorted calendar.
+        :param self: Represent the instance of the class
+        :param start: date: The first day of the interval
+        :param end: date: The last day of the interval
+        :return: A list of (birthday date, record id) tuples ordered by date
+        """
+        self._merge()
+        result = []
+        for year, first, last in calendar_ranges(start, end):
+            low = bisect_left(self.calendar, first)
+            high = bisect_right(self.calendar, (*last, float("inf")))
+            for month, day, rid in self.calendar[low:high]:
+                result.append((anniversary(self.dates[rid], year), rid))
+        return result
+
+
+class PhoneIndex:
+    def __init__(self, tail_length: int = PHONE_TAIL_LENGTH):
+        """
+        The __init__ function creates an empty index of phone numbers reduced to their digits.
+        Numbers are grouped by their last tail_length digits, the part a caller ID shows in any formatting,
+        so "+38 (050) 123-45-67" and "0501234567" land in the same group.
+        :param self: Represent the instance of the class
+        :param tail_length: int: How many trailing digits identify a number
+        """
+        self.tail_length = tail_length
+        self.digits = {}
+        self.tails = defaultdict(set)
+
+    @staticmethod
+    def normalize(phone: str) -> str:
+        return NON_DIGIT.sub("", phone)
+
+    def add(self, rid: int, record: Dict):
+        digits = self.normalize(record["phone"])
+        if digits:
+            self.digits[rid] = digits
+            self.tails[digits[-self.tail_length:]].add(rid)
+
+    def remove(self, rid: int, record: Dict):
+        digits = self.digits.pop(rid, None)
+        if digits is not None:
+            tail = digits[-self.tail_length:]
+            self.tails[tail].discard(rid)
+            if not self.tails[tail]:
+                del self.tails[tail]
+
+    def clear(self):
+        self.digits.clear()
+        self.tails.clear()
+
+    def build(self, records: Dict[int, Dict]):
+        self.clear()
+        for rid, record in records.items():
+            self.add(rid, record)
+
+    def find(self, number: str) -> Set[int]:
+        """
+        The find function finds the records with a phone number, whatever its formatting.
+        With at least tail_length digits it is a caller ID lookup: one group of the index is read
+        and a record matches if its digits end with the digits of the number or the other way round.
+        Fewer digits are looked for anywhere in the numbers, which has to check every phone.
+        :param self: Represent the instance of the class
+        :param number: str: The number or a part of it, any characters besides digits are ignored
+        :return: A set of record ids
+        """
+        digits = self.normalize(number)
+        if len(digits) < self.tail_length:
+            candidates = self.digits
+        else:
+            candidates = self.tails.get(digits[-self.tail_length:], ())
+        return {rid for rid in candidates if self.matches(self.digits[rid], digits)}
+
+    def matches(self, stored: str, digits: str) -> bool:
+        """
+        The matches function tells whether the digits of a stored phone match the digits looked for.
+        :param self: Represent the instance of the class
+        :param stored: str: The digits of the phone of a record
+        :param digits: str: The digits looked for
+        :return: True if they are the same number, or for short digits if the phone contains them
+        """
+        if len(digits) < self.tail_length:
+            return digits in stored
+        return stored[-self.tail_length:] == digits[-self.tail_length:] and (
+            # a number written with and without its country or area code: one ends with the other
+            stored.endswith(digits) or digits.endswith(stored)
+        )
+
+
+def email_domain(record: Dict) -> str:
+    return record["email"].rpartition("@")[2].lower() if "@" in record["email"] else ""
+
+
+class FacetIndex:
+    def __init__(self, facets: Dict[str, Callable[[Dict], str]]):
+        """
+        The __init__ function creates empty bitmaps for attributes with few distinct values, such as the status.
+        For every value of a facet a bytearray keeps one bit per record id, set if the record has that value,
+        so counting and combining facets are bitwise operations over whole bitmaps instead of a loop over records.
+        :param self: Represent the instance of the class
+        :param facets: Dict[str, Callable[[Dict], str]]: Facet names with the function giving the value of a record
+        """
+        self.facets = facets
+        self.bitmaps = {name: {} for name in facets}
+
+    def add(self, rid: int, record: Dict):
+        byte, bit = divmod(rid, 8)
+        for name, facet in self.facets.items():
+            bitmap = self.bitmaps[name].setdefault(facet(record), bytearray())
+            if len(bitmap) <= byte:
+                bitmap.extend(bytes(byte + 1 - len(bitmap)))
+            bitmap[byte] |= 1 << bit
+
+    def remove(self, rid: int, record: Dict):
+        byte, bit = divmod(rid, 8)
+        for name, facet in self.facets.items():
+            value = facet(record)
+            bitmap = self.bitmaps[name].get(value)
+            if bitmap is not None and byte < len(bitmap):
+                bitmap[byte] &= ~(1 << bit)
+                if not bitmap[byte] and not bitmap.strip(b"\x00"):
+                    del self.bitmaps[name][value]
+
+    def clear(self):
+        for bitmaps in self.bitmaps.values():
+            bitmaps.clear()
+
+    def build(self, records: Dict[int, Dict]):
+        self.clear()
+        for rid, record in records.items():
+            self.add(rid, record)
+
+    def bits(self, name: str, value: str) -> int:
+        bitmap = self.bitmaps[name].get(value)
+        return 0 if bitmap is None else int.from_bytes(bitmap, "little")
+
+    def select(self, **values: str) -> int:
+        """
+        The select function combines the bitmaps of several facet values with a bitwise AND.
+        :param self: Represent the instance of the class
+        :param values: str: Facet names with the value the records must have, for example status="work"
+        :return: A bitmap of the matching record ids as an integer, -1 (all records) if no value is given
+        """
+        result = -1
+        for name, value in values.items():
+            result &= self.bits(name, value)
+            if not result:
+                break
+        return result
+
+    def counts(self, name: str, within: int = -1) -> Dict[str, int]:
+        """
+        The counts function counts the records per value of a facet, with one AND and popcount per value.
+        :param self: Represent the instance of the class
+        :param name: str: The facet
+        :param within: int: A bitmap from select to count inside of, all records by default
+        :return: The number of records by value, values without records left out
+        """
+        result = {}
+        for value, bitmap in self.bitmaps[name].items():
+            count = (int.from_bytes(bitmap, "little") & within).bit_count()
+            if count:
+                result[value] = count
+        return result
+
+    @staticmethod
+    def ids(bits: int) -> Iterator[int]:
+        """
+        The ids function lists the record ids set in a bitmap in ascending order.
+        Runs of zero bytes are skipped by a regular expression, so sparse bitmaps are read quickly.
+        :param bits: int: A bitmap from select
+        :return: An iterator of record ids
+        """
+        data = bits.to_bytes(max(1, (bits.bit_length() + 7) // 8), "little")
+        for match in NONZERO_BYTE.finditer(data):
+            byte = data[match.start()]
+            for bit in range(8):
+                if byte >> bit & 1:
+                    yield match.start() * 8 + bit
+
+
+def parse_tags(text: str) -> Set[str]:
+    """
+    The parse_tags function splits the tag field of a note into its tags.
+    Tags are separated by spaces, commas or semicolons, compared in lower case and a leading # is dropped,
+    so "Work, #python" gives {"work", "python"}.
+    :param text: str: The tag field
+    :return: The set of tags
+    """
+    return {tag for tag in (word.lstrip("#") for word in TAG_SEPARATOR.split(text.lower())) if tag}
+
+
+class TagIndex:
+    def __init__(self):
+        """
+        The __init__ function creates an empty index of the tags of notes.
+        For every tag a bytearray keeps one bit per note id, like FacetIndex does for contacts,
+        so the notes with all, any or none of some tags are found with bitwise AND, OR and NOT over whole bitmaps,
+        and the number of notes per tag is kept up to date for the tag cloud.
+        :param self: Represent the instance of the class
+        """
+        self.bitmaps = {}
+        self.counts = {}
+        # the bits of all the indexed notes, what "none of" is taken from
+        self.everything = bytearray()
+
+    @staticmethod
+    def _set(bitmap: bytearray, nid: int):
+        byte, bit = divmod(nid, 8)
+        if len(bitmap) <= byte:
+            bitmap.extend(bytes(byte + 1 - len(bitmap)))
+        bitmap[byte] |= 1 << bit
+
+    @staticmethod
+    def _unset(bitmap: bytearray, nid: int):
+        byte, bit = divmod(nid, 8)
+        if byte < len(bitmap):
+            bitmap[byte] &= ~(1 << bit)
+
+    def add(self, nid: int, record: Dict):
+        self._set(self.everything, nid)
+        for tag in parse_tags(record["tag"]):
+            self._set(self.bitmaps.setdefault(tag, bytearray()), nid)
+            self.counts[tag] = self.counts.get(tag, 0) + 1
+
+    def remove(self, nid: int, record: Dict):
+        self._unset(self.everything, nid)
+        for tag in parse_tags(record["tag"]):
+            bitmap = self.bitmaps.get(tag)
+            if bitmap is None:
+                continue
+            self._unset(bitmap, nid)
+            self.counts[tag] -= 1
+            if not self.counts[tag]:
+                del self.counts[tag]
+                del self.bitmaps[tag]
+
+    def clear(self):
+        self.bitmaps.clear()
+        self.counts.clear()
+        self.everything = bytearray()
+
+    def build(self, records: Dict[int, Dict]):
+        self.clear()
+        for nid, record in records.items():
+            self.add(nid, record)
+
+    def bits(self, tag: str) -> int:
+        bitmap = self.bitmaps.get(tag)
+        return 0 if bitmap is None else int.from_bytes(bitmap, "little")
+
+    def select(self, all_of: Iterable[str] = (), any_of: Iterable[str] = (), none_of: Iterable[str] = ()) -> int:
+        """
+        The select function finds the notes with all of some tags, at least one of others and none of the rest.
+        The rarest tags of all_of are combined first, so an empty result stops early.
+        :param self: Represent the instance of the class
+        :param all_of: Iterable[str]: Tags the notes must all have
+        :param any_of: Iterable[str]: Tags the notes must have at least one of, ignored if empty
+        :param none_of: Iterable[str]: Tags the notes must not have
+        :return: A bitmap of the matching note ids as an integer, see FacetIndex.ids
+        """
+        result = int.from_bytes(self.everything, "little")
+        for tag in sorted(all_of, key=lambda tag: self.counts.get(tag, 0)):
+            result &= self.bits(tag)
+            if not result:
+                return 0
+        any_of = list(any_of)
+        if any_of:
+            alternatives = 0
+            for tag in any_of:
+                alternatives |= self.bits(tag)
+            result &= alternatives
+        for tag in none_of:
+            result &= ~self.bits(tag)
+        return result
+
+    def cloud(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+
+class SortedView:
+    def __init__(self):
+        """
+        The __init__ function creates an empty sorted view.
+        The view is a list of key tuples kept in order by binary insertion,
+        so listing it is a linear walk and a prefix or a range is a slice.
+        :param self: Represent the instance of the class
+        """
+        self.keys = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self) -> Iterator[tuple]:
+        return iter(self.keys)
+
+    def add(self, key: tuple):
+        insort(self.keys, key)
+
+    def remove(self, key: tuple):
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+
+    def clear(self):
+        self.keys.clear()
+
+    def build(self, keys: Iterable[tuple]):
+        self.keys = sorted(keys)
+
+    def range(self, low: tuple, high: tuple) -> List[tuple]:
+        """
+        The range function returns the keys from low up to but not including high.
+        :param self: Represent the instance of the class
+        :param low: tuple: The first key of the range, or its leading part
+        :param high: tuple: The key the range stops before, or its leading part
+        :return: A list of keys in order
+        """
+        return self.keys[bisect_left(self.keys, low): bisect_left(self.keys, high)]
+
+    def prefix(self, text: str) -> List[tuple]:
+        """
+        The prefix function returns the keys whose first part starts with the text.
+        :param self: Represent the instance of the class
+        :param text: str: The beginning of the first part of the key
+        :return: A list of keys in order
+        """
+        if not text:
+            return list(self.keys)
+        return self.range((text,), (text + chr(0x10FFFF),))
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """
+    The edit_distance function counts the insertions, deletions, substitutions and swaps of neighbouring
+    characters that turn one word into another (optimal string alignment distance).
+    :param first: str: The first word
+    :param second: str: The second word
+    :param limit: int: Stop counting once the distance is known to exceed it
+    :return: The distance, or limit + 1 if it is larger than limit
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    before_previous = None
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i] + [0] * len(second)
+        for j, second_char in enumerate(second, 1):
+            value = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (first_char != second_char),
+            )
+            if (
+                i > 1
+                and j > 1
+                and first_char == second[j - 2]
+                and first[i - 2] == second_char
+            ):
+                value = min(value, before_previous[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class FuzzyIndex:
+    def __init__(self, fields: List[str], max_distance: int = 2, prefix_length: int = 7):
+        """
+        The __init__ function creates an empty symmetric delete index for typo tolerant search.
+        Every distinct word of the fields is stored under all the variants left after deleting up to
+        max_distance characters from its first prefix_length characters. Two words within max_distance
+        of each other always share a variant, so a search only looks up the variants of the searched word
+        and measures the distance to the few words found there.
+        :param self: Represent the instance of the class
+        :param fields: List[str]: The record fields to index
+        :param max_distance: int: The largest edit distance searched for
+        :param prefix_length: int: How many leading characters of a word produce variants
+        """
+        self.fields = fields
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.postings = {field: {} for field in fields}
+        self.deletes = defaultdict(set)
+        self.word_counts = {}
+
+    def _variants(self, word: str) -> Set[str]:
+        word = word[: self.prefix_length]
+        variants = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {
+                item[:i] + item[i + 1:] for item in frontier for i in range(len(item))
+            }
+            variants |= frontier
+        return variants
+
+    def add(self, rid: int, record: Dict):
+        for field, postings in self.postings.items():
+            word = record[field]
+            ids = postings.get(word)
+            if ids is not None:
+                ids.add(rid)
+                continue
+            postings[word] = {rid}
+            count = self.word_counts.get(word, 0)
+            self.word_counts[word] = count + 1
+            if not count:
+                for variant in self._variants(word):
+                    self.deletes[variant].add(word)
+
+    def remove(self, rid: int, record: Dict):
+        for field, postings in self.postings.items():
+            word = record[field]
+            ids = postings.get(word)
+            if ids is None:
+                continue
+            ids.discard(rid)
+            if ids:
+                continue
+            del postings[word]
+            self.word_counts[word] -= 1
+            if not self.word_counts[word]:
+                del self.word_counts[word]
+                for variant in self._variants(word):
+                    words = self.deletes[variant]
+                    words.discard(word)
+                    if not words:
+                        del self.deletes[variant]
+
+    def clear(self):
+        for postings in self.postings.values():
+            postings.clear()
+        self.deletes.clear()
+        self.word_counts.clear()
+
+    def build(self, records: Dict[int, Dict]):
+        self.clear()
+        for rid, record in records.items():
+            self.add(rid, record)
+
+    def near(self, word: str) -> List[Tuple[int, str]]:
+        """
+        The near function finds the indexed words within max_distance of a word.
+        :param self: Represent the instance of the class
+        :param word: str: The word to look for
+        :return: A list of (distance, word) tuples, closest first
+        """
+        candidates = set()
+        for variant in self._variants(word):
+            candidates.update(self.deletes.get(variant, ()))
+        found = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, self.max_distance)
+            if distance <= self.max_distance:
+                found.append((distance, candidate))
+        found.sort()
+        return found
+
+    def search(self, text: str, limit: int = 10) -> List[Tuple[int, int]]:
+        """
+        The search function finds the records closest to a name that may contain typos.
+        One word is compared with every indexed field, two words with the first and the second field
+        and their distances are added up.
+        :param self: Represent the instance of the class
+        :param text: str: One or two words
+        :param limit: int: How many records to return at most
+        :return: A list of (distance, record id) tuples, closest first and in id order among equals
+        """
+        words = text.split()
+        if len(words) == 1:
+            near = self.near(words[0])
+            levels = defaultdict(list)
+            for distance, word in near:
+                for postings in self.postings.values():
+                    ids = postings.get(word)
+                    if ids:
+                        levels[distance].append(ids)
+        elif len(words) == 2 and len(self.fields) >= 2:
+            first_postings = self.postings[self.fields[0]]
+            second_postings = self.postings[self.fields[1]]
+            levels = defaultdict(list)
+            second_near = [
+                (distance, second_postings[word])
+                for distance, word in self.near(words[1])
+                if word in second_postings
+            ]
+            for first_distance, word in self.near(words[0]):
+                first_ids = first_postings.get(word)
+                if not first_ids:
+                    continue
+                for second_distance, second_ids in second_near:
+                    smaller, larger = sorted((first_ids, second_ids), key=len)
+                    ids = {rid for rid in smaller if rid in larger}
+                    if ids:
+                        levels[first_distance + second_distance].append(ids)
+        else:
+            raise ValueError("enter one word or a first and a last name")
+        result = []
+        seen = set()
+        for distance in sorted(levels):
+            ids = set().union(*levels[distance]) - seen
+            seen |= ids
+            result.extend((distance, rid) for rid in nsmallest(limit - len(result), ids))
+            if len(result) >= limit:
+                break
+        return result
+
+
+class TextIndex:
+    def __init__(self, fields: List[str], k1: float = 1.2, b: float = 0.75):
+        """
+        The __init__ function creates an empty full text index ranking documents with BM25.
+        Every word of the fields maps to the documents containing it with the number of times it occurs,
+        and every document keeps its length in words, which is all BM25 needs.
+        Word positions are not kept: a phrase is checked on the few documents holding all its words.
+        :param self: Represent the instance of the class
+        :param fields: List[str]: The record fields to index
+        :param k1: float: How quickly repeating a word stops adding to the score
+        :param b: float: How much a long document is penalized, 0 for not at all and 1 for fully
+        """
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.lengths = {}
+        self.total_length = 0
+
+    @staticmethod
+    def words(text: str) -> List[str]:
+        return WORD.findall(text.lower())
+
+    def _counts(self, record: Dict) -> Dict[str, int]:
+        counts = {}
+        for field in self.fields:
+            for word in self.words(record[field]):
+                counts[word] = counts.get(word, 0) + 1
+        return counts
+
+    def add(self, doc: int, record: Dict):
+        counts = self._counts(record)
+        for word, count in counts.items():
+            docs = self.postings.get(word)
+            if docs is None:
+                self.postings[word] = {doc: count}
+            else:
+                docs[doc] = count
+        length = sum(counts.values())
+        self.lengths[doc] = length
+        self.total_length += length
+
+    def remove(self, doc: int, record: Dict):
+        for word in self._counts(record):
+            docs = self.postings.get(word)
+            if docs is not None:
+                docs.pop(doc, None)
+                if not docs:
+                    del self.postings[word]
+        self.total_length -= self.lengths.pop(doc, 0)
+
+    def clear(self):
+        self.postings.clear()
+        self.lengths.clear()
+        self.total_length = 0
+
+    def build(self, records: Dict[int, Dict]):
+        self.clear()
+        for doc, record in records.items():
+            self.add(doc, record)
+
+    def parse(self, query: str) -> Tuple[List[str], List[List[str]]]:
+        """
+        The parse function splits a query into its words and its phrases, the parts in double quotes.
+        :param self: Represent the instance of the class
+        :param query: str: The query, for example: milk "fresh bread"
+        :return: The distinct words of the whole query and the list of words of every phrase
+        """
+        phrases = [words for words in map(self.words, PHRASE.findall(query)) if words]
+        return list(dict.fromkeys(self.words(query))), phrases
+
+    def _has_phrase(self, record: Dict, phrase: List[str]) -> bool:
+        size = len(phrase)
+        for field in self.fields:
+            words = self.words(record[field])
+            for start in range(len(words) - size + 1):
+                if words[start: start + size] == phrase:
+                    return True
+        return False
+
+    def search(self, query: str, lookup: Callable[[int], Dict], limit: int = 10) -> List[Tuple[float, int]]:
+        """
+        The search function finds the documents best matching a query, ranked by BM25.
+        Any word of the query is enough for a document to be found, the more and rarer words it has the higher it ranks,
+        and a document must contain every phrase in double quotes with its words in order.
+        The rarest words are scored first, and once the documents found so far rank above anything
+        the remaining words could give a new document, those words only add to the documents already found,
+        so a very common word costs little (MaxScore pruning).
+        Phrases are checked in the order of the scores, until enough documents are found.
+        :param self: Represent the instance of the class
+        :param query: str: The words to look for, with phrases in double quotes
+        :param lookup: Callable[[int], Dict]: Returns the indexed record of an id, to check the phrases on
+        :param limit: int: How many documents to return at most
+        :return: A list of (score, id) tuples, the best first
+        """
+        words, phrases = self.parse(query)
+        if not words or not self.total_length or limit <= 0:
+            # no indexed document has a word, nothing can match
+            return []
+        allowed = None
+        for phrase in phrases:
+            postings = sorted((self.postings.get(word, {}) for word in set(phrase)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            allowed = candidates if allowed is None else allowed & candidates
+            if not allowed:
+                return []
+        count = len(self.lengths)
+        terms = []
+        for word in words:
+            docs = self.postings.get(word)
+            if docs:
+                terms.append((log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5)) * (self.k1 + 1), docs))
+        terms.sort(key=lambda term: -term[0])
+        # the term frequency f of a document of length n scores weight * f / (f + fixed + per_word * n)
+        fixed = self.k1 * (1 - self.b)
+        per_word = self.k1 * self.b * count / self.total_length
+        lengths = self.lengths
+        scores = {}
+        # the most a document not scored yet can still get, a word never adds its whole weight
+        bound = sum(weight for weight, _ in terms)
+        for weight, docs in terms:
+            if allowed is not None:
+                pairs = ((doc, docs[doc]) for doc in allowed if doc in docs)
+            elif len(scores) >= limit and nlargest(limit, scores.values())[-1] >= bound:
+                pairs = ((doc, docs[doc]) for doc in scores if doc in docs)
+            else:
+                pairs = docs.items()
+            for doc, frequency in pairs:
+                scores[doc] = scores.get(doc, 0.0) + weight * frequency / (frequency + fixed + per_word * lengths[doc])
+            bound -= weight
+        if not phrases:
+            return [(score, doc) for doc, score in nlargest(limit, scores.items(), key=itemgetter(1))]
+        ranked = [(-score, doc) for doc, score in scores.items()]
+        heapify(ranked)
+        result = []
+        while ranked and len(result) < limit:
+            score, doc = heappop(ranked)
+            record = lookup(doc)
+            if all(self._has_phrase(record, phrase) for phrase in phrases):
+                result.append((-score, doc))
+        return result
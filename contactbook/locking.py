@@ -0,0 +1,61 @@
+__author__ = "VadimTrubay"
+
+try:
+    import fcntl
+except ImportError:
+    # advisory locks are POSIX only, elsewhere sessions are not kept from saving at the same time
+    fcntl = None
+
+
+class FileLock:
+    def __init__(self, file_name: str):
+        """
+        The __init__ function prepares the lock shared by all sessions using the same save files.
+        The lock file file_name.lock also holds the version of the save files,
+        a number every save increments, so a session can tell if another one saved since it loaded.
+        :param self: Represent the instance of the class
+        :param file_name: str: The save file name without the extension
+        """
+        self.path = f"{file_name}.lock"
+        self.file = None
+
+    def acquire(self, shared: bool = False, wait: bool = True) -> bool:
+        """
+        The acquire function locks the save files, for reading if shared or else for writing.
+        :param self: Represent the instance of the class
+        :param shared: bool: Let other readers in, but no writer
+        :param wait: bool: Wait for a session holding the lock, instead of giving up at once
+        :return: False if the lock is held by another session and wait is False
+        """
+        self.file = open(self.path, "a+b")
+        if fcntl is not None:
+            flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            try:
+                fcntl.flock(self.file.fileno(), flags if wait else flags | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.release()
+                return False
+        return True
+
+    def release(self):
+        if self.file is not None:
+            # closing the file drops the lock
+            self.file.close()
+            self.file = None
+
+    def version(self) -> int:
+        self.file.seek(0)
+        text = self.file.read().strip()
+        return int(text) if text else 0
+
+    def bump(self) -> int:
+        """
+        The bump function increments the version of the save files, once they are written.
+        :param self: Represent the instance of the class
+        :return: The new version
+        """
+        version = self.version() + 1
+        self.file.truncate(0)
+        self.file.write(str(version).encode())
+        self.file.flush()
+        return version
@@ -1,22 +1,56 @@
 __author__ = "VadimTrubay"
 
+import argparse
+import asyncio
 import os
 import os.path
 import pickle
 import re
+import shlex
 import shutil
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
+from bisect import bisect_left
 from collections import UserList
+from collections.abc import Mapping
 from datetime import datetime, timedelta, date
 from itertools import chain
+from operator import itemgetter
 from pathlib import Path
-from typing import Iterator
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, Sequence, Set, Tuple
 
 import numexpr
 from colorama import init
 
 from printing import *
 from logs import log
+from autosave import Autosaver
+from locking import FileLock
+from dedup import THRESHOLD, DuplicateReport, find_duplicates, merge_records
+from history import History
+from indexes import (
+    BirthdayIndex,
+    FacetIndex,
+    FuzzyIndex,
+    NgramIndex,
+    PhoneIndex,
+    SortedView,
+    TagIndex,
+    TextIndex,
+    email_domain,
+    next_anniversary,
+    parse_tags,
+)
+from paging import CalendarKeys, Cursor, Positions, SequenceSource, month_day_prefix, no_prefix, text_prefix
+from query import CASELESS_FIELDS, TEXT_OPERATORS, Condition, QueryResult, parse_query, run_query
+from server import READ_WORKERS, SAVE_INTERVAL, SERVER_HOST, HttpError, JsonServer, Route
+from shards import SHARD_COUNT, read_manifest, read_shards, shard_of, write_shards
+from storage import Journal, PackedRecords, is_packed, write_atomic, write_packed
+from sqlite_storage import SqliteContactTable, SqliteNoteTable, SqliteOrder, connect
+from transfer import export_contacts, export_notes, import_contacts, import_notes
+from validation import CONTACT_VALIDATOR, NOTE_VALIDATOR, STATUS_TYPES
 
 FIELDS_CONTACT = [
     "firstname",
@@ -29,6 +63,21 @@ FIELDS_CONTACT = [
     "note",
 ]
 FIELDS_NOTE = ["title", "note", "tag"]
+STORAGE = os.environ.get("CONTACTBOOK_STORAGE", "pickle")
+AUTOSAVE_DELAY = float(os.environ.get("CONTACTBOOK_AUTOSAVE_DELAY", "2"))
+SERVER_PAGE_SIZE = 100
+NAME_FIELDS_CONTACT = ("firstname", "lastname")
+CONTACT_ORDERS = ("added", "lastname", "birthday")
+NOTE_ORDERS = ("added", "title")
+SEARCH_FIELDS_CONTACT = ["firstname", "lastname",
+                         "phone", "address", "email", "note"]
+FACETS_CONTACT = {"status": itemgetter("status"), "domain": email_domain}
+
+
+class RecordExistsError(ValueError):
+    """
+    A change would give a record the name or title of another record.
+    """
 
 suff_dict = {
     "images": [
@@ -92,51 +141,43 @@ suff_dict = {
 }
 
 
-def iterator(n: int, data: list) -> Iterator[list]:
-    """
-    The iterator function takes a list of data and returns an iterator that yields
-    a sublist of the original list with n elements. The last sublist may have less than
-    n elements if the length of the original list is not divisible by n.
-    :param n: int: Specify the number of items in each chunk
-    :param data: list: Store the data that is to be iterated over
-    :return: A generator object
+def get_page(cursor: Cursor):
     """
-    index = 0
-    temp = []
-    for value in data:
-        temp.append(value)
-        index += 1
-        if index >= n:
-            yield temp
-            temp.clear()
-            index = 0
-    if temp:
-        yield temp
-
-
-def get_page(n: int, data):
+    The get_page function lets the user browse a book page by page through a cursor.
+    Enter shows the next page, p the previous one, a number jumps to that page
+    and /text to the first record whose sort key starts with the text.
+    :param cursor: Cursor: The cursor opened on the book
     """
-    The get_page function takes two arguments:
-        n - the number of records to display per page
-        data - a list of dictionaries containing the data to be displayed
-    :param n: int: Determine the number of records that will be printed per page
-    :param data: Pass the data to the generator function
-    :return: A generator object
-    """
-    gen = iterator(n, data)
-    for i in range(len(data)):
-        try:
-            result = next(gen)
-            for value in result:
-                print_record(value)
-            print_red_message(f"page {i + 1}")
-            input(Fore.YELLOW + f"< press enter for next page >")
-
-        except StopIteration:
+    while True:
+        for value in cursor.records:
+            print_record(value)
+        print_red_message(f"page {cursor.page_number} of {cursor.pages}")
+        command = input(
+            Fore.YELLOW
+            + "< enter - next page, p - previous, number - go to page, /text - find, q - quit >"
+        ).strip()
+        if command == "":
+            if not cursor.next():
+                break
+        elif command == "p":
+            if not cursor.previous():
+                print_red_message(f"this is the first page")
+        elif command.isdigit():
+            if not cursor.page(int(command)):
+                print_red_message(f"page {command} not found")
+        elif command.startswith("/"):
+            try:
+                if not cursor.seek(command[1:]):
+                    print_red_message(f"nothing found after '{command[1:]}'")
+            except ValueError as e:
+                print_red_message(f"{e}")
+        elif command == "q":
             break
 
 
-class RecordContactbook:
+class RecordContactbook(Mapping):
+    __slots__ = tuple(FIELDS_CONTACT)
+
     def __init__(
         self,
         firstname="",
@@ -157,11 +198,85 @@ class RecordContactbook:
         self.status = status
         self.note = note
 
+    def __getitem__(self, key: str) -> str:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"RecordContactbook({dict(self)})"
+
+    def __reduce__(self):
+        # pickled as a plain dict, so save files stay the same in both storage modes
+        return dict, (dict(self),)
+
 
 class Contactbook(UserList):
-    def __init__(self):
+    extension = "bin"
+    fields = FIELDS_CONTACT
+    background_save = True
+    undoable = True
+    # the records and everything built from them, swapped out as a whole by clear and merge
+    _state = (
+        "data",
+        "names",
+        "_name_duplicates",
+        "search",
+        "birthdays",
+        "name_view",
+        "lastname_view",
+        "fuzzy",
+        "phones",
+        "facets",
+        "_ids",
+        "_records",
+        "_next_rid",
+    )
+
+    def __init__(
+        self, compact: bool = False, journaled: bool = False, packed: bool = False
+    ):
+        """
+        The __init__ function creates an empty contactbook.
+        In compact mode the records are kept as slotted RecordContactbook objects instead of dictionaries,
+        which drops the per-record dictionary overhead and reads the same way.
+        In journaled mode save appends the changes to a journal next to the save file
+        instead of rewriting the whole book, and load replays that journal.
+        In packed mode the save file gets an offset table, load maps it into memory
+        and records are decoded only when they are read, until the book is first changed.
+        :param self: Represent the instance of the class
+        :param compact: bool: Store the records in the compact slotted form
+        :param journaled: bool: Persist the changes through an append-only journal
+        :param packed: bool: Save in the packed format that is opened lazily
+        """
         super().__init__()
+        self.compact = compact
+        self.journaled = journaled
+        self.packed = packed
+        self._journal = None
+        self._operations = []
+        self._rewrite = False
+        self.history = History()
+        self.save_lock = threading.Lock()
+        # every change bumps the generation, _dirty keeps each changed id with its record as last saved
+        self.generation = 0
+        self._dirty = {}
+        self._saved = None
+        # the version of the save files as this session last read or wrote them
+        self._version = None
         self.data = []
+        self._new_indexes()
 
     def __str__(self) -> List[str]:
         result = []
@@ -180,20 +295,337 @@ class Contactbook(UserList):
         return result
 
     def __setitem__(self, key, value):
-        self.data[key] = {
-            "firstname": value.firstname,
-            "lastname": value.lastname,
-            "phone": value.phone,
-            "birthday": value.birthday,
-            "address": value.address,
-            "email": value.email,
-            "status": value.status,
-            "note": value.note,
-        }
+        self._materialize()
+        position = key + len(self.data) if key < 0 else key
+        old = self.data[position]
+        self._replace_at(position, self._make_record(value))
+        self.history.record(f"replace '{old['firstname']} {old['lastname']}'", ("replace", position, old))
+        # the position tells apart contacts with the same name on replay
+        self._log_operation(
+            "replace", old["firstname"], old["lastname"], dict(self.data[position]), position
+        )
 
     def __getitem__(self, key) -> Dict:
         return self.data[key]
 
+    @property
+    def _lazy(self) -> bool:
+        return isinstance(self.data, PackedRecords)
+
+    def _materialize(self):
+        """
+        The _materialize function decodes a lazily opened packed book into memory and builds its indexes.
+        It runs before the first change or indexed query, browsing the book and name lookups do not need it.
+        :param self: Represent the instance of the class
+        """
+        if self._lazy:
+            packed_records = self.data
+            self.data = [self._make_record(item) for item in packed_records]
+            packed_records.close()
+            self._reindex()
+
+    def _dump(self, data, file):
+        if self.packed:
+            write_packed(data, file, NAME_FIELDS_CONTACT)
+        else:
+            pickle.dump(data if isinstance(data, list) else list(data), file)
+
+    def _make_record(self, source: Mapping) -> Mapping:
+        """
+        The _make_record function copies a record into the storage form of the contactbook.
+        :param self: Represent the instance of the class
+        :param source: Mapping: A RecordContactbook or a record dictionary
+        :return: A dictionary, or a RecordContactbook in compact mode
+        """
+        if self.compact:
+            return RecordContactbook(*(source[field] for field in FIELDS_CONTACT))
+        return {field: source[field] for field in FIELDS_CONTACT}
+
+    @staticmethod
+    def _name_key(record: Dict) -> Tuple[str, str]:
+        return record["firstname"], record["lastname"]
+
+    def _link(self, record: Dict, rid: Optional[int] = None) -> int:
+        """
+        The _link function registers a record in the indexes.
+        Record ids grow in the order of self.data, so sorting ids gives the order of a linear scan.
+        Of several records with the same name the first one wins, the same one a linear scan would find.
+        :param self: Represent the instance of the class
+        :param record: Dict: The record stored in self.data
+        :param rid: Optional[int]: Keep the id of a record that is relinked in place
+        :return: The id of the record
+        """
+        if rid is None:
+            rid = self._next_rid
+            self._next_rid += 1
+        self.generation += 1
+        if self._dirty is not None:
+            self._dirty.setdefault(rid, None)
+        self._ids[id(record)] = rid
+        self._records[rid] = record
+        key = self._name_key(record)
+        indexed = self.names.get(key)
+        if indexed is None:
+            self.names[key] = record
+        else:
+            self._name_duplicates[key] = self._name_duplicates.get(key, 0) + 1
+            if self._ids[id(indexed)] > rid:
+                self.names[key] = record
+        self.search.add(rid, record)
+        self.birthdays.add(rid, record)
+        self.name_view.add((*key, rid))
+        self.lastname_view.add((record["lastname"], record["firstname"], rid))
+        self.fuzzy.add(rid, record)
+        self.phones.add(rid, record)
+        self.facets.add(rid, record)
+        return rid
+
+    def _unlink(self, record: Dict) -> int:
+        """
+        The _unlink function removes a record from the indexes.
+        :param self: Represent the instance of the class
+        :param record: Dict: The record stored in self.data
+        :return: The id the record had
+        """
+        rid = self._ids.pop(id(record))
+        del self._records[rid]
+        self.generation += 1
+        if self._dirty is not None:
+            self._dirty.setdefault(rid, record)
+        key = self._name_key(record)
+        if key in self._name_duplicates:
+            self._name_duplicates[key] -= 1
+            if not self._name_duplicates[key]:
+                del self._name_duplicates[key]
+            if self.names[key] is record:
+                # rare: another contact has the same name, fall back to a scan for it
+                self.names[key] = next(
+                    item
+                    for item in self.data
+                    if item is not record and self._name_key(item) == key
+                )
+        elif self.names.get(key) is record:
+            del self.names[key]
+        self.search.remove(rid, record)
+        self.birthdays.remove(rid, record)
+        self.name_view.remove((*key, rid))
+        self.lastname_view.remove((record["lastname"], record["firstname"], rid))
+        self.fuzzy.remove(rid, record)
+        self.phones.remove(rid, record)
+        self.facets.remove(rid, record)
+        return rid
+
+    def _position(self, record: Dict) -> int:
+        """
+        The _position function finds where exactly this record object is in self.data.
+        Record ids grow along self.data, so the position is found by binary search on the id.
+        :param self: Represent the instance of the class
+        :param record: Dict: The record stored in self.data
+        :return: The index of the record in self.data
+        """
+        return bisect_left(
+            self.data, self._ids[id(record)], key=lambda item: self._ids[id(item)]
+        )
+
+    def _remove_record(self, record: Dict):
+        position = self._position(record)
+        inverse = self._remove_at(position)
+        self.history.record(f"delete '{record['firstname']} {record['lastname']}'", inverse)
+        self._log_operation("delete", record["firstname"], record["lastname"], position)
+
+    def _logged_contact(self, firstname: str, lastname: str, position: Optional[int] = None) -> Optional[Dict]:
+        """
+        The _logged_contact function finds the contact a journal operation was made on.
+        Of several contacts with the same name the one at the logged position is taken,
+        journals written before positions were logged and merged operations fall back to the name.
+        :param self: Represent the instance of the class
+        :param firstname: str: The firstname of the contact
+        :param lastname: str: The lastname of the contact
+        :param position: Optional[int]: The position of the contact in self.data when the operation was made
+        :return: The record dictionary or None if there is no such contact
+        """
+        if position is not None and position < len(self.data):
+            item = self.data[position]
+            if self._name_key(item) == (firstname, lastname):
+                return item
+        return self.find_contact(firstname, lastname)
+
+    def _new_indexes(self):
+        self.names = {}
+        self._name_duplicates = {}
+        self.search = NgramIndex(SEARCH_FIELDS_CONTACT)
+        self.birthdays = BirthdayIndex()
+        self.name_view = SortedView()
+        self.lastname_view = SortedView()
+        self.fuzzy = FuzzyIndex(list(NAME_FIELDS_CONTACT))
+        self.phones = PhoneIndex()
+        self.facets = FacetIndex(FACETS_CONTACT)
+        self._ids = {}
+        self._records = {}
+        self._next_rid = 0
+
+    def _detach(self) -> Dict:
+        """
+        The _detach function takes the records and their indexes out of the book as they are, leaving it empty.
+        Nothing is copied, so clearing a book of any size and undoing it are both instant.
+        :param self: Represent the instance of the class
+        :return: The detached state, to be given back to _swap
+        """
+        state = {name: getattr(self, name) for name in self._state}
+        self.data = []
+        self._new_indexes()
+        # the ids start over, changes can no longer be told apart from the whole book
+        self.generation += 1
+        self._dirty = None
+        return state
+
+    def _swap(self, state: Dict) -> tuple:
+        current = self._detach()
+        for name, value in state.items():
+            setattr(self, name, value)
+        return "swap", current
+
+    def _insert_at(self, position: int, record: Dict, rid: int) -> tuple:
+        # the record gets its old id back, ids still grow along self.data since no other record took it
+        self.data.insert(position, record)
+        self._link(record, rid)
+        return "remove", position
+
+    def _remove_at(self, position: int) -> tuple:
+        record = self.data.pop(position)
+        rid = self._unlink(record)
+        return "insert", position, record, rid
+
+    def _replace_at(self, position: int, record: Dict) -> tuple:
+        old = self.data[position]
+        rid = self._unlink(old)
+        self.data[position] = record
+        self._link(record, rid)
+        return "replace", position, old
+
+    def _apply_inverse(self, operation: tuple) -> tuple:
+        """
+        The _apply_inverse function runs an operation kept in the undo history.
+        :param self: Represent the instance of the class
+        :param operation: tuple: The operation name followed by its arguments
+        :return: The operation that reverts it
+        """
+        action, *args = operation
+        if action == "insert":
+            return self._insert_at(*args)
+        if action == "remove":
+            return self._remove_at(*args)
+        if action == "replace":
+            return self._replace_at(*args)
+        return self._swap(*args)
+
+    def undo(self) -> Optional[str]:
+        """
+        The undo function reverts the last change of the contactbook: add, edit, delete, clear or merge.
+        :param self: Represent the instance of the class
+        :return: The description of the reverted change, or None if there is nothing to undo
+        """
+        description = self.history.undo(self._apply_inverse)
+        if description is not None:
+            # the journal only moves forward, the next save writes the whole book instead
+            self._rewrite = True
+        return description
+
+    def redo(self) -> Optional[str]:
+        """
+        The redo function makes the last undone change of the contactbook again.
+        :param self: Represent the instance of the class
+        :return: The description of the change, or None if there is nothing to redo
+        """
+        description = self.history.redo(self._apply_inverse)
+        if description is not None:
+            self._rewrite = True
+        return description
+
+    def _log_operation(self, *operation):
+        if self.journaled:
+            self._operations.append(operation)
+
+    def _apply_operation(self, operation: tuple):
+        """
+        The _apply_operation function repeats an operation read back from the journal.
+        :param self: Represent the instance of the class
+        :param operation: tuple: The operation name followed by its arguments
+        """
+        self._materialize()
+        action, *args = operation
+        if action == "add":
+            self.add(args[0])
+        elif action == "edit":
+            self.edit(*args)
+        elif action == "delete":
+            item = self._logged_contact(*args)
+            if item is not None:
+                self._remove_record(item)
+        elif action == "replace":
+            item = self._logged_contact(args[0], args[1], *args[3:])
+            if item is not None:
+                self[self._position(item)] = args[2]
+        elif action == "clear":
+            self.clear_contactbook()
+        elif action == "merge":
+            self._merge(*args)
+
+    def _clear_indexes(self):
+        self.names.clear()
+        self._name_duplicates.clear()
+        self.search.clear()
+        self.birthdays.clear()
+        self.name_view.clear()
+        self.lastname_view.clear()
+        self.fuzzy.clear()
+        self.phones.clear()
+        self.facets.clear()
+        self._ids.clear()
+        self._records.clear()
+        self._next_rid = 0
+
+    def _reindex(self, rids: Optional[Sequence[int]] = None):
+        """
+        The _reindex function rebuilds the indexes from self.data in one pass.
+        :param self: Represent the instance of the class
+        :param rids: Optional[Sequence[int]]: The ids of the records in ascending order, 0, 1, 2... by default
+        """
+        self._clear_indexes()
+        for rid, record in zip(range(len(self.data)) if rids is None else rids, self.data):
+            self._ids[id(record)] = rid
+            self._records[rid] = record
+            key = self._name_key(record)
+            if key in self.names:
+                self._name_duplicates[key] = self._name_duplicates.get(
+                    key, 0) + 1
+            else:
+                self.names[key] = record
+        self._next_rid = len(self.data) if not rids else rids[-1] + 1
+        self.search.build(self._records)
+        self.birthdays.build(self._records)
+        self.name_view.build(
+            (*self._name_key(record), rid) for rid, record in self._records.items()
+        )
+        self.lastname_view.build(
+            (record["lastname"], record["firstname"], rid) for rid, record in self._records.items()
+        )
+        self.fuzzy.build(self._records)
+        self.phones.build(self._records)
+        self.facets.build(self._records)
+
+    def find_contact(self, firstname: str, lastname: str) -> Optional[Dict]:
+        """
+        The find_contact function returns the record with the given first and last name.
+        :param self: Represent the instance of the class
+        :param firstname: str: The firstname of the contact
+        :param lastname: str: The lastname of the contact
+        :return: The record dictionary or None if there is no such contact
+        """
+        if self._lazy:
+            return self.data.find(firstname, lastname)
+        return self.names.get((firstname, lastname))
+
     def add(self, record: RecordContactbook):
         """
         The add function adds a record to the contactbook.
@@ -203,35 +635,60 @@ class Contactbook(UserList):
         :param record: RecordContactbook: Pass the record object to the add function
         :return: Nothing, so it will return none
         """
-        rec = {
-            "firstname": record.firstname,
-            "lastname": record.lastname,
-            "phone": record.phone,
-            "birthday": record.birthday,
-            "address": record.address,
-            "email": record.email,
-            "status": record.status,
-            "note": record.note,
-        }
-
+        self._materialize()
+        rec = self._make_record(record)
         self.data.append(rec)
+        self._link(rec)
+        self.history.record(f"add '{rec['firstname']} {rec['lastname']}'", ("remove", len(self.data) - 1))
+        self._log_operation("add", dict(rec))
 
     def find_info(self, parameter: str, pattern: str) -> List:
         """
         The find_info function takes a parameter and a pattern as arguments.
             It then searches the data for any item that contains the pattern in its value for the given parameter.
             If it finds such an item, it appends that item to a list of results and returns this list.
+            Patterns of three or more characters are first narrowed down with the n-gram index.
+            Phones are compared by their digits only, see find_phone.
         :param self: Represent the instance of the class
         :param parameter: str: Specify the key in the dictionary
         :param pattern: str: Specify what you are looking for in the data
         :return: A list of dictionaries that match the pattern
         """
+        if parameter == "phone" and PhoneIndex.normalize(pattern):
+            return self.find_phone(pattern)
         result = []
-        for item in self.data:
-            if pattern in item[parameter]:
-                result.append(item)
+        candidates = None if self._lazy else self.search.candidates(
+            parameter, pattern)
+        if candidates is None:
+            for item in self.data:
+                if pattern in item[parameter]:
+                    result.append(item)
+        else:
+            for rid in sorted(candidates):
+                item = self._records[rid]
+                if pattern in item[parameter]:
+                    result.append(item)
         return result
 
+    def find_phone(self, number: str) -> List:
+        """
+        The find_phone function finds the contacts with a phone number written in any formatting,
+        so "+38 (050) 123-45-67", "0501234567" and the last 7 digits "1234567" find the same contact.
+        A number of 7 digits or more is a caller ID lookup in the phone index,
+        fewer digits are looked for anywhere in the phones.
+        :param self: Represent the instance of the class
+        :param number: str: The number or a part of it
+        :return: A list of dictionaries in book order
+        """
+        digits = PhoneIndex.normalize(number)
+        if self._lazy:
+            return [
+                item
+                for item in self.data
+                if self.phones.matches(PhoneIndex.normalize(item["phone"]), digits)
+            ]
+        return [self._records[rid] for rid in sorted(self.phones.find(digits))]
+
     def edit(self, firstname: str, lastname: str, parameter: str, new_value: str):
         """
         The edit function takes in a firstname, lastname, parameter and new_value.
@@ -244,12 +701,16 @@ class Contactbook(UserList):
         :param new_value: str: Define the new value that will be assigned to the parameter
         :return: Nothing, so it returns none
         """
-        for item in self.data:
-            if item["firstname"] == firstname and item["lastname"] == lastname:
-                item[parameter] = new_value
-                break
-            else:
-                continue
+        self._materialize()
+        item = self.find_contact(firstname, lastname)
+        if item is not None:
+            # records are replaced rather than changed in place, so the undo history and a copy taken
+            # for a background save stay valid
+            record = self._make_record(item)
+            record[parameter] = new_value
+            inverse = self._replace_at(self._position(item), record)
+            self.history.record(f"edit {parameter} of '{firstname} {lastname}'", inverse)
+            self._log_operation("edit", firstname, lastname, parameter, new_value)
 
     @staticmethod
     def __get_current_week() -> List:
@@ -271,88 +732,878 @@ class Contactbook(UserList):
             "thursday": [],
             "friday": [],
         }
-        for item in self.data:
-            if item["birthday"]:
-                birthday = item["birthday"]
-                try:
-                    birth_day = datetime.strptime(birthday, "%d.%m.%Y")
-                except:
-                    continue
-                birth_day = date(
-                    birth_day.year, birth_day.month, birth_day.day)
-                current_date = date.today()
-                new_birthday = birth_day.replace(year=current_date.year)
-                birthday_weekday = new_birthday.weekday() + 1
-                if (
-                    self.__get_current_week()[0]
-                    <= new_birthday
-                    <= self.__get_current_week()[1]
-                ):
-                    if birthday_weekday <= 5:
-                        congratulate[weekdays[birthday_weekday]].append(
-                            item["firstname"] + " " + item["lastname"]
-                        )
-                    else:
-                        congratulate["monday"].append(
-                            item["firstname"] + " " + item["lastname"]
-                        )
+        week_start, week_end = self.__get_current_week()
+        for birthday, item in self._birthdays_between(week_start, week_end):
+            birthday_weekday = birthday.weekday() + 1
+            if birthday_weekday <= 5:
+                congratulate[weekdays[birthday_weekday]].append(
+                    item["firstname"] + " " + item["lastname"]
+                )
+            else:
+                congratulate["monday"].append(
+                    item["firstname"] + " " + item["lastname"]
+                )
         return congratulate
 
     def days_to_birthday(self, firstname: str, lastname: str):
         days = 0
-        for item in self.data:
-            if firstname == item["firstname"] and lastname == item["lastname"]:
-                birthday = item["birthday"]
-                try:
-                    birth_day = datetime.strptime(birthday, "%d.%m.%Y")
-                except:
-                    print_red_message(
-                        f"not a valid birthday date for '{firstname} {lastname}' contact"
-                    )
-                    break
-                birth_day = date(
-                    birth_day.year, birth_day.month, birth_day.day)
-                current_date = date.today()
-                user_date = birth_day.replace(year=current_date.year)
-                delta_days = user_date - current_date
-                if delta_days.days >= 0:
-                    days = delta_days.days
-                else:
-                    user_date = user_date.replace(year=user_date.year + 1)
-                    delta_days = user_date - current_date
-                    days = delta_days.days
-                break
+        item = self.find_contact(firstname, lastname)
+        if item is not None:
+            current_date = date.today()
+            next_birthday = self._next_birthday(item, current_date)
+            if next_birthday is None:
+                print_red_message(
+                    f"not a valid birthday date for '{firstname} {lastname}' contact"
+                )
+                return days
+            days = (next_birthday - current_date).days
 
         return days
 
+    def upcoming_birthdays(self, days: int) -> List[Tuple[date, Dict]]:
+        """
+        The upcoming_birthdays function finds the contacts whose birthday is within the given number of days.
+        :param self: Represent the instance of the class
+        :param days: int: How many days from today to look ahead, today included
+        :return: A list of (birthday date, record) tuples ordered by date
+        """
+        current_date = date.today()
+        return self._birthdays_between(
+            current_date, current_date + timedelta(days=days)
+        )
+
+    def _birthdays_between(self, start: date, end: date) -> List[Tuple[date, Dict]]:
+        self._materialize()
+        return [
+            (birthday, self._records[rid])
+            for birthday, rid in self.birthdays.between(start, end)
+        ]
+
+    def _next_birthday(self, item: Dict, current_date: date) -> Optional[date]:
+        rid = self._ids.get(id(item))
+        if rid is not None:
+            return self.birthdays.next_birthday(rid, current_date)
+        birth_day = BirthdayIndex.parse(item["birthday"])
+        if birth_day is None:
+            return None
+        return next_anniversary(birth_day, current_date)
+
     def delete(self, firstname: str, lastname: str):
-        for item in self.data:
-            if firstname == item["firstname"] and lastname == item["lastname"]:
-                print_yellow_message(
-                    f"are you sure for delete '{firstname} {lastname}' contact? (y/n)"
-                )
-                del_contact = input(Fore.BLUE + ">>>: ")
-                if del_contact == "y":
-                    self.data.remove(item)
-                    break
-                else:
-                    break
+        if self.find_contact(firstname, lastname) is not None:
+            print_yellow_message(
+                f"are you sure for delete '{firstname} {lastname}' contact? (y/n)"
+            )
+            del_contact = input(Fore.BLUE + ">>>: ")
+            if del_contact == "y":
+                self.delete_contact(firstname, lastname)
+
+    def delete_contact(self, firstname: str, lastname: str) -> Optional[Dict]:
+        """
+        The delete_contact function deletes a contact without asking, recording it in the undo history and the journal.
+        :param self: Represent the instance of the class
+        :param firstname: str: The firstname of the contact
+        :param lastname: str: The lastname of the contact
+        :return: The deleted record, or None if there is no such contact
+        """
+        self._materialize()
+        item = self.find_contact(firstname, lastname)
+        if item is not None:
+            self._remove_record(item)
+        return item
+
+    def rename(self, firstname: str, lastname: str, new_firstname: str, new_lastname: str) -> Optional[Dict]:
+        """
+        The rename function changes the first and last name of a contact, refusing a name another contact has.
+        :param self: Represent the instance of the class
+        :param firstname: str: The firstname of the contact
+        :param lastname: str: The lastname of the contact
+        :param new_firstname: str: The new firstname
+        :param new_lastname: str: The new lastname
+        :return: The renamed record, or None if there is no such contact
+        """
+        self._materialize()
+        item = self.find_contact(firstname, lastname)
+        if item is None:
+            return None
+        if (new_firstname, new_lastname) == (firstname, lastname):
+            return item
+        if self.find_contact(new_firstname, new_lastname) is not None:
+            raise RecordExistsError(f"contact '{new_firstname} {new_lastname}' already exists")
+        self._rename(item, new_firstname, new_lastname)
+        return self.find_contact(new_firstname, new_lastname)
+
+    def _rename(self, item: Dict, firstname: str, lastname: str):
+        # both names change in one replace, so a rename is one undo step and one journal operation
+        position = self._position(item)
+        record = self._make_record(item)
+        record["firstname"], record["lastname"] = firstname, lastname
+        inverse = self._replace_at(position, record)
+        self.history.record(f"rename '{item['firstname']} {item['lastname']}'", inverse)
+        self._log_operation("replace", item["firstname"], item["lastname"], dict(record), position)
 
     def clear_contactbook(self):
-        self.data.clear()
+        self._materialize()
+        self.history.record("clear contactbook", ("swap", self._detach()))
+        self._log_operation("clear")
+
+    def find_duplicates(self, threshold: float = THRESHOLD) -> DuplicateReport:
+        """
+        The find_duplicates function finds the groups of contacts that are probably the same person,
+        such as the same phone in another formatting or the same email under another spelling of the name.
+        :param self: Represent the instance of the class
+        :param threshold: float: The score from 0 to 1 from which contacts count as duplicates
+        :return: A DuplicateReport whose clusters are lists of record ids, see duplicate_records
+        """
+        self._materialize()
+        return find_duplicates(self._records, threshold)
+
+    def duplicate_records(self, cluster: List[int]) -> List[Dict]:
+        return [self._records[rid] for rid in cluster]
+
+    def merge_duplicates(self, clusters: List[List[int]]) -> int:
+        """
+        The merge_duplicates function folds every cluster of duplicates into its first contact in book order.
+        Empty fields of that contact are filled from the others, notes are joined, the others are deleted.
+        All clusters are merged in one pass over the book and the indexes are rebuilt once.
+        :param self: Represent the instance of the class
+        :param clusters: List[List[int]]: Clusters of record ids from find_duplicates, on the unchanged book
+        :return: The number of deleted contacts
+        """
+        self._materialize()
+        merged, removed = [], []
+        for cluster in clusters:
+            if len(cluster) < 2:
+                continue
+            records = sorted(self.duplicate_records(cluster), key=self._position)
+            merged.append((self._position(records[0]), merge_records(records, FIELDS_CONTACT)))
+            removed.extend(self._position(record) for record in records[1:])
+        removed.sort()
+        self.history.record(f"merge {len(removed)} duplicates", ("swap", self._merge(merged, removed)))
+        # positions repeat exactly on replay, unlike names which duplicates may share
+        self._log_operation("merge", merged, removed)
+        return len(removed)
+
+    def _merge(self, merged: List[Tuple[int, Dict]], removed: List[int]) -> Dict:
+        data = list(self.data)
+        for position, record in merged:
+            data[position] = self._make_record(record)
+        removed = set(removed)
+        state = self._detach()
+        self.data = [item for position, item in enumerate(data) if position not in removed]
+        self._reindex()
+        return state
+
+    def _query_lookup(self, condition: Condition) -> Optional[Tuple[str, Set[int]]]:
+        """
+        The _query_lookup function offers the query planner the most selective index for a condition.
+        :param self: Represent the instance of the class
+        :param condition: Condition: One condition of the query
+        :return: (description of the index, candidate record ids) or None if no index fits
+        """
+        field, operator, value = condition.field, condition.operator, condition.value
+        options = []
+        if field == "firstname" and operator == "=":
+            keys = self.name_view.range((value,), (value, chr(0x10FFFF)))
+            options.append(("name view", {rid for _, _, rid in keys}))
+        elif field == "firstname" and operator == "^=":
+            options.append(("name view", {rid for _, _, rid in self.name_view.prefix(value)}))
+        if field == "birthday" and operator == "in":
+            options.append(("birthday index", self.birthdays.on_days(condition.days)))
+        if field == "phone" and operator in ("=", "$="):
+            # a phone equal to or ending with the value ends with its digits too
+            digits = PhoneIndex.normalize(value)
+            if len(digits) >= self.phones.tail_length:
+                options.append(("phone digits index", self.phones.find(digits)))
+        if field == "status" and operator == "=":
+            options.append(("status bitmap", set(self.facets.ids(self.facets.bits("status", value)))))
+        if field == "email" and operator == "$=" and value.startswith("@") and value.count("@") == 1:
+            bits = self.facets.bits("domain", value[1:])
+            options.append(("email domain bitmap", set(self.facets.ids(bits))))
+        if operator in TEXT_OPERATORS and field not in CASELESS_FIELDS:
+            # the n-gram index keeps the case of the text
+            ids = self.search.candidates(field, value)
+            if ids is not None:
+                options.append((f"{field} n-gram index", ids))
+        if not options:
+            return None
+        return min(options, key=lambda option: len(option[1]))
+
+    def query(self, text: str) -> QueryResult:
+        """
+        The query function finds the contacts matching a query over several fields, for example
+        status = work AND birthday in march AND email $= @corp.com
+        Conditions are = equal, ^= starts with, $= ends with, ~ contains, <, <=, >, >= compare
+        (birthdays as dates dd.mm.YYYY) and birthday in a month or in days like 20.12..10.01,
+        joined with AND, OR, NOT and parentheses. The planner narrows the contacts down with the indexes first.
+        :param self: Represent the instance of the class
+        :param text: str: The query
+        :return: A QueryResult with the contacts in book order, the plan and the time of each phase
+        """
+        self._materialize()
+        return run_query(text, FIELDS_CONTACT, self._query_lookup, self._records)
+
+    @staticmethod
+    def _facet_filters(status: Optional[str], domain: Optional[str]) -> Dict[str, str]:
+        filters = {}
+        if status is not None:
+            filters["status"] = status
+        if domain is not None:
+            filters["domain"] = domain.strip().lstrip("@").lower()
+        return filters
+
+    def statistics(self, status: Optional[str] = None, domain: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """
+        The statistics function counts the contacts per status and per email domain from the facet bitmaps.
+        Given a status or a domain, only the contacts having it are counted, so the domains of the work contacts
+        are one AND of two bitmaps and a popcount per domain.
+        :param self: Represent the instance of the class
+        :param status: Optional[str]: Count only the contacts with this status, "" for no status
+        :param domain: Optional[str]: Count only the contacts with an email at this domain
+        :return: The counts by value of the facets "status" and "domain"
+        """
+        self._materialize()
+        within = self.facets.select(**self._facet_filters(status, domain))
+        return {name: self.facets.counts(name, within) for name in FACETS_CONTACT}
+
+    def facet_contacts(self, status: Optional[str] = None, domain: Optional[str] = None) -> List[Dict]:
+        """
+        The facet_contacts function lists the contacts having a status, an email domain or both,
+        read from the AND of their facet bitmaps.
+        :param self: Represent the instance of the class
+        :param status: Optional[str]: The status of the contacts, "" for no status
+        :param domain: Optional[str]: The domain of the email of the contacts
+        :return: A list of dictionaries in book order
+        """
+        filters = self._facet_filters(status, domain)
+        if not filters:
+            raise ValueError("enter a status or an email domain")
+        self._materialize()
+        return [self._records[rid] for rid in self.facets.ids(self.facets.select(**filters))]
+
+    def fuzzy_find(self, text: str, limit: int = 10) -> List[Tuple[int, Dict]]:
+        """
+        The fuzzy_find function finds the contacts whose names are closest to a text that may contain typos,
+        up to two edits per name away.
+        :param self: Represent the instance of the class
+        :param text: str: A first name or last name, or a first name and a last name
+        :param limit: int: How many contacts to return at most
+        :return: A list of (edit distance, record) tuples, closest first
+        """
+        self._materialize()
+        return [
+            (distance, self._records[rid])
+            for distance, rid in self.fuzzy.search(text.strip().lower(), limit)
+        ]
+
+    def sorted_names(self, prefix: str = "") -> Iterator[str]:
+        """
+        The sorted_names function lists the names of the contacts in alphabetical order
+        from the name view kept sorted as contacts are added, renamed and deleted.
+        :param self: Represent the instance of the class
+        :param prefix: str: List only the contacts whose firstname starts with it
+        :return: An iterator of "firstname lastname" strings
+        """
+        if self._lazy and not self.name_view:
+            # an unchanged packed book has no ids yet, its positions serve as ids
+            self.name_view.build(
+                (*self._name_key(record), rid) for rid, record in enumerate(self.data)
+            )
+        for firstname, lastname, _ in self.name_view.prefix(prefix):
+            yield f"{firstname} {lastname}"
+
+    def cursor(self, order: str = "added", page_size: int = 10) -> Cursor:
+        """
+        The cursor function opens a page cursor on the contactbook.
+        The sort keys are read from the lastname view and the birthday calendar the book keeps up to date,
+        so opening a cursor sorts nothing. Records are read when their page is shown,
+        which for a lazily opened packed book means they are decoded only then.
+        :param self: Represent the instance of the class
+        :param order: str: One of CONTACT_ORDERS: the order contacts were added in, by lastname or by birthday
+        :param page_size: int: The number of contacts per page
+        :return: A Cursor on the first page
+        """
+        if order == "added":
+            return Cursor(
+                SequenceSource(Positions(len(self.data)), lambda key: self.data[key[0]], no_prefix),
+                page_size,
+            )
+        if order == "lastname":
+            if self._lazy and not self.lastname_view:
+                # an unchanged packed book has no ids yet, its positions serve as ids
+                self.lastname_view.build(
+                    (record["lastname"], record["firstname"], rid) for rid, record in enumerate(self.data)
+                )
+            keys = self.lastname_view.keys
+            prefix = text_prefix
+        elif order == "birthday":
+            if self._lazy and not self.birthdays:
+                self.birthdays.build(dict(enumerate(self.data)))
+            keys = CalendarKeys(*self.birthdays.ordered())
+            prefix = month_day_prefix
+        else:
+            raise ValueError(f"incorrect sort key - '{order}'")
+        lookup = self.data if self._lazy else self._records
+        return Cursor(SequenceSource(keys, lambda key: lookup[key[-1]], prefix), page_size)
+
+    def _snapshot(self) -> Tuple[Optional[Sequence], Callable[[Sequence, BinaryIO], None]]:
+        if self._lazy:
+            # an unchanged packed book is saved by copying its file, without decoding a record
+            path = self.data.path
+
+            def copy(data, file):
+                with open(path, "rb") as source:
+                    shutil.copyfileobj(source, file)
+
+            return None, copy
+        return list(self.data), self._dump
+
+    @property
+    def dirty(self) -> bool:
+        return self._saved is None or self._saved[1] != self.generation
+
+    def needs_save(self, file_name: str) -> bool:
+        return self._saved != (file_name, self.generation)
+
+    def changes(self) -> Optional[List[Tuple[Optional[Mapping], Optional[Mapping]]]]:
+        """
+        The changes function lists the records changed since the contactbook was last loaded or saved.
+        A record edited and changed back, or added and deleted again, is not listed.
+        :param self: Represent the instance of the class
+        :return: (before, after) pairs in the order the records were added, before is None for an added record
+            and after is None for a deleted one, or None if the whole book was replaced by clear, merge or their undo
+        """
+        if self._dirty is None:
+            return None
+        result = []
+        for rid, before in sorted(self._dirty.items(), key=itemgetter(0)):
+            after = self._records.get(rid)
+            if before is None and after is None:
+                continue
+            if before is not None and after is not None and dict(before) == dict(after):
+                continue
+            result.append((before, after))
+        return result
+
+    def _mark_saved(self, file_name: str, write: Callable[[], None]) -> Callable[[], None]:
+        self._saved = (file_name, self.generation)
+        self._dirty = {}
+
+        def run():
+            try:
+                write()
+            except Exception:
+                # the next save writes the whole book again
+                self._saved = None
+                self._dirty = None
+                self._rewrite = True
+                raise
+
+        return run
+
+    def _write_changes(self, file_name: str) -> Callable[[], None]:
+        if not self.journaled:
+            data, dump = self._snapshot()
+            self._rewrite = False
+            return self._mark_saved(file_name, lambda: write_atomic(f"{file_name}.bin", lambda file: dump(data, file)))
+        if self._journal is None or self._journal.file_name != file_name or self._rewrite:
+            self._journal = Journal(file_name)
+            compact = True
+        else:
+            compact = self._journal.needs_compaction(len(self.data), len(self._operations))
+        journal = self._journal
+        operations, self._operations = self._operations, []
+        self._rewrite = False
+        if compact:
+            data, dump = self._snapshot()
+            return self._mark_saved(file_name, lambda: journal.compact(data, dump))
+        return self._mark_saved(file_name, lambda: journal.append(operations) if operations else None)
+
+    def _operation_keys(self, operation: tuple) -> Optional[List[Tuple[str, str]]]:
+        action, *args = operation
+        if action == "add":
+            return [self._name_key(args[0])]
+        if action == "edit":
+            firstname, lastname, parameter, value = args
+            if parameter == "firstname":
+                return [(firstname, lastname), (value, lastname)]
+            if parameter == "lastname":
+                return [(firstname, lastname), (firstname, value)]
+            return [(firstname, lastname)]
+        if action == "delete":
+            return [(args[0], args[1])]
+        if action == "replace":
+            return [(args[0], args[1]), self._name_key(args[2])]
+        # clear and merge change the whole book
+        return None
+
+    def _put(self, key: Tuple[str, str], record: Optional[Mapping]) -> Optional[tuple]:
+        """
+        The _put function sets the contact with a name to the given version, or deletes it,
+        without recording it in the journal or the undo history.
+        :param self: Represent the instance of the class
+        :param key: Tuple[str, str]: The firstname and lastname
+        :param record: Optional[Mapping]: The new version of the contact, None to delete it
+        :return: The journal operation doing the same, or None if nothing changed
+        """
+        self._materialize()
+        item = self.find_contact(*key)
+        if record is None:
+            if item is None:
+                return None
+            self._remove_at(self._position(item))
+            return ("delete", *key)
+        if item is None:
+            self._insert_at(len(self.data), self._make_record(record), None)
+            return "add", dict(record)
+        self._replace_at(self._position(item), self._make_record(record))
+        return ("replace", *key, dict(record))
+
+    def _prepare_merge(self, file_name: str) -> Callable[[], None]:
+        """
+        The _prepare_merge function prepares a save over files another session has saved to since this one read them.
+        The two sessions are merged record by record: a contact changed in this session keeps its version
+        from this session, any other contact gets its version from the files, and the book takes the merged state.
+        If the other session only appended to the journal, just its new operations are read and replayed
+        on the contacts they touch, otherwise the files are loaded again.
+        A clear or a merge of duplicates changes the whole book, so it still overwrites the files.
+        :param self: Represent the instance of the class
+        :param file_name: str: The save file name without the extension
+        :return: A function writing the save files
+        """
+        pairs = self.changes()
+        # the positions kept in the history no longer match the merged book
+        self.history.clear()
+        if pairs is None:
+            self._rewrite = True
+            return self._write_changes(file_name)
+        saved = {}
+        final = {}
+        for before, after in pairs:
+            if before is not None:
+                saved[self._name_key(before)] = before
+                final.setdefault(self._name_key(before), None)
+        for before, after in pairs:
+            if after is not None:
+                final[self._name_key(after)] = after
+        operations = self._journal.read_new() if self.journaled and self._journal is not None else None
+        keys = set()
+        for operation in operations or []:
+            operation_keys = self._operation_keys(operation)
+            if operation_keys is None:
+                operations = None
+                break
+            keys.update(operation_keys)
+        if operations is not None:
+            # the files as they are now, for the contacts touched by either session
+            scratch = Contactbook()
+            for key in keys | final.keys():
+                record = saved.get(key) if key in final else self.find_contact(*key)
+                if record is not None:
+                    scratch.add(record)
+            for operation in operations:
+                scratch._apply_operation(operation)
+            for key in keys - final.keys():
+                self._put(key, scratch.find_contact(*key))
+            operations = [scratch._put(key, record) for key, record in final.items()]
+        else:
+            theirs = self._blank()
+            theirs._read(file_name)
+            theirs._dirty = {}
+            operations = [theirs._put(key, record) for key, record in final.items()]
+            dirty = theirs._dirty
+            self._swap(theirs._detach())
+            # against the files, only the contacts of this session changed
+            self._dirty = dirty
+            self._journal = theirs._journal
+        self._operations = [operation for operation in operations if operation is not None]
+        self._rewrite = False
+        return self._write_changes(file_name)
+
+    def _blank(self) -> "Contactbook":
+        return type(self)(compact=self.compact, journaled=self.journaled, packed=self.packed)
+
+    def prepare_save(self, file_name: str, wait: bool = True) -> Optional[Callable[[], None]]:
+        """
+        The prepare_save function takes what a save of the contactbook has to write, without writing anything.
+        It copies only the list of records, which are replaced rather than changed in place,
+        or just takes the operations to append to the journal, so it is quick for a book of any size.
+        The returned function does the writing and may run on another thread while the book changes.
+        Both run with save_lock held, so the saves are written in the order they were prepared.
+        The save files stay locked against other sessions until they are written,
+        and if another session has saved to them since this one read them, the two are merged, see _prepare_merge.
+        :param self: Represent the instance of the class
+        :param file_name: str: The save file name without the extension
+        :param wait: bool: Wait for another session saving to the same files, instead of giving up
+        :return: A function writing the save files, which does nothing if the file is up to date,
+            or None if another session is saving and wait is False
+        """
+        if not self.needs_save(file_name):
+            return lambda: None
+        lock = FileLock(file_name)
+        if not lock.acquire(wait=wait):
+            return None
+        try:
+            if self._saved is not None and self._saved[0] == file_name and lock.version() != self._version:
+                write = self._prepare_merge(file_name)
+            else:
+                write = self._write_changes(file_name)
+        except Exception:
+            lock.release()
+            raise
+
+        def run():
+            try:
+                write()
+                self._version = lock.bump()
+            finally:
+                lock.release()
+
+        return run
 
     def save(self, file_name: str):
-        with open(f"{file_name}.bin", "wb") as file:
-            pickle.dump(self.data, file)
+        """
+        The save function writes the contactbook to the file_name.bin file.
+        In journaled mode only the operations made since the last save are appended to file_name.journal,
+        and the journal is folded into a new snapshot once it outgrows the book.
+        Snapshots are written to a temporary file first, so a crash never leaves a half written save file.
+        Nothing is written if the book has not changed since it was loaded from or saved to file_name.
+        Changes another session saved to the same files meanwhile are kept, see _prepare_merge.
+        :param self: Represent the instance of the class
+        :param file_name: str: The save file name without the extension
+        """
+        with self.save_lock:
+            self.prepare_save(file_name)()
 
-    def load(self, file_name: str):
+    def _read(self, file_name: str):
         empty_ness = os.stat(f"{file_name}.bin")
         if empty_ness.st_size != 0:
-            with open(f"{file_name}.bin", "rb") as file:
-                self.data = pickle.load(file)
+            if self._lazy:
+                self.data.close()
+            if is_packed(f"{file_name}.bin"):
+                self.data = PackedRecords(
+                    f"{file_name}.bin", NAME_FIELDS_CONTACT)
+                self._clear_indexes()
+            else:
+                with open(f"{file_name}.bin", "rb") as file:
+                    self.data = pickle.load(file)
+                if self.compact:
+                    self.data = [self._make_record(item)
+                                 for item in self.data]
+                self._reindex()
+        journal = Journal(file_name)
+        # the changes a journaled session left are read by any book, so turning the journal off loses nothing
+        if self.journaled or os.path.exists(journal.path):
+            for operation in journal.replay():
+                self._apply_operation(operation)
+            self._operations = []
+        if self.journaled:
+            self._journal = journal
+
+    def load(self, file_name: str):
+        # wait for a background save in progress, and for other sessions writing the files
+        with self.save_lock:
+            lock = FileLock(file_name)
+            lock.acquire(shared=True)
+            try:
+                self._read(file_name)
+                self._version = lock.version()
+            finally:
+                lock.release()
+        self._rewrite = False
+        self.history.clear()
+        self._dirty = {}
+        self._saved = (file_name, self.generation)
         return self.data
 
 
+class SqliteContactbook(Contactbook):
+    extension = "db"
+    # the connection belongs to the thread that opened it
+    background_save = False
+    # changes go straight to the database, there is no history to undo, the menu leaves undo and redo out
+    undoable = False
+
+    def __init__(self):
+        """
+        The __init__ function creates a contactbook kept in an SQLite database instead of memory.
+        Records are read from the database when they are needed, so opening a big book is instant.
+        :param self: Represent the instance of the class
+        """
+        super().__init__()
+        self.file_name = None
+        self.connection = None
+        self.table = None
+        self._fuzzy_built = False
+
+    def __str__(self) -> List[str]:
+        return [
+            "".join(f"{field}: {item[field]}\n" for field in FIELDS_CONTACT)
+            for item in self
+        ]
+
+    def __len__(self) -> int:
+        return self.table.count() if self.table else 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.table.rows() if self.table else iter(())
+
+    def __getitem__(self, key: int) -> Dict:
+        if key < 0:
+            key += len(self)
+        records = self.table.page(key, 1) if self.table and key >= 0 else []
+        if not records:
+            raise IndexError("list index out of range")
+        return records[0]
+
+    def __setitem__(self, key: int, value):
+        if key < 0:
+            key += len(self)
+        if self._fuzzy_built:
+            row_id = self.table._row_id(key)
+            self.fuzzy.remove(row_id, self.table.get(row_id))
+            self.fuzzy.add(row_id, value)
+        self.table.replace(key, self._make_record(value))
+
+    def find_contact(self, firstname: str, lastname: str) -> Optional[Dict]:
+        return self.table.find(firstname, lastname)
+
+    def add(self, record: RecordContactbook):
+        row_id = self.table.insert(self._make_record(record))
+        if self._fuzzy_built:
+            self.fuzzy.add(row_id, record)
+
+    def find_info(self, parameter: str, pattern: str) -> List:
+        if parameter == "phone" and PhoneIndex.normalize(pattern):
+            return self.find_phone(pattern)
+        return self.table.search(parameter, pattern)
+
+    def find_phone(self, number: str) -> List:
+        return self.table.find_phone(PhoneIndex.normalize(number))
+
+    def statistics(self, status: Optional[str] = None, domain: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        return self.table.facet_counts(self._facet_filters(status, domain))
+
+    def facet_contacts(self, status: Optional[str] = None, domain: Optional[str] = None) -> List[Dict]:
+        filters = self._facet_filters(status, domain)
+        if not filters:
+            raise ValueError("enter a status or an email domain")
+        return self.table.facet_rows(filters)
+
+    def edit(self, firstname: str, lastname: str, parameter: str, new_value: str):
+        row_id = self.table.find_id(firstname, lastname)
+        self.table.update((firstname, lastname), parameter, new_value)
+        if self._fuzzy_built and row_id is not None and parameter in NAME_FIELDS_CONTACT:
+            old = {"firstname": firstname, "lastname": lastname}
+            self.fuzzy.remove(row_id, old)
+            self.fuzzy.add(row_id, {**old, parameter: new_value})
+
+    def _rename(self, item: Dict, firstname: str, lastname: str):
+        self.edit(item["firstname"], item["lastname"], "firstname", firstname)
+        self.edit(firstname, item["lastname"], "lastname", lastname)
+
+    def fuzzy_find(self, text: str, limit: int = 10) -> List[Tuple[int, Dict]]:
+        if not self.table:
+            return []
+        if not self._fuzzy_built:
+            # built on the first search and kept up to date after, so opening the database stays instant
+            for row_id, record in self.table.id_rows():
+                self.fuzzy.add(row_id, record)
+            self._fuzzy_built = True
+        return [
+            (distance, self.table.get(row_id))
+            for distance, row_id in self.fuzzy.search(text.strip().lower(), limit)
+        ]
+
+    def find_duplicates(self, threshold: float = THRESHOLD) -> DuplicateReport:
+        return find_duplicates(dict(self.table.id_rows()), threshold)
+
+    def duplicate_records(self, cluster: List[int]) -> List[Dict]:
+        return [self.table.get(row_id) for row_id in cluster]
+
+    def merge_duplicates(self, clusters: List[List[int]]) -> int:
+        removed = []
+        for cluster in clusters:
+            if len(cluster) < 2:
+                continue
+            cluster = sorted(cluster)
+            self.table.replace_row(cluster[0], merge_records(self.duplicate_records(cluster), FIELDS_CONTACT))
+            removed.extend(cluster[1:])
+        self.table.delete_rows(removed)
+        # the name index is built again on the next typo tolerant search
+        self.fuzzy.clear()
+        self._fuzzy_built = False
+        return len(removed)
+
+    def _birthdays_between(self, start: date, end: date) -> List[Tuple[date, Dict]]:
+        return self.table.birthdays_between(start, end)
+
+    def _next_birthday(self, item: Dict, current_date: date) -> Optional[date]:
+        birth_day = BirthdayIndex.parse(item["birthday"])
+        if birth_day is None:
+            return None
+        return next_anniversary(birth_day, current_date)
+
+    def query(self, text: str) -> QueryResult:
+        start = time.perf_counter()
+        node = parse_query(text, FIELDS_CONTACT)
+        parsed = time.perf_counter()
+        records, plan = self.table.query(node)
+        checked = time.perf_counter()
+        plan.append(f"{len(records)} matches")
+        return QueryResult(records, plan, {"parse": parsed - start, "query": checked - parsed})
+
+    def sorted_names(self, prefix: str = "") -> Iterator[str]:
+        for firstname, lastname in self.table.sorted_keys(prefix):
+            yield f"{firstname} {lastname}"
+
+    def cursor(self, order: str = "added", page_size: int = 10) -> Cursor:
+        orders = {
+            "added": ((), no_prefix),
+            "lastname": (("lastname", "firstname"), text_prefix),
+            "birthday": (("birth_month_day",), month_day_prefix),
+        }
+        if order not in orders:
+            raise ValueError(f"incorrect sort key - '{order}'")
+        return Cursor(SqliteOrder(self.table, *orders[order]), page_size)
+
+    def _remove_record(self, record: Dict):
+        if self._fuzzy_built:
+            row_id = self.table.find_id(record["firstname"], record["lastname"])
+            self.fuzzy.remove(row_id, record)
+        self.table.delete(record["firstname"], record["lastname"])
+
+    def clear_contactbook(self):
+        self.table.clear()
+        self.fuzzy.clear()
+
+    def undo(self) -> Optional[str]:
+        raise ValueError("undo is not available with the SQLite storage")
+
+    def redo(self) -> Optional[str]:
+        raise ValueError("redo is not available with the SQLite storage")
+
+    @property
+    def dirty(self) -> bool:
+        # changes stay in an open transaction until save commits them
+        return self.connection is not None and self.connection.in_transaction
+
+    def needs_save(self, file_name: str) -> bool:
+        return self.connection is None or file_name != self.file_name or self.connection.in_transaction
+
+    def changes(self):
+        raise ValueError("changes are not tracked with the SQLite storage")
+
+    def save(self, file_name: str):
+        """
+        The save function commits the changes to the database file_name.db.
+        Saving under another name copies the database with the SQLite backup API.
+        :param self: Represent the instance of the class
+        :param file_name: str: The database file name without the extension
+        """
+        if self.connection is None:
+            self.load(file_name)
+        self.connection.commit()
+        if file_name != self.file_name:
+            target = connect(file_name)
+            self.connection.backup(target)
+            target.close()
+
+    def load(self, file_name: str):
+        if self.connection is not None:
+            self.connection.close()
+        self.file_name = file_name
+        self.connection = connect(file_name)
+        self.table = SqliteContactTable(self.connection, FIELDS_CONTACT)
+        self.connection.commit()
+        self.fuzzy.clear()
+        self._fuzzy_built = False
+        return self
+
+
+class ShardedContactbook(Contactbook):
+    extension = "shards"
+    _state = Contactbook._state + ("shard_count", "shard_members")
+
+    def __init__(self, shard_count: int = SHARD_COUNT, compact: bool = False):
+        """
+        The __init__ function creates a contactbook saved as shard_count files instead of one.
+        A contact goes to the shard picked by a hash of its name, every shard is a file_name.NN.G.shard file
+        and file_name.shards lists the files of the last save.
+        A save writes only the shards holding a contact changed since the last save, under new names,
+        and publishes them all at once by replacing the list, see write_shards.
+        Load reads the shards in parallel processes, see read_shards.
+        :param self: Represent the instance of the class
+        :param shard_count: int: The number of shard files of a new book, a loaded book keeps the number it was saved with
+        :param compact: bool: Store the records in the compact slotted form
+        """
+        self.shard_count = shard_count
+        super().__init__(compact=compact)
+
+    def _shard(self, record: Mapping) -> int:
+        return shard_of(record["firstname"], record["lastname"], self.shard_count)
+
+    def _new_indexes(self):
+        super()._new_indexes()
+        # the ids of the records of every shard
+        self.shard_members = [set() for _ in range(self.shard_count)]
+
+    def _clear_indexes(self):
+        super()._clear_indexes()
+        self.shard_members = [set() for _ in range(self.shard_count)]
+
+    def _link(self, record: Dict, rid: Optional[int] = None) -> int:
+        rid = super()._link(record, rid)
+        self.shard_members[self._shard(record)].add(rid)
+        return rid
+
+    def _unlink(self, record: Dict) -> int:
+        rid = super()._unlink(record)
+        self.shard_members[self._shard(record)].discard(rid)
+        return rid
+
+    def _reindex(self, rids: Optional[Sequence[int]] = None):
+        super()._reindex(rids)
+        for rid, record in self._records.items():
+            self.shard_members[self._shard(record)].add(rid)
+
+    def _blank(self) -> "ShardedContactbook":
+        return type(self)(self.shard_count, self.compact)
+
+    def _changed_shards(self, file_name: str) -> Iterable[int]:
+        if self._dirty is None or self._rewrite or self._saved is None or self._saved[0] != file_name:
+            return range(self.shard_count)
+        shards = set()
+        for rid, before in self._dirty.items():
+            if before is not None:
+                shards.add(self._shard(before))
+            after = self._records.get(rid)
+            if after is not None:
+                shards.add(self._shard(after))
+        return sorted(shards)
+
+    def _write_changes(self, file_name: str) -> Callable[[], None]:
+        shards = self._changed_shards(file_name)
+        count = self.shard_count
+        # records are replaced rather than changed in place, so the lists can be written on another thread
+        parts = []
+        for index in shards:
+            rids = sorted(self.shard_members[index])
+            parts.append((index, rids, [self._records[rid] for rid in rids]))
+        self._rewrite = False
+
+        def write():
+            write_shards(file_name, count, parts, FIELDS_CONTACT)
+
+        return self._mark_saved(file_name, write)
+
+    def _read(self, file_name: str):
+        _, paths = read_manifest(file_name)
+        rids, records = read_shards(paths, FIELDS_CONTACT)
+        self.shard_count = len(paths)
+        self.data = [self._make_record(item) for item in records] if self.compact else records
+        self._reindex(rids)
+
+
 class FieldContactbook(ABC):
     @abstractmethod
     def __getitem__(self):
@@ -368,7 +1619,7 @@ class FirstNameContactbook(FieldContactbook):
                 print_green_message("first name*")
                 self.value = input(Fore.BLUE + ">>>: ")
             try:
-                if re.match(r"^[a-zA-Z\d,. !_-]{1,20}$", self.value):
+                if CONTACT_VALIDATOR.check("firstname", self.value):
                     break
                 else:
                     raise ValueError
@@ -390,7 +1641,7 @@ class LastNameContactbook(FieldContactbook):
                 print_green_message("last name*")
                 self.value = input(Fore.BLUE + ">>>: ")
             try:
-                if re.match(r"^[a-zA-Z\d,. !_-]{1,20}$", self.value):
+                if CONTACT_VALIDATOR.check("lastname", self.value):
                     break
                 else:
                     raise ValueError
@@ -411,7 +1662,7 @@ class PhoneContactbook(FieldContactbook):
                 print_green_message("phone number")
                 self.value = input(Fore.BLUE + ">>>: ")
             try:
-                if re.match(r"^[0-9-+() ]{8,17}$", self.value) or self.value == "":
+                if CONTACT_VALIDATOR.check("phone", self.value):
                     break
                 else:
                     raise ValueError
@@ -433,13 +1684,7 @@ class BirthdayContactbook(FieldContactbook):
                 print_green_message("birthday(dd.mm.YYYY)")
                 self.value = input(Fore.BLUE + ">>>: ")
             try:
-                if (
-                    re.match(
-                        r"^(0[1-9]|[12][0-9]|3[01])[.](0[1-9]|1[012])[.](19|20)[0-9]{2}$",
-                        self.value,
-                    )
-                    or self.value == ""
-                ):
+                if CONTACT_VALIDATOR.check("birthday", self.value):
                     break
                 else:
                     raise ValueError
@@ -461,7 +1706,7 @@ class AddressContactbook(FieldContactbook):
                 print_green_message("address")
                 self.value = input(Fore.BLUE + ">>>: ")
             try:
-                if self.value or self.value == "":
+                if CONTACT_VALIDATOR.check("address", self.value):
                     break
                 else:
                     raise ValueError
@@ -483,11 +1728,7 @@ class EmailContactbook(FieldContactbook):
                 print_green_message("email")
                 self.value = input(Fore.BLUE + ">>>: ")
             try:
-                if (
-                    re.match(
-                        r"^(\w|\.|_|-)+@(\w|_|-|\.)+[.]\w{2,3}$", self.value)
-                    or self.value == ""
-                ):
+                if CONTACT_VALIDATOR.check("email", self.value):
                     break
                 else:
                     raise ValueError
@@ -503,14 +1744,14 @@ class EmailContactbook(FieldContactbook):
 class StatusContactbook(FieldContactbook):
     def __init__(self, value=""):
         while True:
-            self.status_types = ["", "family", "friend", "work"]
+            self.status_types = STATUS_TYPES
             if value:
                 self.value = value
             else:
                 print_green_message("status(family, friend, work)")
                 self.value = input(Fore.BLUE + ">>>: ")
             try:
-                if self.value in self.status_types:
+                if CONTACT_VALIDATOR.check("status", self.value):
                     break
                 else:
                     raise ValueError
@@ -532,7 +1773,7 @@ class NoteContactbook(FieldContactbook):
                 print_green_message("note")
                 self.value = input(Fore.BLUE + ">>>: ")
             try:
-                if self.value or self.value == "":
+                if CONTACT_VALIDATOR.check("note", self.value):
                     break
                 else:
                     raise ValueError
@@ -546,8 +1787,8 @@ class NoteContactbook(FieldContactbook):
 
 
 class BotContactbook:
-    def __init__(self):
-        self.contactbook = Contactbook()
+    def __init__(self, contactbook: Optional[Contactbook] = None):
+        self.contactbook = contactbook if contactbook is not None else Contactbook()
 
     def handle(self, command):
         try:
@@ -557,14 +1798,18 @@ class BotContactbook:
                         try:
                             print_green_message("number of note per page")
                             n = int(input(Fore.BLUE + ">>>: "))
-                        except ValueError:
+                            print_green_message(
+                                f"sort by ({', '.join(CONTACT_ORDERS)}), enter - added")
+                            order = input(Fore.BLUE + ">>>: ").strip() or "added"
+                            cursor = self.contactbook.cursor(order, n)
+                        except ValueError as e:
                             print_red_message(
-                                f"incorrect number of page, try again")
-                            log(f"incorrect number of page, try again")
+                                f"incorrect number of page or sort key, try again")
+                            log(f"incorrect number of page or sort key, {e}")
                             continue
 
                         else:
-                            get_page(n, self.contactbook)
+                            get_page(cursor)
                             break
                     else:
                         print_red_message(f"contactbook empty")
@@ -576,38 +1821,11 @@ class BotContactbook:
                 lastname = LastNameContactbook().value.strip().lower()
 
                 if firstname and lastname:
-                    if self.contactbook:
-                        for item in self.contactbook:
-                            if (
-                                firstname == item["firstname"]
-                                and lastname == item["lastname"]
-                            ):
-                                print_red_message(
-                                    f"contact '{firstname} {lastname}' already exists"
-                                )
-                                log(f"contact '{firstname} {lastname}' already exists")
-                                break
-                        else:
-                            phone = PhoneContactbook().value.strip()
-                            birthday = BirthdayContactbook().value.strip()
-                            address = AddressContactbook().value.strip()
-                            email = EmailContactbook().value.strip()
-                            status = StatusContactbook().value.strip()
-                            note = NoteContactbook().value.strip()
-                            record = RecordContactbook(
-                                firstname,
-                                lastname,
-                                phone,
-                                birthday,
-                                address,
-                                email,
-                                status,
-                                note,
-                            )
-                            self.contactbook.add(record)
-                            print_red_message(
-                                f"contact '{firstname} {lastname}' added")
-                            log(f"contact '{firstname} {lastname}' added")
+                    if self.contactbook.find_contact(firstname, lastname):
+                        print_red_message(
+                            f"contact '{firstname} {lastname}' already exists"
+                        )
+                        log(f"contact '{firstname} {lastname}' already exists")
                     else:
                         phone = PhoneContactbook().value.strip()
                         birthday = BirthdayContactbook().value.strip()
@@ -674,16 +1892,12 @@ class BotContactbook:
 
             elif command == "4":
                 if self.contactbook:
-                    all_contacts = []
-                    for item in self.contactbook:
-                        all_contacts.append(
-                            item["firstname"] + " " + item["lastname"])
-                    print_all_name_contacts(all_contacts)
+                    print_all_name_contacts(self.contactbook.sorted_names())
                     print_green_message("enter the firstname to edit")
                     firstname = input(Fore.BLUE + ">>>: ")
                     print_green_message("enter the lastname to edit")
                     lastname = input(Fore.BLUE + ">>>: ")
-                    if firstname + " " + lastname in all_contacts:
+                    if self.contactbook.find_contact(firstname, lastname):
                         parameter_list = [
                             "firstname",
                             "lastname",
@@ -733,16 +1947,12 @@ class BotContactbook:
 
             elif command == "6":
                 if self.contactbook:
-                    all_contacts = []
-                    for item in self.contactbook:
-                        all_contacts.append(
-                            item["firstname"] + " " + item["lastname"])
-                    print_all_name_contacts(all_contacts)
+                    print_all_name_contacts(self.contactbook.sorted_names())
                     print_green_message("enter the firstname to birthday")
                     firstname = input(Fore.BLUE + ">>>: ")
                     print_green_message("enter the lastname to birthday")
                     lastname = input(Fore.BLUE + ">>>: ")
-                    if firstname + " " + lastname in all_contacts:
+                    if self.contactbook.find_contact(firstname, lastname):
                         days = self.contactbook.days_to_birthday(
                             firstname, lastname)
                         if days:
@@ -753,86 +1963,244 @@ class BotContactbook:
                                 f"{days} days left until '{firstname} {lastname}''s birthday"
                             )
                     else:
-                        log(f"contact '{firstname} {lastname}' not found")
-                        print_red_message(
-                            f"contact '{firstname} {lastname}' not found")
+                        log(f"contact '{firstname} {lastname}' not found")
+                        print_red_message(
+                            f"contact '{firstname} {lastname}' not found")
+                else:
+                    print_red_message(f"contactbook empty")
+                    log(f"contactbook empty")
+
+            elif command == "7":
+                if self.contactbook:
+                    print_all_name_contacts(self.contactbook.sorted_names())
+                    print_green_message("enter the firstname to delete")
+                    firstname = input(Fore.BLUE + ">>>: ")
+                    print_green_message("enter the lastname to delete")
+                    lastname = input(Fore.BLUE + ">>>: ")
+                    if self.contactbook.find_contact(firstname, lastname):
+                        self.contactbook.delete(firstname, lastname)
+                        print_red_message(
+                            f"contact '{firstname} {lastname}' deleted")
+                        log(f"contact '{firstname} {lastname}' deleted")
+                    else:
+                        log(f"contact '{firstname} {lastname}' not found")
+                        print_red_message(
+                            f"contact '{firstname} {lastname}' not found")
+                else:
+                    print_red_message(f"contactbook empty")
+                    log(f"contactbook empty")
+
+            elif command == "8":
+                if self.contactbook:
+                    while True:
+                        print_yellow_message(
+                            "are you sure for delete all? (y/n)")
+                        clear_all = input(Fore.BLUE + ">>>: ")
+                        if clear_all == "y":
+                            self.contactbook.clear_contactbook()
+                            print_red_message(f"contactbook cleared")
+                            log(f"contactbook cleared")
+                            break
+                        else:
+                            break
+                else:
+                    print_red_message(f"contactbook empty")
+                    log(f"contactbook empty")
+
+            elif command == "9":
+                print_green_message("save file name")
+                file_name = input(Fore.BLUE + ">>>: ").strip()
+                if file_name:
+                    self.contactbook.save(file_name)
+                    print_red_message(f"contactbook '{file_name}' saved")
+                    log(f"contactbook '{file_name}' saved")
+                else:
+                    print_red_message(f"please enter file name")
+                    log(f"please enter file name")
+
+            elif command == "10":
+                print_green_message("load file name")
+                file_name = input(Fore.BLUE + ">>>: ").strip()
+                if file_name:
+                    self.contactbook.load(file_name)
+                    print_red_message(f"contactbook '{file_name}' loaded")
+                    log(f"contactbook '{file_name}' loaded")
+                else:
+                    print_red_message(f"please enter file name")
+                    log(f"please enter file name")
+
+            elif command == "11":
+                if self.contactbook:
+                    while True:
+                        try:
+                            print_green_message("number of days")
+                            days = int(input(Fore.BLUE + ">>>: "))
+                        except ValueError:
+                            print_red_message(
+                                f"incorrect number of days, try again")
+                            log(f"incorrect number of days, try again")
+                            continue
+
+                        else:
+                            birthdays = self.contactbook.upcoming_birthdays(
+                                days)
+                            if birthdays:
+                                print_birthdays(birthdays)
+                            else:
+                                print_red_message(
+                                    f"no birthdays in the next {days} days")
+                            break
+                else:
+                    print_red_message(f"contactbook empty")
+                    log(f"contactbook empty")
+
+            elif command == "12":
+                print_green_message("import file name (.csv, .vcf)")
+                file_name = input(Fore.BLUE + ">>>: ").strip()
+                if os.path.isfile(file_name):
+                    report = import_contacts(self.contactbook, file_name)
+                    print_import_report(report)
+                    log(
+                        f"contacts imported from '{file_name}': {report.imported}, "
+                        f"rejected: {len(report.rejected)}"
+                    )
+                else:
+                    print_red_message(f"file '{file_name}' not found")
+                    log(f"file '{file_name}' not found")
+
+            elif command == "13":
+                print_green_message("export file name (.csv, .vcf)")
+                file_name = input(Fore.BLUE + ">>>: ").strip()
+                if file_name:
+                    count = export_contacts(self.contactbook, file_name)
+                    print_red_message(
+                        f"{count} contacts exported to '{file_name}'")
+                    log(f"{count} contacts exported to '{file_name}'")
+                else:
+                    print_red_message(f"please enter file name")
+                    log(f"please enter file name")
+
+            elif command == "14":
+                if self.contactbook:
+                    print_green_message(
+                        "enter the query, for example: status = work AND birthday in march AND email $= @corp.com"
+                    )
+                    print_green_message(
+                        "=, ^= starts with, $= ends with, ~ contains, <, <=, >, >=, birthday in, AND, OR, NOT, ( )"
+                    )
+                    text = input(Fore.BLUE + ">>>: ").strip()
+                    if text:
+                        result = self.contactbook.query(text)
+                        print_query_result(result)
+                        log(f"query '{text}': {len(result.records)} matches")
+                    else:
+                        print_red_message(f"please enter a query")
+                        log(f"please enter a query")
+                else:
+                    print_red_message(f"contactbook empty")
+                    log(f"contactbook empty")
+
+            elif command == "15":
+                if self.contactbook:
+                    print_green_message("enter a name, typos allowed")
+                    name = input(Fore.BLUE + ">>>: ").strip()
+                    if name:
+                        found = self.contactbook.fuzzy_find(name)
+                        if found:
+                            print_fuzzy_result(found)
+                        else:
+                            print_red_message(f"no names close to '{name}'")
+                        log(f"fuzzy find '{name}': {len(found)} found")
+                    else:
+                        print_red_message(f"please enter a name")
+                        log(f"please enter a name")
                 else:
                     print_red_message(f"contactbook empty")
                     log(f"contactbook empty")
 
-            elif command == "7":
+            elif command == "16":
                 if self.contactbook:
-                    all_contacts = []
-                    for item in self.contactbook:
-                        all_contacts.append(
-                            item["firstname"] + " " + item["lastname"])
-                    print_all_name_contacts(all_contacts)
-                    print_green_message("enter the firstname to delete")
-                    firstname = input(Fore.BLUE + ">>>: ")
-                    print_green_message("enter the lastname to delete")
-                    lastname = input(Fore.BLUE + ">>>: ")
-                    if firstname + " " + lastname in all_contacts:
-                        self.contactbook.delete(firstname, lastname)
-                        print_red_message(
-                            f"contact '{firstname} {lastname}' deleted")
-                        log(f"contact '{firstname} {lastname}' deleted")
+                    print_statistics(self.contactbook.statistics())
+                    print_green_message(
+                        f"list the contacts of a status ({', '.join(STATUS_TYPES[1:])}), press Enter for any status"
+                    )
+                    status = input(Fore.BLUE + ">>>: ").strip() or None
+                    print_green_message("and of an email domain, for example corp.com, press Enter for any domain")
+                    domain = input(Fore.BLUE + ">>>: ").strip() or None
+                    if status is not None or domain is not None:
+                        contacts = self.contactbook.facet_contacts(status, domain)
+                        for record in contacts:
+                            print_record(record)
+                        print_yellow_message(f"{len(contacts)} contacts")
+                        log(f"statistics of status '{status}' and domain '{domain}': {len(contacts)} contacts")
                     else:
-                        log(f"contact '{firstname} {lastname}' not found")
-                        print_red_message(
-                            f"contact '{firstname} {lastname}' not found")
+                        log(f"statistics shown")
                 else:
                     print_red_message(f"contactbook empty")
                     log(f"contactbook empty")
 
-            elif command == "8":
+            elif command == "17":
                 if self.contactbook:
-                    while True:
+                    report = self.contactbook.find_duplicates()
+                    if report.clusters:
+                        print_duplicates(
+                            [self.contactbook.duplicate_records(cluster) for cluster in report.clusters],
+                            report.scores,
+                        )
                         print_yellow_message(
-                            "are you sure for delete all? (y/n)")
-                        clear_all = input(Fore.BLUE + ">>>: ")
-                        if clear_all == "y":
-                            self.contactbook.clear_contactbook()
-                            print_red_message(f"contactbook cleared")
-                            log(f"contactbook cleared")
-                            break
-                        else:
-                            break
+                            f"{len(report.clusters)} groups of duplicates, "
+                            f"{report.compared} pairs compared in {report.blocks} blocks"
+                        )
+                        print_yellow_message("merge every group into its first contact? (y/n)")
+                        if input(Fore.BLUE + ">>>: ") == "y":
+                            removed = self.contactbook.merge_duplicates(report.clusters)
+                            print_red_message(f"{removed} duplicate contacts merged")
+                            log(f"{removed} duplicate contacts merged")
+                    else:
+                        print_red_message(f"no duplicate contacts found")
+                        log(f"no duplicate contacts found")
                 else:
                     print_red_message(f"contactbook empty")
                     log(f"contactbook empty")
 
-            elif command == "9":
-                print_green_message("save file name")
-                file_name = input(Fore.BLUE + ">>>: ").strip()
-                if file_name:
-                    self.contactbook.save(file_name)
-                    print_red_message(f"contactbook '{file_name}' saved")
-                    log(f"contactbook '{file_name}' saved")
+            elif command == "18" and self.contactbook.undoable:
+                description = self.contactbook.undo()
+                if description is None:
+                    print_red_message("nothing to undo")
+                    log("nothing to undo")
                 else:
-                    print_red_message(f"please enter file name")
-                    log(f"please enter file name")
-
-            elif command == "10":
-                print_green_message("load file name")
-                file_name = input(Fore.BLUE + ">>>: ").strip()
-                if file_name:
-                    self.contactbook.load(file_name)
-                    print_red_message(f"contactbook '{file_name}' loaded")
-                    log(f"contactbook '{file_name}' loaded")
+                    print_red_message(f"undone: {description}")
+                    log(f"undone: {description}")
+
+            elif command == "19" and self.contactbook.undoable:
+                description = self.contactbook.redo()
+                if description is None:
+                    print_red_message("nothing to redo")
+                    log("nothing to redo")
                 else:
-                    print_red_message(f"please enter file name")
-                    log(f"please enter file name")
+                    print_red_message(f"redone: {description}")
+                    log(f"redone: {description}")
 
         except Exception as e:
             print(f"invalid input, error: {e}, try again")
             log(f"invalid input, error: {e}, try again")
 
 
+def new_contactbook() -> Contactbook:
+    if STORAGE == "sqlite":
+        return SqliteContactbook()
+    if STORAGE == "sharded":
+        return ShardedContactbook()
+    if STORAGE == "packed":
+        return Contactbook(packed=True)
+    return Contactbook(journaled=STORAGE == "journal")
+
+
 def contactbook():
     init()
     file_name = "contactbook_save"
-    contactbot = BotContactbook()
-    if os.path.exists(f"{file_name}.bin"):
+    contactbot = BotContactbook(new_contactbook())
+    if os.path.exists(f"{file_name}.{contactbot.contactbook.extension}"):
         contactbot.contactbook.load(file_name)
         print_red_message(f"contactbook '{file_name}' loaded")
         log(f"contactbook '{file_name}' loaded")
@@ -840,27 +2208,31 @@ def contactbook():
         contactbot.contactbook.save(file_name)
         print_red_message(f"contactbook '{file_name}' saved")
         log(f"contactbook '{file_name}' saved")
+    autosaver = Autosaver(contactbot.contactbook, file_name, AUTOSAVE_DELAY)
 
     while True:
         os.system("cls")
-        print_contactbook_menu()
+        print_contactbook_menu(contactbot.contactbook.undoable)
         print_white_message("your choose(number)")
         user_input = input(Fore.BLUE + ">>>: ")
-        if user_input == "11":
-            contactbot.contactbook.save(file_name)
-            print_red_message(f"contactbook '{file_name}' saved")
-            log(f"contactbook '{file_name}' saved")
+        if user_input == "20":
+            autosaver.close()
+            if contactbot.contactbook.needs_save(file_name):
+                contactbot.contactbook.save(file_name)
+                print_red_message(f"contactbook '{file_name}' saved")
+                log(f"contactbook '{file_name}' saved")
             print_goodbye()
             break
 
-        contactbot.handle(user_input)
+        with autosaver.lock:
+            contactbot.handle(user_input)
+        if user_input in ["2", "4", "7", "8", "12", "17", "18", "19"]:
+            autosaver.touch()
+        if autosaver.error is not None:
+            print_red_message(f"autosave failed: {autosaver.error}")
+            autosaver.error = None
         input(Fore.MAGENTA + "< press Enter to continue >")
 
-        if user_input in ["2", "4", "7", "8"]:
-            contactbot.contactbook.save(file_name)
-            print_red_message(f"contactbook '{file_name}' saved")
-            log(f"contactbook '{file_name}' saved")
-
 
 class RecordNotebook:
     def __init__(self, title="", note="", tag=""):
@@ -870,9 +2242,35 @@ class RecordNotebook:
 
 
 class NoteBook(UserList):
-    def __init__(self):
+    extension = "bin"
+    fields = FIELDS_NOTE
+    background_save = True
+    undoable = True
+    # the notes and everything built from them, swapped out as a whole by clear
+    _state = ("data", "title_view", "text", "tags", "_ids", "_notes", "_next_nid")
+
+    def __init__(self, journaled: bool = False):
+        """
+        The __init__ function creates an empty notebook.
+        In journaled mode save appends the changes to a journal next to the save file
+        instead of rewriting the whole notebook, and load replays that journal.
+        :param self: Represent the instance of the class
+        :param journaled: bool: Persist the changes through an append-only journal
+        """
         super().__init__()
+        self.journaled = journaled
+        self._journal = None
+        self._operations = []
+        self._rewrite = False
+        self.history = History()
+        self.save_lock = threading.Lock()
+        # every change bumps the generation, _dirty keeps the id of each changed note with the note as last saved
+        self.generation = 0
+        self._dirty = {}
+        self._saved = None
+        self._version = None
         self.data = []
+        self._new_indexes()
 
     def __str__(self) -> List[str]:
         result = []
@@ -886,15 +2284,156 @@ class NoteBook(UserList):
         return result
 
     def __setitem__(self, key, value):
-        self.data[key] = {"title": value.title,
-                          "note": value.note, "tag": value.tag}
+        position = key + len(self.data) if key < 0 else key
+        old = self.data[position]
+        self._replace_at(position, {"title": value.title, "note": value.note, "tag": value.tag})
+        self.history.record(f"replace note '{old['title']}'", ("replace", position, old))
+        self._log_operation("replace", old["title"], dict(self.data[position]))
 
     def __getitem__(self, key):
         return self.data[key]
 
+    def _log_operation(self, *operation):
+        if self.journaled:
+            self._operations.append(operation)
+
+    def _new_indexes(self):
+        self.title_view = SortedView()
+        self.text = TextIndex(["title", "note"])
+        self.tags = TagIndex()
+        # every note gets an id for the indexes, kept when the note is edited
+        self._ids = {}
+        self._notes = {}
+        self._next_nid = 0
+
+    def _link(self, note: Dict, nid: Optional[int] = None) -> int:
+        if nid is None:
+            nid = self._next_nid
+            self._next_nid += 1
+        self._ids[id(note)] = nid
+        self._notes[nid] = note
+        self.title_view.add((note["title"], nid))
+        self.text.add(nid, note)
+        self.tags.add(nid, note)
+        self.generation += 1
+        if self._dirty is not None:
+            self._dirty.setdefault(nid, None)
+        return nid
+
+    def _unlink(self, note: Dict) -> int:
+        nid = self._ids.pop(id(note))
+        del self._notes[nid]
+        self.title_view.remove((note["title"], nid))
+        self.text.remove(nid, note)
+        self.tags.remove(nid, note)
+        self.generation += 1
+        if self._dirty is not None:
+            self._dirty.setdefault(nid, note)
+        return nid
+
+    def _reindex(self):
+        self._ids.clear()
+        self._notes.clear()
+        for nid, note in enumerate(self.data):
+            self._ids[id(note)] = nid
+            self._notes[nid] = note
+        self._next_nid = len(self.data)
+        self.title_view.build((note["title"], nid) for nid, note in self._notes.items())
+        self.text.build(self._notes)
+        self.tags.build(self._notes)
+
+    def _detach(self) -> Dict:
+        state = {name: getattr(self, name) for name in self._state}
+        self.data = []
+        self._new_indexes()
+        self.generation += 1
+        self._dirty = None
+        return state
+
+    def _swap(self, state: Dict) -> tuple:
+        current = self._detach()
+        for name, value in state.items():
+            setattr(self, name, value)
+        return "swap", current
+
+    def _insert_at(self, position: int, note: Dict, nid: Optional[int] = None) -> tuple:
+        # a note put back by undo gets its old id, so it does not count as changed
+        self.data.insert(position, note)
+        self._link(note, nid)
+        return "remove", position
+
+    def _remove_at(self, position: int) -> tuple:
+        note = self.data.pop(position)
+        nid = self._unlink(note)
+        return "insert", position, note, nid
+
+    def _replace_at(self, position: int, note: Dict) -> tuple:
+        old = self.data[position]
+        nid = self._unlink(old)
+        self.data[position] = note
+        self._link(note, nid)
+        return "replace", position, old
+
+    def _apply_inverse(self, operation: tuple) -> tuple:
+        action, *args = operation
+        if action == "insert":
+            return self._insert_at(*args)
+        if action == "remove":
+            return self._remove_at(*args)
+        if action == "replace":
+            return self._replace_at(*args)
+        return self._swap(*args)
+
+    def undo(self) -> Optional[str]:
+        """
+        The undo function reverts the last change of the notebook: add, edit, delete or clear.
+        :param self: Represent the instance of the class
+        :return: The description of the reverted change, or None if there is nothing to undo
+        """
+        description = self.history.undo(self._apply_inverse)
+        if description is not None:
+            # the journal only moves forward, the next save writes the whole notebook instead
+            self._rewrite = True
+        return description
+
+    def redo(self) -> Optional[str]:
+        """
+        The redo function makes the last undone change of the notebook again.
+        :param self: Represent the instance of the class
+        :return: The description of the change, or None if there is nothing to redo
+        """
+        description = self.history.redo(self._apply_inverse)
+        if description is not None:
+            self._rewrite = True
+        return description
+
+    def _apply_operation(self, operation: tuple):
+        """
+        The _apply_operation function repeats an operation read back from the journal.
+        :param self: Represent the instance of the class
+        :param operation: tuple: The operation name followed by its arguments
+        """
+        action, *args = operation
+        if action == "add":
+            self.add(RecordNotebook(**args[0]))
+        elif action == "edit":
+            self.edit_note(*args)
+        elif action == "delete":
+            self._remove_note(args[0])
+        elif action == "replace":
+            for position, note in enumerate(self.data):
+                if note["title"] == args[0]:
+                    self[position] = RecordNotebook(**args[1])
+                    break
+        elif action == "clear":
+            self.clear_notebook()
+
     def add(self, record: RecordNotebook):
         note = {"title": record.title, "note": record.note, "tag": record.tag}
         self.data.append(note)
+        self._link(note)
+        self.history.record(f"add note '{record.title}'", ("remove", len(self.data) - 1))
+        self._log_operation("add", dict(note))
 
     def find_note_by_title(self, title: str) -> List:
         titles = []
@@ -904,47 +2443,529 @@ class NoteBook(UserList):
         return titles
 
     def find_note_by_tag(self, tag: str) -> List:
-        tags = []
-        for key in self.data:
-            if tag in key["tag"]:
-                tags.append(key)
-        return tags
+        """
+        The find_note_by_tag function finds the notes having a whole tag, so "py" does not find the tag "happy".
+        :param self: Represent the instance of the class
+        :param tag: str: The tag, or several tags separated by spaces or commas, which the notes must all have
+        :return: A list of notes
+        """
+        tags = parse_tags(tag)
+        return self.find_notes_by_tags(all_of=tags) if tags else []
+
+    def find_notes_by_tags(
+        self, all_of: Iterable[str] = (), any_of: Iterable[str] = (), none_of: Iterable[str] = ()
+    ) -> List[Dict]:
+        """
+        The find_notes_by_tags function finds the notes by a combination of tags, see TagIndex.select.
+        :param self: Represent the instance of the class
+        :param all_of: Iterable[str]: Tags the notes must all have
+        :param any_of: Iterable[str]: Tags the notes must have at least one of
+        :param none_of: Iterable[str]: Tags the notes must not have
+        :return: A list of notes in the order they were indexed
+        """
+        return [self._notes[nid] for nid in FacetIndex.ids(self.tags.select(all_of, any_of, none_of))]
+
+    def tag_cloud(self) -> Dict[str, int]:
+        return self.tags.cloud()
 
     def edit_note(self, title: str, parameter: str, new_value: str):
-        for note in self.data:
+        for position, note in enumerate(self.data):
             if note["title"] == title:
-                note[parameter] = new_value
+                inverse = self._replace_at(position, {**note, parameter: new_value})
+                self.history.record(f"edit {parameter} of note '{title}'", inverse)
+                self._log_operation("edit", title, parameter, new_value)
                 break
             else:
                 continue
 
-    def delete(self, note: str):
+    def _remove_note(self, title: str):
+        for position, key in enumerate(self.data):
+            if key["title"] == title:
+                self.history.record(f"delete note '{title}'", self._remove_at(position))
+                self._log_operation("delete", title)
+                break
+
+    def find_note(self, title: str) -> Optional[Dict]:
         for key in self.data:
-            if key["title"] == note:
-                print_yellow_message(
-                    f"are you sure for delete '{note}' note? (y/n)")
-                del_note = input(Fore.BLUE + ">>>: ")
-                if del_note == "y":
-                    self.data.remove(key)
-                    break
-                else:
-                    break
+            if key["title"] == title:
+                return key
+        return None
+
+    def search_notes(self, text: str, limit: int = 10) -> List[Tuple[float, Dict]]:
+        """
+        The search_notes function finds the notes whose title or text best match some words, see TextIndex.search.
+        :param self: Represent the instance of the class
+        :param text: str: The words to look for, with phrases in double quotes
+        :param limit: int: How many notes to return at most
+        :return: A list of (score, note) tuples, the best match first
+        """
+        return [(score, self._notes[nid]) for score, nid in self.text.search(text, self._notes.__getitem__, limit)]
+
+    def delete(self, note: str):
+        if self.find_note(note) is not None:
+            print_yellow_message(
+                f"are you sure for delete '{note}' note? (y/n)")
+            del_note = input(Fore.BLUE + ">>>: ")
+            if del_note == "y":
+                self.delete_note(note)
+
+    def delete_note(self, title: str) -> Optional[Dict]:
+        """
+        The delete_note function deletes a note without asking, recording it in the undo history and the journal.
+        :param self: Represent the instance of the class
+        :param title: str: The title of the note
+        :return: The deleted note, or None if there is no such note
+        """
+        note = self.find_note(title)
+        if note is not None:
+            note = dict(note)
+            self._remove_note(title)
+        return note
+
+    def rename(self, title: str, new_title: str) -> Optional[Dict]:
+        """
+        The rename function changes the title of a note, refusing a title another note has.
+        :param self: Represent the instance of the class
+        :param title: str: The title of the note
+        :param new_title: str: The new title
+        :return: The renamed note, or None if there is no such note
+        """
+        if self.find_note(title) is None:
+            return None
+        if new_title == title:
+            return self.find_note(title)
+        if self.find_note(new_title) is not None:
+            raise RecordExistsError(f"note '{new_title}' already exists")
+        self.edit_note(title, "title", new_title)
+        return self.find_note(new_title)
 
     def clear_notebook(self):
-        self.data.clear()
+        self.history.record("clear notebook", ("swap", self._detach()))
+        self._log_operation("clear")
+
+    def sorted_titles(self, prefix: str = "") -> Iterator[str]:
+        """
+        The sorted_titles function lists the note titles in alphabetical order
+        from the title view kept sorted as notes are added, renamed and deleted.
+        :param self: Represent the instance of the class
+        :param prefix: str: List only the titles starting with it
+        :return: An iterator of titles
+        """
+        for title, _ in self.title_view.prefix(prefix):
+            yield title
+
+    def cursor(self, order: str = "added", page_size: int = 10) -> Cursor:
+        """
+        The cursor function opens a page cursor on the notebook.
+        The title order pages over the title view in place, so opening a cursor sorts nothing.
+        :param self: Represent the instance of the class
+        :param order: str: One of NOTE_ORDERS: the order notes were added in or by title
+        :param page_size: int: The number of notes per page
+        :return: A Cursor on the first page
+        """
+        if order == "added":
+            return Cursor(
+                SequenceSource(Positions(len(self.data)), lambda key: self.data[key[0]], no_prefix),
+                page_size,
+            )
+        if order != "title":
+            raise ValueError(f"incorrect sort key - '{order}'")
+        return Cursor(
+            SequenceSource(self.title_view.keys, lambda key: self._notes[key[-1]], text_prefix), page_size
+        )
 
     def save(self, file_name: str):
-        with open(f"{file_name}.bin", "wb") as file:
-            pickle.dump(self.data, file)
+        """
+        The save function writes the notebook to the file_name.bin file.
+        In journaled mode only the operations made since the last save are appended to file_name.journal,
+        and the journal is folded into a new snapshot once it outgrows the notebook.
+        Nothing is written if the notebook has not changed since it was loaded from or saved to file_name.
+        Changes another session saved to the same files meanwhile are kept, see _prepare_merge.
+        :param self: Represent the instance of the class
+        :param file_name: str: The save file name without the extension
+        """
+        with self.save_lock:
+            self.prepare_save(file_name)()
 
-    def load(self, file_name: str):
+    @property
+    def dirty(self) -> bool:
+        return self._saved is None or self._saved[1] != self.generation
+
+    def needs_save(self, file_name: str) -> bool:
+        return self._saved != (file_name, self.generation)
+
+    def changes(self) -> Optional[List[Tuple[Optional[Dict], Optional[Dict]]]]:
+        """
+        The changes function lists the notes changed since the notebook was last loaded or saved,
+        see Contactbook.changes. Notes are told apart by their id, so notes sharing a title are listed each on its own.
+        :param self: Represent the instance of the class
+        :return: (before, after) pairs in the order the notes were added,
+            or None if the whole notebook was replaced by clear or its undo
+        """
+        if self._dirty is None:
+            return None
+        result = []
+        for nid, before in sorted(self._dirty.items(), key=itemgetter(0)):
+            after = self._notes.get(nid)
+            if before != after:
+                result.append((before, after))
+        return result
+
+    def _mark_saved(self, file_name: str, write: Callable[[], None]) -> Callable[[], None]:
+        self._saved = (file_name, self.generation)
+        self._dirty = {}
+
+        def run():
+            try:
+                write()
+            except Exception:
+                # the next save writes the whole notebook again
+                self._saved = None
+                self._dirty = None
+                self._rewrite = True
+                raise
+
+        return run
+
+    def _write_changes(self, file_name: str) -> Callable[[], None]:
+        if not self.journaled:
+            data = list(self.data)
+            self._rewrite = False
+            return self._mark_saved(file_name, lambda: write_atomic(f"{file_name}.bin", lambda file: pickle.dump(data, file)))
+        if self._journal is None or self._journal.file_name != file_name or self._rewrite:
+            self._journal = Journal(file_name)
+            compact = True
+        else:
+            compact = self._journal.needs_compaction(len(self.data), len(self._operations))
+        journal = self._journal
+        operations, self._operations = self._operations, []
+        self._rewrite = False
+        if compact:
+            data = list(self.data)
+            return self._mark_saved(file_name, lambda: journal.compact(data))
+        return self._mark_saved(file_name, lambda: journal.append(operations) if operations else None)
+
+    @staticmethod
+    def _operation_keys(operation: tuple) -> Optional[List[str]]:
+        action, *args = operation
+        if action == "add":
+            return [args[0]["title"]]
+        if action == "edit":
+            title, parameter, value = args
+            return [title, value] if parameter == "title" else [title]
+        if action == "delete":
+            return [args[0]]
+        if action == "replace":
+            return [args[0], args[1]["title"]]
+        # clear changes the whole notebook
+        return None
+
+    def _put(self, title: str, note: Optional[Dict]) -> Optional[tuple]:
+        """
+        The _put function sets the note with a title to the given version, or deletes it,
+        without recording it in the journal or the undo history.
+        :param self: Represent the instance of the class
+        :param title: str: The title of the note
+        :param note: Optional[Dict]: The new version of the note, None to delete it
+        :return: The journal operation doing the same, or None if nothing changed
+        """
+        position = next((position for position, item in enumerate(self.data) if item["title"] == title), None)
+        if note is None:
+            if position is None:
+                return None
+            self._remove_at(position)
+            return "delete", title
+        if position is None:
+            self._insert_at(len(self.data), dict(note))
+            return "add", dict(note)
+        self._replace_at(position, dict(note))
+        return "replace", title, dict(note)
+
+    def _prepare_merge(self, file_name: str) -> Callable[[], None]:
+        """
+        The _prepare_merge function prepares a save over files another session has saved to since this one read them,
+        merging the two sessions note by note, see Contactbook._prepare_merge.
+        :param self: Represent the instance of the class
+        :param file_name: str: The save file name without the extension
+        :return: A function writing the save files
+        """
+        pairs = self.changes()
+        self.history.clear()
+        if pairs is None:
+            self._rewrite = True
+            return self._write_changes(file_name)
+        saved = {}
+        final = {}
+        for before, after in pairs:
+            if before is not None:
+                saved[before["title"]] = before
+                final.setdefault(before["title"], None)
+        for before, after in pairs:
+            if after is not None:
+                final[after["title"]] = after
+        operations = self._journal.read_new() if self.journaled and self._journal is not None else None
+        keys = set()
+        for operation in operations or []:
+            operation_keys = self._operation_keys(operation)
+            if operation_keys is None:
+                operations = None
+                break
+            keys.update(operation_keys)
+        if operations is not None:
+            scratch = NoteBook()
+            for title in keys | final.keys():
+                note = saved.get(title) if title in final else self.find_note(title)
+                if note is not None:
+                    scratch.add(RecordNotebook(**note))
+            for operation in operations:
+                scratch._apply_operation(operation)
+            for title in keys - final.keys():
+                self._put(title, scratch.find_note(title))
+            operations = [scratch._put(title, note) for title, note in final.items()]
+        else:
+            theirs = type(self)(journaled=self.journaled)
+            theirs._read(file_name)
+            operations = [theirs._put(title, note) for title, note in final.items()]
+            self._swap(theirs._detach())
+            self._journal = theirs._journal
+        self._operations = [operation for operation in operations if operation is not None]
+        self._rewrite = False
+        return self._write_changes(file_name)
+
+    def prepare_save(self, file_name: str, wait: bool = True) -> Optional[Callable[[], None]]:
+        """
+        The prepare_save function takes what a save of the notebook has to write, without writing anything,
+        see Contactbook.prepare_save.
+        :param self: Represent the instance of the class
+        :param file_name: str: The save file name without the extension
+        :param wait: bool: Wait for another session saving to the same files, instead of giving up
+        :return: A function writing the save files, which does nothing if the file is up to date,
+            or None if another session is saving and wait is False
+        """
+        if not self.needs_save(file_name):
+            return lambda: None
+        lock = FileLock(file_name)
+        if not lock.acquire(wait=wait):
+            return None
+        try:
+            if self._saved is not None and self._saved[0] == file_name and lock.version() != self._version:
+                write = self._prepare_merge(file_name)
+            else:
+                write = self._write_changes(file_name)
+        except Exception:
+            lock.release()
+            raise
+
+        def run():
+            try:
+                write()
+                self._version = lock.bump()
+            finally:
+                lock.release()
+
+        return run
+
+    def _read(self, file_name: str):
         empty_ness = os.stat(f"{file_name}.bin")
         if empty_ness.st_size != 0:
             with open(f"{file_name}.bin", "rb") as file:
                 self.data = pickle.load(file)
+            self._reindex()
+        journal = Journal(file_name)
+        # the changes a journaled session left are read by any book, so turning the journal off loses nothing
+        if self.journaled or os.path.exists(journal.path):
+            for operation in journal.replay():
+                self._apply_operation(operation)
+            self._operations = []
+        if self.journaled:
+            self._journal = journal
+
+    def load(self, file_name: str):
+        # wait for a background save in progress, and for other sessions writing the files
+        with self.save_lock:
+            lock = FileLock(file_name)
+            lock.acquire(shared=True)
+            try:
+                self._read(file_name)
+                self._version = lock.version()
+            finally:
+                lock.release()
+        self._rewrite = False
+        self.history.clear()
+        self._dirty = {}
+        self._saved = (file_name, self.generation)
         return self.data
 
 
+class SqliteNoteBook(NoteBook):
+    extension = "db"
+    # the connection belongs to the thread that opened it
+    background_save = False
+    # changes go straight to the database, there is no history to undo, the menu leaves undo and redo out
+    undoable = False
+
+    def __init__(self):
+        """
+        The __init__ function creates a notebook kept in an SQLite database instead of memory.
+        :param self: Represent the instance of the class
+        """
+        super().__init__()
+        self.file_name = None
+        self.connection = None
+        self.table = None
+        self._indexes_built = False
+
+    def __str__(self) -> List[str]:
+        return [
+            "".join(f"{field}: {item[field]}\n" for field in FIELDS_NOTE)
+            for item in self
+        ]
+
+    def __len__(self) -> int:
+        return self.table.count() if self.table else 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.table.rows() if self.table else iter(())
+
+    def __getitem__(self, key: int) -> Dict:
+        if key < 0:
+            key += len(self)
+        records = self.table.page(key, 1) if self.table and key >= 0 else []
+        if not records:
+            raise IndexError("list index out of range")
+        return records[0]
+
+    def __setitem__(self, key: int, value):
+        if key < 0:
+            key += len(self)
+        note = {"title": value.title, "note": value.note, "tag": value.tag}
+        if self._indexes_built:
+            row_id = self.table._row_id(key)
+            old = self.table.get(row_id)
+            self.text.remove(row_id, old)
+            self.tags.remove(row_id, old)
+            self.text.add(row_id, note)
+            self.tags.add(row_id, note)
+        self.table.replace(key, note)
+
+    def add(self, record: RecordNotebook):
+        note = {"title": record.title, "note": record.note, "tag": record.tag}
+        row_id = self.table.insert(note)
+        if self._indexes_built:
+            self.text.add(row_id, note)
+            self.tags.add(row_id, note)
+
+    def find_note(self, title: str) -> Optional[Dict]:
+        return self.table.find(title)
+
+    def find_note_by_title(self, title: str) -> List:
+        return self.table.search("title", title)
+
+    def _build_indexes(self) -> bool:
+        if not self.table:
+            return False
+        if not self._indexes_built:
+            # built on the first search and kept up to date after, so opening the database stays instant
+            for row_id, note in self.table.id_rows():
+                self.text.add(row_id, note)
+                self.tags.add(row_id, note)
+            self._indexes_built = True
+        return True
+
+    def search_notes(self, text: str, limit: int = 10) -> List[Tuple[float, Dict]]:
+        if not self._build_indexes():
+            return []
+        return [(score, self.table.get(row_id)) for score, row_id in self.text.search(text, self.table.get, limit)]
+
+    def find_notes_by_tags(
+        self, all_of: Iterable[str] = (), any_of: Iterable[str] = (), none_of: Iterable[str] = ()
+    ) -> List[Dict]:
+        if not self._build_indexes():
+            return []
+        return [self.table.get(row_id) for row_id in FacetIndex.ids(self.tags.select(all_of, any_of, none_of))]
+
+    def tag_cloud(self) -> Dict[str, int]:
+        return self.tags.cloud() if self._build_indexes() else {}
+
+    def edit_note(self, title: str, parameter: str, new_value: str):
+        row_id = self.table.find_id(title)
+        old = self.table.get(row_id) if self._indexes_built and row_id is not None else None
+        self.table.update((title,), parameter, new_value)
+        if old is not None:
+            self.text.remove(row_id, old)
+            self.tags.remove(row_id, old)
+            self.text.add(row_id, {**old, parameter: new_value})
+            self.tags.add(row_id, {**old, parameter: new_value})
+
+    def _remove_note(self, title: str):
+        if self._indexes_built:
+            row_id = self.table.find_id(title)
+            if row_id is not None:
+                old = self.table.get(row_id)
+                self.text.remove(row_id, old)
+                self.tags.remove(row_id, old)
+        self.table.delete(title)
+
+    def sorted_titles(self, prefix: str = "") -> Iterator[str]:
+        for title, in self.table.sorted_keys(prefix):
+            yield title
+
+    def cursor(self, order: str = "added", page_size: int = 10) -> Cursor:
+        orders = {"added": ((), no_prefix), "title": (("title",), text_prefix)}
+        if order not in orders:
+            raise ValueError(f"incorrect sort key - '{order}'")
+        return Cursor(SqliteOrder(self.table, *orders[order]), page_size)
+
+    def clear_notebook(self):
+        self.table.clear()
+        self.text.clear()
+        self.tags.clear()
+
+    def undo(self) -> Optional[str]:
+        raise ValueError("undo is not available with the SQLite storage")
+
+    def redo(self) -> Optional[str]:
+        raise ValueError("redo is not available with the SQLite storage")
+
+    @property
+    def dirty(self) -> bool:
+        # changes stay in an open transaction until save commits them
+        return self.connection is not None and self.connection.in_transaction
+
+    def needs_save(self, file_name: str) -> bool:
+        return self.connection is None or file_name != self.file_name or self.connection.in_transaction
+
+    def changes(self):
+        raise ValueError("changes are not tracked with the SQLite storage")
+
+    def save(self, file_name: str):
+        """
+        The save function commits the changes to the database file_name.db.
+        Saving under another name copies the database with the SQLite backup API.
+        :param self: Represent the instance of the class
+        :param file_name: str: The database file name without the extension
+        """
+        if self.connection is None:
+            self.load(file_name)
+        self.connection.commit()
+        if file_name != self.file_name:
+            target = connect(file_name)
+            self.connection.backup(target)
+            target.close()
+
+    def load(self, file_name: str):
+        if self.connection is not None:
+            self.connection.close()
+        self.file_name = file_name
+        self.connection = connect(file_name)
+        self.table = SqliteNoteTable(self.connection, FIELDS_NOTE)
+        self.connection.commit()
+        self.text.clear()
+        self.tags.clear()
+        self._indexes_built = False
+        return self
+
+
 class FieldNotebook(ABC):
     @abstractmethod
     def __getitem__(self):
@@ -960,7 +2981,7 @@ class TitleNotebook(FieldNotebook):
                 print_green_message("title*")
                 self.value = input(Fore.BLUE + ">>>: ")
             try:
-                if re.match(r"^[a-zA-Z\d,. !_-]{1,50}$", self.value):
+                if NOTE_VALIDATOR.check("title", self.value):
                     break
                 else:
                     raise ValueError
@@ -981,10 +3002,7 @@ class NoteNotebook(FieldNotebook):
                 print_green_message("note")
                 self.value = input(Fore.BLUE + ">>>:")
             try:
-                if (
-                    re.match(r"^[a-zA-Z()?\d,. \-_!]{1,250}$", self.value)
-                    or self.value == ""
-                ):
+                if NOTE_VALIDATOR.check("note", self.value):
                     break
                 else:
                     raise ValueError
@@ -1005,7 +3023,7 @@ class TagNotebook(FieldNotebook):
                 print_green_message("tag")
                 self.value = input(Fore.BLUE + ">>>:")
             try:
-                if re.match(r"^[a-zA-Z\d,. !]{1,20}$", self.value) or self.value == "":
+                if NOTE_VALIDATOR.check("tag", self.value):
                     break
                 else:
                     raise ValueError
@@ -1018,8 +3036,8 @@ class TagNotebook(FieldNotebook):
 
 
 class BotNotebook:
-    def __init__(self):
-        self.notebook = NoteBook()
+    def __init__(self, notebook: Optional[NoteBook] = None):
+        self.notebook = notebook if notebook is not None else NoteBook()
 
     def handle(self, command: str):
         try:
@@ -1029,14 +3047,18 @@ class BotNotebook:
                         try:
                             print_green_message("number of note per page")
                             n = int(input(Fore.BLUE + ">>>:"))
-                        except ValueError:
+                            print_green_message(
+                                f"sort by ({', '.join(NOTE_ORDERS)}), enter - added")
+                            order = input(Fore.BLUE + ">>>:").strip() or "added"
+                            cursor = self.notebook.cursor(order, n)
+                        except ValueError as e:
                             print_red_message(
-                                f"incorrect number of note, try again")
-                            log(f"incorrect number of page, try again")
+                                f"incorrect number of note or sort key, try again")
+                            log(f"incorrect number of page or sort key, {e}")
                             continue
 
                         else:
-                            get_page(n, self.notebook)
+                            get_page(cursor)
                             break
                     else:
                         print_red_message(f"notebook empty")
@@ -1113,13 +3135,10 @@ class BotNotebook:
 
             elif command == "5":
                 if self.notebook:
-                    all_titles = []
-                    for key in self.notebook:
-                        all_titles.append(key["title"])
-                    print_all_titles(all_titles)
+                    print_all_titles(self.notebook.sorted_titles())
                     print_green_message("enter the title")
                     title = input(Fore.BLUE + ">>>:")
-                    if title in all_titles:
+                    if self.notebook.find_note(title) is not None:
                         print_green_message("enter the parameter to edit")
                         parameter = input(Fore.BLUE + ">>>:")
                         print_green_message("enter new value")
@@ -1136,13 +3155,10 @@ class BotNotebook:
 
             elif command == "6":
                 if self.notebook:
-                    all_titles = []
-                    for key in self.notebook:
-                        all_titles.append(key["title"])
-                    print_all_titles(all_titles)
+                    print_all_titles(self.notebook.sorted_titles())
                     print_green_message("enter the title")
                     title = input(Fore.BLUE + ">>>:")
-                    if title in all_titles:
+                    if self.notebook.find_note(title) is not None:
                         self.notebook.delete(title)
                         print_red_message(f"note '{title}' deleted")
                         log(f"note '{title}' deleted")
@@ -1191,16 +3207,106 @@ class BotNotebook:
                     print_red_message("please enter file name")
                     log("please enter file name")
 
+            elif command == "10":
+                print_green_message("import file name (.csv, .jsonl)")
+                file_name = input(Fore.BLUE + ">>>:").strip()
+                if os.path.isfile(file_name):
+                    report = import_notes(self.notebook, file_name)
+                    print_import_report(report)
+                    log(
+                        f"notes imported from '{file_name}': {report.imported}, "
+                        f"rejected: {len(report.rejected)}"
+                    )
+                else:
+                    print_red_message(f"file '{file_name}' not found")
+                    log(f"file '{file_name}' not found")
+
+            elif command == "11":
+                print_green_message("export file name (.csv, .jsonl)")
+                file_name = input(Fore.BLUE + ">>>:").strip()
+                if file_name:
+                    count = export_notes(self.notebook, file_name)
+                    print_red_message(f"{count} notes exported to '{file_name}'")
+                    log(f"{count} notes exported to '{file_name}'")
+                else:
+                    print_red_message("please enter file name")
+                    log("please enter file name")
+
+            elif command == "12" and self.notebook.undoable:
+                description = self.notebook.undo()
+                if description is None:
+                    print_red_message("nothing to undo")
+                    log("nothing to undo")
+                else:
+                    print_red_message(f"undone: {description}")
+                    log(f"undone: {description}")
+
+            elif command == "13" and self.notebook.undoable:
+                description = self.notebook.redo()
+                if description is None:
+                    print_red_message("nothing to redo")
+                    log("nothing to redo")
+                else:
+                    print_red_message(f"redone: {description}")
+                    log(f"redone: {description}")
+
+            elif command == "14":
+                print_green_message('enter the words to find, phrases in double quotes ("fresh bread")')
+                text = input(Fore.BLUE + ">>>:").strip()
+                if text:
+                    start = time.perf_counter()
+                    found = self.notebook.search_notes(text)
+                    elapsed = time.perf_counter() - start
+                    if found:
+                        print_search_result(found)
+                        print_yellow_message(f"{len(found)} best notes in {elapsed * 1000:.1f} ms")
+                    else:
+                        print_red_message(f"not found - {text}")
+                        log(f"not found - {text}")
+                else:
+                    print_red_message("please enter the words to find")
+                    log("please enter the words to find")
+
+            elif command == "15":
+                print_green_message("tags the notes must all have, enter - skip")
+                all_of = parse_tags(input(Fore.BLUE + ">>>:"))
+                print_green_message("tags the notes must have at least one of, enter - skip")
+                any_of = parse_tags(input(Fore.BLUE + ">>>:"))
+                print_green_message("tags the notes must not have, enter - skip")
+                none_of = parse_tags(input(Fore.BLUE + ">>>:"))
+                if all_of or any_of or none_of:
+                    result = self.notebook.find_notes_by_tags(all_of, any_of, none_of)
+                    for res in result:
+                        print_record(res)
+                    print_yellow_message(f"{len(result)} notes")
+                else:
+                    print_red_message("please enter a tag")
+                    log("please enter a tag")
+
+            elif command == "16":
+                cloud = self.notebook.tag_cloud()
+                if cloud:
+                    print_tag_cloud(cloud)
+                else:
+                    print_red_message("no tags")
+                    log("no tags")
+
         except Exception as e:
             print(f"invalid input, error: {e}, try again")
             log(f"invalid input, error: {e}, try again")
 
 
+def new_notebook() -> NoteBook:
+    if STORAGE == "sqlite":
+        return SqliteNoteBook()
+    return NoteBook(journaled=STORAGE == "journal")
+
+
 def notebook():
     init()
     file_name = "notebook_save"
-    notebot = BotNotebook()
-    if os.path.exists(f"{file_name}.bin"):
+    notebot = BotNotebook(new_notebook())
+    if os.path.exists(f"{file_name}.{notebot.notebook.extension}"):
         notebot.notebook.load(file_name)
         print_red_message(f"notebook '{file_name}' loaded")
         log(f"notebook '{file_name}' loaded")
@@ -1208,27 +3314,31 @@ def notebook():
         notebot.notebook.save(file_name)
         print_red_message(f"notebook '{file_name}' saved")
         log(f"notebook '{file_name}' saved")
+    autosaver = Autosaver(notebot.notebook, file_name, AUTOSAVE_DELAY)
 
     while True:
         os.system("cls")
-        print_notebook_menu()
+        print_notebook_menu(notebot.notebook.undoable)
         print_white_message("your choose(number)")
         user_input = input(Fore.BLUE + ">>>:")
-        if user_input == "10":
-            notebot.notebook.save(file_name)
-            print_red_message(f"notebook '{file_name}' saved")
-            log(f"notebook '{file_name}' saved")
+        if user_input == "17":
+            autosaver.close()
+            if notebot.notebook.needs_save(file_name):
+                notebot.notebook.save(file_name)
+                print_red_message(f"notebook '{file_name}' saved")
+                log(f"notebook '{file_name}' saved")
             print_goodbye()
             break
 
-        notebot.handle(user_input)
+        with autosaver.lock:
+            notebot.handle(user_input)
+        if user_input in ["2", "5", "6", "7", "10", "12", "13"]:
+            autosaver.touch()
+        if autosaver.error is not None:
+            print_red_message(f"autosave failed: {autosaver.error}")
+            autosaver.error = None
         input(Fore.MAGENTA + "< press Enter to continue >")
 
-        if user_input in ["2", "5", "6", "7"]:
-            notebot.notebook.save(file_name)
-            print_red_message(f"notebook '{file_name}' saved")
-            log(f"notebook '{file_name}' saved")
-
 
 class FileSort:
     @staticmethod
@@ -1416,7 +3526,675 @@ def calculate():
             break
 
 
-def main():
+class BotBatch:
+    def __init__(self, contact_file: str = "contactbook_save", note_file: str = "notebook_save"):
+        """
+        The __init__ function prepares a batch run of commands read from a script instead of the menus.
+        The books are loaded the first time a command needs them and written once when the run ends.
+        :param self: Represent the instance of the class
+        :param contact_file: str: The contactbook save file name without the extension
+        :param note_file: str: The notebook save file name without the extension
+        """
+        self.contact_file = contact_file
+        self.note_file = note_file
+        self.contactbot = None
+        self.notebot = None
+        self.filesort = FileSort()
+        self.changed = set()
+        self.errors = 0
+        self.commands = {
+            ("contact", "add"): self.contact_add,
+            ("contact", "find"): self.contact_find,
+            ("contact", "query"): self.contact_query,
+            ("contact", "fuzzy"): self.contact_fuzzy,
+            ("contact", "statistics"): self.contact_statistics,
+            ("contact", "dedup"): self.contact_dedup,
+            ("contact", "edit"): self.contact_edit,
+            ("contact", "delete"): self.contact_delete,
+            ("contact", "clear"): self.contact_clear,
+            ("contact", "undo"): self.contact_undo,
+            ("contact", "redo"): self.contact_redo,
+            ("contact", "birthdays"): self.contact_birthdays,
+            ("contact", "import"): self.contact_import,
+            ("contact", "export"): self.contact_export,
+            ("contact", "save"): self.contact_save,
+            ("note", "add"): self.note_add,
+            ("note", "find"): self.note_find,
+            ("note", "search"): self.note_search,
+            ("note", "tags"): self.note_tags,
+            ("note", "cloud"): self.note_cloud,
+            ("note", "edit"): self.note_edit,
+            ("note", "delete"): self.note_delete,
+            ("note", "clear"): self.note_clear,
+            ("note", "undo"): self.note_undo,
+            ("note", "redo"): self.note_redo,
+            ("note", "import"): self.note_import,
+            ("note", "export"): self.note_export,
+            ("note", "save"): self.note_save,
+        }
+
+    @property
+    def contactbook(self) -> Contactbook:
+        if self.contactbot is None:
+            self.contactbot = BotContactbook(new_contactbook())
+            # an SQLite book opens its database on load, creating it if needed
+            if STORAGE == "sqlite" or os.path.exists(f"{self.contact_file}.{self.contactbot.contactbook.extension}"):
+                self.contactbot.contactbook.load(self.contact_file)
+                log(f"contactbook '{self.contact_file}' loaded")
+        return self.contactbot.contactbook
+
+    @property
+    def notebook(self) -> NoteBook:
+        if self.notebot is None:
+            self.notebot = BotNotebook(new_notebook())
+            # an SQLite book opens its database on load, creating it if needed
+            if STORAGE == "sqlite" or os.path.exists(f"{self.note_file}.{self.notebot.notebook.extension}"):
+                self.notebot.notebook.load(self.note_file)
+                log(f"notebook '{self.note_file}' loaded")
+        return self.notebot.notebook
+
+    @staticmethod
+    def _arguments(arguments: List[str], count: int, usage: str) -> List[str]:
+        if len(arguments) != count:
+            raise ValueError(f"usage: {usage}")
+        return arguments
+
+    @staticmethod
+    def _fields(arguments: List[str], fields: List[str]) -> Dict[str, str]:
+        record = dict.fromkeys(fields, "")
+        for argument in arguments:
+            field, separator, value = argument.partition("=")
+            if not separator or field not in record:
+                raise ValueError(f"expected field=value with a field of {', '.join(fields)} - '{argument}'")
+            record[field] = value.strip()
+        return record
+
+    def contact_add(self, arguments: List[str]):
+        record = self._fields(arguments, FIELDS_CONTACT)
+        record["firstname"] = record["firstname"].lower()
+        record["lastname"] = record["lastname"].lower()
+        errors = CONTACT_VALIDATOR.errors(record)
+        if errors:
+            raise ValueError(", ".join(errors))
+        name = f"{record['firstname']} {record['lastname']}"
+        if self.contactbook.find_contact(record["firstname"], record["lastname"]):
+            raise ValueError(f"contact '{name}' already exists")
+        self.contactbook.add(record)
+        self.changed.add("contact")
+        print_white_message(f"contact '{name}' added")
+        log(f"contact '{name}' added")
+
+    def contact_find(self, arguments: List[str]):
+        parameter, pattern = self._arguments(arguments, 2, "contact find <parameter> <pattern>")
+        if parameter not in FIELDS_CONTACT:
+            raise ValueError(f"incorrect parameter - '{parameter}'")
+        for item in self.contactbook.find_info(parameter, pattern):
+            print_record(item)
+
+    def contact_query(self, arguments: List[str]):
+        if not arguments:
+            raise ValueError("usage: contact query <query>")
+        print_query_result(self.contactbook.query(" ".join(arguments)))
+
+    def contact_fuzzy(self, arguments: List[str]):
+        if not 1 <= len(arguments) <= 2:
+            raise ValueError("usage: contact fuzzy <name> [<lastname>]")
+        print_fuzzy_result(self.contactbook.fuzzy_find(" ".join(arguments)))
+
+    def contact_statistics(self, arguments: List[str]):
+        filters = {}
+        for argument in arguments:
+            facet, separator, value = argument.partition("=")
+            if not separator or facet not in FACETS_CONTACT:
+                raise ValueError(f"usage: contact statistics [status=<status>] [domain=<domain>] - '{argument}'")
+            filters[facet] = value.strip()
+        print_statistics(self.contactbook.statistics(**filters))
+        if filters:
+            contacts = self.contactbook.facet_contacts(**filters)
+            for item in contacts:
+                print_record(item)
+            print_yellow_message(f"{len(contacts)} contacts")
+
+    def contact_dedup(self, arguments: List[str]):
+        if arguments not in ([], ["merge"]):
+            raise ValueError("usage: contact dedup [merge]")
+        report = self.contactbook.find_duplicates()
+        print_duplicates(
+            [self.contactbook.duplicate_records(cluster) for cluster in report.clusters], report.scores)
+        if arguments and report.clusters:
+            removed = self.contactbook.merge_duplicates(report.clusters)
+            self.changed.add("contact")
+            print_white_message(f"{removed} duplicate contacts merged")
+            log(f"{removed} duplicate contacts merged")
+
+    def contact_edit(self, arguments: List[str]):
+        firstname, lastname, parameter, new_value = self._arguments(
+            arguments, 4, "contact edit <firstname> <lastname> <parameter> <new value>")
+        if parameter not in FIELDS_CONTACT:
+            raise ValueError(f"incorrect parameter - '{parameter}'")
+        if not CONTACT_VALIDATOR.check(parameter, new_value):
+            raise ValueError(f"incorrect {parameter} - '{new_value}'")
+        if not self.contactbook.find_contact(firstname, lastname):
+            raise ValueError(f"contact '{firstname} {lastname}' not found")
+        if parameter == "firstname":
+            self.contactbook.rename(firstname, lastname, new_value, lastname)
+        elif parameter == "lastname":
+            self.contactbook.rename(firstname, lastname, firstname, new_value)
+        else:
+            self.contactbook.edit(firstname, lastname, parameter, new_value)
+        self.changed.add("contact")
+        print_white_message(f"contact '{firstname} {lastname}' edited")
+        log(f"contact '{firstname} {lastname}' edited")
+
+    def contact_delete(self, arguments: List[str]):
+        firstname, lastname = self._arguments(arguments, 2, "contact delete <firstname> <lastname>")
+        if self.contactbook.delete_contact(firstname, lastname) is None:
+            raise ValueError(f"contact '{firstname} {lastname}' not found")
+        self.changed.add("contact")
+        print_white_message(f"contact '{firstname} {lastname}' deleted")
+        log(f"contact '{firstname} {lastname}' deleted")
+
+    def contact_clear(self, arguments: List[str]):
+        self._arguments(arguments, 0, "contact clear")
+        self.contactbook.clear_contactbook()
+        self.changed.add("contact")
+        print_white_message(f"contactbook cleared")
+        log(f"contactbook cleared")
+
+    def contact_undo(self, arguments: List[str]):
+        self._arguments(arguments, 0, "contact undo")
+        description = self.contactbook.undo()
+        if description is None:
+            raise ValueError("nothing to undo")
+        self.changed.add("contact")
+        print_white_message(f"undone: {description}")
+        log(f"undone: {description}")
+
+    def contact_redo(self, arguments: List[str]):
+        self._arguments(arguments, 0, "contact redo")
+        description = self.contactbook.redo()
+        if description is None:
+            raise ValueError("nothing to redo")
+        self.changed.add("contact")
+        print_white_message(f"redone: {description}")
+        log(f"redone: {description}")
+
+    def contact_birthdays(self, arguments: List[str]):
+        days, = self._arguments(arguments, 1, "contact birthdays <days>")
+        print_birthdays(self.contactbook.upcoming_birthdays(int(days)))
+
+    def contact_import(self, arguments: List[str]):
+        file_name, = self._arguments(arguments, 1, "contact import <file>")
+        if not os.path.isfile(file_name):
+            raise ValueError(f"file '{file_name}' not found")
+        report = import_contacts(self.contactbook, file_name)
+        if report.imported:
+            self.changed.add("contact")
+        print_import_report(report)
+        log(f"contacts imported from '{file_name}': {report.imported}, rejected: {len(report.rejected)}")
+
+    def contact_export(self, arguments: List[str]):
+        file_name, = self._arguments(arguments, 1, "contact export <file>")
+        count = export_contacts(self.contactbook, file_name)
+        print_white_message(f"{count} contacts exported to '{file_name}'")
+        log(f"{count} contacts exported to '{file_name}'")
+
+    def contact_save(self, arguments: List[str]):
+        file_name, = self._arguments(arguments, 1, "contact save <file>")
+        self.contactbook.save(file_name)
+        print_white_message(f"contactbook '{file_name}' saved")
+        log(f"contactbook '{file_name}' saved")
+
+    def note_add(self, arguments: List[str]):
+        record = {field: value.lower() for field, value in self._fields(arguments, FIELDS_NOTE).items()}
+        errors = NOTE_VALIDATOR.errors(record)
+        if errors:
+            raise ValueError(", ".join(errors))
+        if self.notebook.find_note(record["title"]) is not None:
+            raise ValueError(f"note '{record['title']}' already exists")
+        self.notebook.add(RecordNotebook(record["title"], record["note"], record["tag"]))
+        self.changed.add("note")
+        print_white_message(f"note '{record['title']}' added")
+        log(f"note '{record['title']}' added")
+
+    def note_find(self, arguments: List[str]):
+        parameter, pattern = self._arguments(arguments, 2, "note find <title|tag> <pattern>")
+        if parameter == "title":
+            result = self.notebook.find_note_by_title(pattern)
+        elif parameter == "tag":
+            result = self.notebook.find_note_by_tag(pattern)
+        else:
+            raise ValueError(f"incorrect parameter - '{parameter}'")
+        for item in result:
+            print_record(item)
+
+    def note_search(self, arguments: List[str]):
+        if not arguments:
+            raise ValueError("usage: note search <words>")
+        # the quotes of a phrase are gone after splitting the line, an argument with spaces was one
+        text = " ".join(f'"{argument}"' if " " in argument else argument for argument in arguments)
+        print_search_result(self.notebook.search_notes(text))
+
+    def note_tags(self, arguments: List[str]):
+        usage = "usage: note tags [all=<tags>] [any=<tags>] [none=<tags>]"
+        tags = {"all": set(), "any": set(), "none": set()}
+        for argument in arguments:
+            kind, separator, value = argument.partition("=")
+            if not separator or kind not in tags:
+                raise ValueError(f"{usage} - '{argument}'")
+            tags[kind] |= parse_tags(value)
+        if not any(tags.values()):
+            raise ValueError(usage)
+        result = self.notebook.find_notes_by_tags(tags["all"], tags["any"], tags["none"])
+        for item in result:
+            print_record(item)
+        print_yellow_message(f"{len(result)} notes")
+
+    def note_cloud(self, arguments: List[str]):
+        self._arguments(arguments, 0, "note cloud")
+        print_tag_cloud(self.notebook.tag_cloud())
+
+    def note_edit(self, arguments: List[str]):
+        title, parameter, new_value = self._arguments(
+            arguments, 3, "note edit <title> <parameter> <new value>")
+        if parameter not in FIELDS_NOTE:
+            raise ValueError(f"incorrect parameter - '{parameter}'")
+        if not NOTE_VALIDATOR.check(parameter, new_value):
+            raise ValueError(f"incorrect {parameter} - '{new_value}'")
+        if self.notebook.find_note(title) is None:
+            raise ValueError(f"note '{title}' not found")
+        if parameter == "title":
+            self.notebook.rename(title, new_value)
+        else:
+            self.notebook.edit_note(title, parameter, new_value)
+        self.changed.add("note")
+        print_white_message(f"note '{title}' edited")
+        log(f"note '{title}' edited")
+
+    def note_delete(self, arguments: List[str]):
+        title, = self._arguments(arguments, 1, "note delete <title>")
+        if self.notebook.delete_note(title) is None:
+            raise ValueError(f"note '{title}' not found")
+        self.changed.add("note")
+        print_white_message(f"note '{title}' deleted")
+        log(f"note '{title}' deleted")
+
+    def note_clear(self, arguments: List[str]):
+        self._arguments(arguments, 0, "note clear")
+        self.notebook.clear_notebook()
+        self.changed.add("note")
+        print_white_message(f"notebook cleared")
+        log(f"notebook cleared")
+
+    def note_undo(self, arguments: List[str]):
+        self._arguments(arguments, 0, "note undo")
+        description = self.notebook.undo()
+        if description is None:
+            raise ValueError("nothing to undo")
+        self.changed.add("note")
+        print_white_message(f"undone: {description}")
+        log(f"undone: {description}")
+
+    def note_redo(self, arguments: List[str]):
+        self._arguments(arguments, 0, "note redo")
+        description = self.notebook.redo()
+        if description is None:
+            raise ValueError("nothing to redo")
+        self.changed.add("note")
+        print_white_message(f"redone: {description}")
+        log(f"redone: {description}")
+
+    def note_import(self, arguments: List[str]):
+        file_name, = self._arguments(arguments, 1, "note import <file>")
+        if not os.path.isfile(file_name):
+            raise ValueError(f"file '{file_name}' not found")
+        report = import_notes(self.notebook, file_name)
+        if report.imported:
+            self.changed.add("note")
+        print_import_report(report)
+        log(f"notes imported from '{file_name}': {report.imported}, rejected: {len(report.rejected)}")
+
+    def note_export(self, arguments: List[str]):
+        file_name, = self._arguments(arguments, 1, "note export <file>")
+        count = export_notes(self.notebook, file_name)
+        print_white_message(f"{count} notes exported to '{file_name}'")
+        log(f"{count} notes exported to '{file_name}'")
+
+    def note_save(self, arguments: List[str]):
+        file_name, = self._arguments(arguments, 1, "note save <file>")
+        self.notebook.save(file_name)
+        print_white_message(f"notebook '{file_name}' saved")
+        log(f"notebook '{file_name}' saved")
+
+    def sort(self, arguments: List[str]):
+        path, = self._arguments(arguments, 1, "sort <path>")
+        path = Path(path)
+        if not path.exists():
+            raise ValueError(f"path '{path}' is not found")
+        self.filesort.sort_func(path)
+        self.filesort.unpack_archive(path)
+        self.filesort.print_result_sort(path)
+        log(f"path '{path}' sorted")
+
+    def calc(self, arguments: List[str]):
+        if not arguments:
+            raise ValueError("usage: calc <operation>")
+        operation = " ".join(arguments)
+        try:
+            result = numexpr.evaluate(operation)
+        except ZeroDivisionError:
+            raise ValueError("incorrect operating division by zero")
+        except Exception:
+            raise ValueError(f"incorrect operating - '{operation}'")
+        print_white_message(f"result: {result.round(4)}")
+
+    def handle(self, line: str):
+        """
+        The handle function runs one line of a batch script.
+        A line is a command followed by its arguments separated by spaces, values with spaces go in quotes
+        and everything after # is a comment.
+        :param self: Represent the instance of the class
+        :param line: str: The line to run
+        """
+        words = shlex.split(line, comments=True)
+        if not words:
+            return
+        if words[0] == "sort":
+            self.sort(words[1:])
+        elif words[0] == "calc":
+            self.calc(words[1:])
+        elif tuple(words[:2]) in self.commands:
+            self.commands[tuple(words[:2])](words[2:])
+        else:
+            raise ValueError(f"unknown command - '{' '.join(words[:2])}'")
+
+    def run(self, lines: Iterable[str]) -> int:
+        """
+        The run function runs a batch script line by line without clearing the screen or asking anything.
+        A failing line is reported and skipped, the following lines still run.
+        Changed books are saved once after the last line.
+        :param self: Represent the instance of the class
+        :param lines: Iterable[str]: The lines of the script
+        :return: The number of lines that failed
+        """
+        for number, line in enumerate(lines, 1):
+            try:
+                self.handle(line)
+            except Exception as e:
+                self.errors += 1
+                print_red_message(f"line {number}: {e}")
+                log(f"batch line {number}: {e}")
+        if "contact" in self.changed:
+            self.contactbook.save(self.contact_file)
+            log(f"contactbook '{self.contact_file}' saved")
+        if "note" in self.changed:
+            self.notebook.save(self.note_file)
+            log(f"notebook '{self.note_file}' saved")
+        return self.errors
+
+
+class BotServer:
+    def __init__(self, contact_file: str = "contactbook_save", note_file: str = "notebook_save"):
+        """
+        The __init__ function prepares the books served over HTTP by the serve mode.
+        Both books are loaded at once and kept in memory with their indexes built,
+        so reads never touch the disk, and the server saves them periodically.
+        :param self: Represent the instance of the class
+        :param contact_file: str: The contactbook save file name without the extension
+        :param note_file: str: The notebook save file name without the extension
+        """
+        self.contact_file = contact_file
+        self.note_file = note_file
+        self.contactbook = new_contactbook()
+        self.notebook = new_notebook()
+        for book, file_name in ((self.contactbook, contact_file), (self.notebook, note_file)):
+            if STORAGE == "sqlite" or os.path.exists(f"{file_name}.{book.extension}"):
+                book.load(file_name)
+                log(f"'{file_name}' loaded by the server")
+        self.contactbook._materialize()
+        self.routes = [
+            Route("GET", "/contacts", self.contact_list),
+            Route("POST", "/contacts", self.contact_add, writes=True, status=201),
+            Route("GET", "/contacts/{firstname}/{lastname}", self.contact_get),
+            Route("PATCH", "/contacts/{firstname}/{lastname}", self.contact_edit, writes=True),
+            Route("DELETE", "/contacts/{firstname}/{lastname}", self.contact_delete, writes=True),
+            Route("GET", "/birthdays", self.contact_birthdays),
+            Route("GET", "/notes", self.note_list),
+            Route("POST", "/notes", self.note_add, writes=True, status=201),
+            Route("GET", "/notes/{title}", self.note_get),
+            Route("PATCH", "/notes/{title}", self.note_edit, writes=True),
+            Route("DELETE", "/notes/{title}", self.note_delete, writes=True),
+            Route("GET", "/tags", self.note_cloud),
+        ]
+
+    @staticmethod
+    def _window(query: Dict[str, str]) -> Tuple[int, int]:
+        try:
+            offset = int(query.get("offset", 0))
+            limit = int(query.get("limit", SERVER_PAGE_SIZE))
+        except ValueError:
+            raise ValueError("offset and limit must be numbers")
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit must not be negative")
+        return offset, limit
+
+    def _page(self, items: Sequence[Mapping], query: Dict[str, str]) -> Dict:
+        offset, limit = self._window(query)
+        return {"count": len(items), "items": [dict(item) for item in items[offset: offset + limit]]}
+
+    def _book_page(self, book, query: Dict[str, str]) -> Dict:
+        """
+        The _book_page function answers a page of a whole book in the order asked by ?order=.
+        The page is read from the sort keys of the book's cursor, so a deep offset costs no more than the first page.
+        :param self: Represent the instance of the class
+        :param book: The contactbook or the notebook
+        :param query: Dict[str, str]: The query parameters, with the offset, limit and order
+        :return: The number of records of the book and the records of the page
+        """
+        offset, limit = self._window(query)
+        source = book.cursor(query.get("order", "added"), max(limit, 1)).source
+        return {"count": source.count(), "items": [dict(record) for _, record in source.page_at(offset, limit)]}
+
+    @staticmethod
+    def _fields(body, fields: List[str], required: bool) -> Dict[str, str]:
+        if not isinstance(body, dict):
+            raise ValueError("expected a JSON object")
+        unknown = [field for field in body if field not in fields]
+        if unknown:
+            raise ValueError(f"unknown fields {', '.join(unknown)}, expected {', '.join(fields)}")
+        if not all(isinstance(value, str) for value in body.values()):
+            raise ValueError("field values must be strings")
+        if required:
+            return {field: body.get(field, "").strip() for field in fields}
+        return {field: value.strip() for field, value in body.items()}
+
+    def _contact(self, firstname: str, lastname: str) -> Mapping:
+        item = self.contactbook.find_contact(firstname, lastname)
+        if item is None:
+            raise HttpError(404, f"contact '{firstname} {lastname}' not found")
+        return item
+
+    def _note(self, title: str) -> Dict:
+        note = self.notebook.find_note(title)
+        if note is None:
+            raise HttpError(404, f"note '{title}' not found")
+        return note
+
+    def contact_list(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        if "query" in query:
+            return self._page(self.contactbook.query(query["query"]).records, query)
+        if "parameter" in query:
+            if query["parameter"] not in FIELDS_CONTACT:
+                raise ValueError(f"incorrect parameter - '{query['parameter']}'")
+            return self._page(self.contactbook.find_info(query["parameter"], query.get("pattern", "")), query)
+        return self._book_page(self.contactbook, query)
+
+    def contact_get(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        return dict(self._contact(params["firstname"], params["lastname"]))
+
+    def contact_add(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        record = self._fields(body, FIELDS_CONTACT, required=True)
+        record["firstname"] = record["firstname"].lower()
+        record["lastname"] = record["lastname"].lower()
+        errors = CONTACT_VALIDATOR.errors(record)
+        if errors:
+            raise ValueError(", ".join(errors))
+        if self.contactbook.find_contact(record["firstname"], record["lastname"]):
+            raise HttpError(409, f"contact '{record['firstname']} {record['lastname']}' already exists")
+        self.contactbook.add(record)
+        log(f"contact '{record['firstname']} {record['lastname']}' added by the server")
+        return record
+
+    def contact_edit(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        firstname, lastname = params["firstname"], params["lastname"]
+        self._contact(firstname, lastname)
+        changes = self._fields(body, FIELDS_CONTACT, required=False)
+        for parameter, new_value in changes.items():
+            if not CONTACT_VALIDATOR.check(parameter, new_value):
+                raise ValueError(f"incorrect {parameter} - '{new_value}'")
+        name = (changes.pop("firstname", firstname), changes.pop("lastname", lastname))
+        try:
+            self.contactbook.rename(firstname, lastname, *name)
+        except RecordExistsError as e:
+            raise HttpError(409, str(e))
+        firstname, lastname = name
+        for parameter, new_value in changes.items():
+            self.contactbook.edit(firstname, lastname, parameter, new_value)
+        log(f"contact '{firstname} {lastname}' edited by the server")
+        return dict(self._contact(firstname, lastname))
+
+    def contact_delete(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        item = self.contactbook.delete_contact(params["firstname"], params["lastname"])
+        if item is None:
+            raise HttpError(404, f"contact '{params['firstname']} {params['lastname']}' not found")
+        log(f"contact '{params['firstname']} {params['lastname']}' deleted by the server")
+        return dict(item)
+
+    def contact_birthdays(self, params: Dict[str, str], query: Dict[str, str], body) -> List[Dict]:
+        try:
+            days = int(query.get("days", 7))
+        except ValueError:
+            raise ValueError(f"incorrect days - '{query['days']}'")
+        return [
+            {"date": birthday.isoformat(), "contact": dict(item)}
+            for birthday, item in self.contactbook.upcoming_birthdays(days)
+        ]
+
+    def note_list(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        if "text" in query:
+            found = self.notebook.search_notes(query["text"], int(query.get("limit", SERVER_PAGE_SIZE)))
+            return {"count": len(found), "items": [{"score": score, **note} for score, note in found]}
+        if "title" in query:
+            items = self.notebook.find_note_by_title(query["title"])
+        elif "tag" in query:
+            items = self.notebook.find_note_by_tag(query["tag"])
+        elif query.keys() & {"all", "any", "none"}:
+            items = self.notebook.find_notes_by_tags(
+                parse_tags(query.get("all", "")), parse_tags(query.get("any", "")), parse_tags(query.get("none", "")))
+        else:
+            return self._book_page(self.notebook, query)
+        return self._page(items, query)
+
+    def note_cloud(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict[str, int]:
+        return self.notebook.tag_cloud()
+
+    def note_get(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        return dict(self._note(params["title"]))
+
+    def note_add(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        record = {field: value.lower() for field, value in self._fields(body, FIELDS_NOTE, required=True).items()}
+        errors = NOTE_VALIDATOR.errors(record)
+        if errors:
+            raise ValueError(", ".join(errors))
+        if self.notebook.find_note(record["title"]) is not None:
+            raise HttpError(409, f"note '{record['title']}' already exists")
+        self.notebook.add(RecordNotebook(record["title"], record["note"], record["tag"]))
+        log(f"note '{record['title']}' added by the server")
+        return record
+
+    def note_edit(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        title = params["title"]
+        self._note(title)
+        changes = self._fields(body, FIELDS_NOTE, required=False)
+        for parameter, new_value in changes.items():
+            if not NOTE_VALIDATOR.check(parameter, new_value):
+                raise ValueError(f"incorrect {parameter} - '{new_value}'")
+        new_title = changes.pop("title", title)
+        try:
+            self.notebook.rename(title, new_title)
+        except RecordExistsError as e:
+            raise HttpError(409, str(e))
+        title = new_title
+        for parameter, new_value in changes.items():
+            self.notebook.edit_note(title, parameter, new_value)
+        log(f"note '{title}' edited by the server")
+        return dict(self._note(title))
+
+    def note_delete(self, params: Dict[str, str], query: Dict[str, str], body) -> Dict:
+        note = self.notebook.delete_note(params["title"])
+        if note is None:
+            raise HttpError(404, f"note '{params['title']}' not found")
+        log(f"note '{params['title']}' deleted by the server")
+        return note
+
+    def run(self, port: int, save_interval: float = SAVE_INTERVAL):
+        """
+        The run function serves the books on localhost until the process is interrupted.
+        :param self: Represent the instance of the class
+        :param port: int: The TCP port
+        :param save_interval: float: Seconds between two saves of the changed books
+        """
+        books = [(self.contactbook, self.contact_file), (self.notebook, self.note_file)]
+        # the SQLite books keep one connection, which only the thread that opened it may use
+        read_workers = READ_WORKERS if all(book.background_save for book, _ in books) else 0
+        server = JsonServer(self.routes, books, save_interval, read_workers)
+
+        def ready(bound: int):
+            print(f"serving on http://{SERVER_HOST}:{bound}, press Ctrl+C to stop")
+            log(f"server started on port {bound}")
+
+        try:
+            asyncio.run(server.serve(port, ready))
+        except KeyboardInterrupt:
+            pass
+        for book, file_name in server.books:
+            if book.needs_save(file_name):
+                book.save(file_name)
+                log(f"'{file_name}' saved by the server")
+        log(f"server stopped after {server.requests} requests")
+
+
+def batch(file_name: str) -> int:
+    init(strip=not sys.stdout.isatty())
+    if file_name == "-":
+        return BotBatch().run(sys.stdin)
+    with open(file_name, encoding="utf-8") as file:
+        return BotBatch().run(file)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="contactbook")
+    parser.add_argument(
+        "--batch",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="run the commands of FILE, or of the standard input, without the menus",
+    )
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["serve"],
+        help="serve: answer JSON requests over HTTP on localhost instead of showing the menus",
+    )
+    parser.add_argument("--port", type=int, default=8080, help="the port of the serve mode, 8080 by default")
+    arguments = parser.parse_args(argv)
+    if arguments.batch is not None:
+        sys.exit(1 if batch(arguments.batch) else 0)
+    if arguments.command == "serve":
+        BotServer().run(arguments.port)
+        return
+
     init()
     while True:
         os.system("cls")
@@ -0,0 +1,217 @@
+__author__ = "VadimTrubay"
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Positions(Sequence):
+    def __init__(self, count: int):
+        """
+        The __init__ function creates the sort keys of the insertion order without storing them.
+        The key of the record at position i is the tuple (i,).
+        :param self: Represent the instance of the class
+        :param count: int: The number of records
+        """
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [(i,) for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("list index out of range")
+        return (index,)
+
+
+class CalendarKeys(Sequence):
+    def __init__(self, calendar: Sequence, undated: Sequence):
+        """
+        The __init__ function reads the sort keys of the birthday order straight from a birthday calendar.
+        The key of a (month, day, id) entry is (month * 100 + day, id), the records without a valid birthday
+        follow with the key (1300, id), see month_day.
+        :param self: Represent the instance of the class
+        :param calendar: Sequence: The sorted (month, day, id) entries of the calendar
+        :param undated: Sequence: The sorted ids of the records without a valid birthday
+        """
+        self.calendar = calendar
+        self.undated = undated
+
+    def __len__(self) -> int:
+        return len(self.calendar) + len(self.undated)
+
+    def _key(self, index: int) -> tuple:
+        if index < len(self.calendar):
+            month, day, rid = self.calendar[index]
+            return month * 100 + day, rid
+        return month_day(None), self.undated[index - len(self.calendar)]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._key(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("list index out of range")
+        return self._key(index)
+
+
+class SequenceSource:
+    def __init__(
+        self,
+        keys: Sequence,
+        record: Callable[[tuple], Dict],
+        prefix: Callable[[str], tuple],
+    ):
+        """
+        The __init__ function creates a page source over sort keys kept in memory in ascending order.
+        Every key ends with the record id, so no two keys are equal and a key marks one place in the order.
+        :param self: Represent the instance of the class
+        :param keys: Sequence: The sorted keys
+        :param record: Callable[[tuple], Dict]: Returns the record of a key, called only for the records of a page
+        :param prefix: Callable[[str], tuple]: Turns the text to seek into the leading part of a key
+        """
+        self.keys = keys
+        self.record = record
+        self.prefix = prefix
+
+    def _page(self, start: int, stop: int) -> List[Tuple[tuple, Dict]]:
+        return [(key, self.record(key)) for key in self.keys[max(start, 0): stop]]
+
+    def count(self) -> int:
+        return len(self.keys)
+
+    def rank(self, key: tuple) -> int:
+        return bisect_left(self.keys, key)
+
+    def page_at(self, offset: int, limit: int) -> List[Tuple[tuple, Dict]]:
+        return self._page(offset, offset + limit)
+
+    def page_from(self, key: tuple, limit: int) -> List[Tuple[tuple, Dict]]:
+        start = bisect_left(self.keys, key)
+        return self._page(start, start + limit)
+
+    def page_after(self, key: tuple, limit: int) -> List[Tuple[tuple, Dict]]:
+        start = bisect_right(self.keys, key)
+        return self._page(start, start + limit)
+
+    def page_before(self, key: tuple, limit: int) -> List[Tuple[tuple, Dict]]:
+        stop = bisect_left(self.keys, key)
+        return self._page(stop - limit, stop)
+
+
+class Cursor:
+    def __init__(self, source, page_size: int):
+        """
+        The __init__ function opens a cursor on the first page of a book.
+        The cursor remembers the keys of the first and last record of its page and asks the source
+        for the records right after or before them, so moving costs one page whatever the size of the book.
+        :param self: Represent the instance of the class
+        :param source: The page source: SequenceSource or SqliteOrder
+        :param page_size: int: The number of records per page
+        """
+        if page_size < 1:
+            raise ValueError("page size must be a positive number")
+        self.source = source
+        self.page_size = page_size
+        self.position = 0
+        self.entries = source.page_at(0, page_size)
+
+    @property
+    def records(self) -> List[Dict]:
+        return [record for _, record in self.entries]
+
+    @property
+    def page_number(self) -> int:
+        return self.position // self.page_size + 1
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.source.count() // self.page_size))
+
+    def next(self) -> bool:
+        """
+        The next function moves the cursor to the records following the current page.
+        :param self: Represent the instance of the class
+        :return: False if the current page is the last one
+        """
+        if not self.entries:
+            return False
+        entries = self.source.page_after(self.entries[-1][0], self.page_size)
+        if not entries:
+            return False
+        self.position += len(self.entries)
+        self.entries = entries
+        return True
+
+    def previous(self) -> bool:
+        """
+        The previous function moves the cursor to the records preceding the current page.
+        :param self: Represent the instance of the class
+        :return: False if the current page is the first one
+        """
+        if not self.entries or self.position == 0:
+            return False
+        entries = self.source.page_before(self.entries[0][0], self.page_size)
+        if not entries:
+            return False
+        self.position = max(self.position - len(entries), 0)
+        self.entries = entries
+        return True
+
+    def page(self, number: int) -> bool:
+        """
+        The page function jumps to a page by its number, counting from 1.
+        :param self: Represent the instance of the class
+        :param number: int: The page number
+        :return: False if there is no such page
+        """
+        if not 1 <= number <= self.pages:
+            return False
+        self.position = (number - 1) * self.page_size
+        self.entries = self.source.page_at(self.position, self.page_size)
+        return True
+
+    def seek(self, text: str) -> bool:
+        """
+        The seek function jumps to the first record whose sort key starts at or after the text,
+        for example the first lastname beginning with "le".
+        :param self: Represent the instance of the class
+        :param text: str: The beginning of the sort key
+        :return: False if no record comes at or after the text
+        """
+        key = self.source.prefix(text)
+        entries = self.source.page_from(key, self.page_size)
+        if not entries:
+            return False
+        self.position = self.source.rank(key)
+        self.entries = entries
+        return True
+
+
+def text_prefix(text: str) -> tuple:
+    return (text.strip().lower(),)
+
+
+def no_prefix(text: str) -> tuple:
+    raise ValueError("the order the records were added in has no key to seek, go to a page instead")
+
+
+def month_day_prefix(text: str) -> tuple:
+    """
+    The month_day_prefix function turns a day of the year written as dd.mm into the key of the birthday order.
+    :param text: str: The day, for example 15.03
+    :return: A (month * 100 + day,) tuple
+    """
+    day, _, month = text.strip().partition(".")
+    return (int(month) * 100 + int(day),)
+
+
+def month_day(birth_day: Optional[date]) -> int:
+    # contacts without a valid birthday go after the 31st of December
+    return 1300 if birth_day is None else birth_day.month * 100 + birth_day.day
@@ -1,7 +1,7 @@
 __author__ = "VadimTrubay"
 
 from time import sleep
-from typing import List, Dict
+from typing import Dict, Iterable, List
 
 from colorama import Fore
 
@@ -22,9 +22,10 @@ def print_main_menu():
     print_white_message(42 * "-" + "\n")
 
 
-def print_contactbook_menu():
+def print_contactbook_menu(undoable: bool = True):
     """
     The print_contactbook_menu function prints the menu of the contactbook.
+    :param undoable: bool: Whether the contactbook can undo changes, the SQLite storage cannot
     """
     print_red_message("{:^42}".format("Contactbook"))
     print_white_message(42 * "-" + "")
@@ -38,13 +39,24 @@ def print_contactbook_menu():
     print_green_message("8. clear contactbook")
     print_green_message("9. save contactbook")
     print_green_message("10. load contactbook")
-    print_green_message("11. exit")
+    print_green_message("11. birthdays in next days")
+    print_green_message("12. import contacts (csv, vcf)")
+    print_green_message("13. export contacts (csv, vcf)")
+    print_green_message("14. query contacts")
+    print_green_message("15. find contacts by name with typos")
+    print_green_message("16. contacts statistics")
+    print_green_message("17. find and merge duplicate contacts")
+    if undoable:
+        print_green_message("18. undo last change")
+        print_green_message("19. redo")
+    print_green_message("20. exit")
     print_white_message(42 * "-" + "")
 
 
-def print_notebook_menu():
+def print_notebook_menu(undoable: bool = True):
     """
     The print_notebook_menu function prints the menu for the notebook program.
+    :param undoable: bool: Whether the notebook can undo changes, the SQLite storage cannot
     """
     print_red_message("{:^42}".format("Notebook"))
     print_white_message(42 * "-" + "")
@@ -57,7 +69,15 @@ def print_notebook_menu():
     print_green_message("7. clear notebook")
     print_green_message("8. save notebook")
     print_green_message("9. load notebook")
-    print_green_message("10. exit")
+    print_green_message("10. import notes (csv, jsonl)")
+    print_green_message("11. export notes (csv, jsonl)")
+    if undoable:
+        print_green_message("12. undo last change")
+        print_green_message("13. redo")
+    print_green_message("14. search notes by text")
+    print_green_message("15. find notes by tags (all, any, none of)")
+    print_green_message("16. tag cloud")
+    print_green_message("17. exit")
     print_white_message(42 * "-" + "")
 
 
@@ -149,27 +169,23 @@ def print_record(value: Dict):
     print_white_message("-" * 25)
 
 
-def print_all_name_contacts(all_contacts: List):
+def print_all_name_contacts(all_contacts: Iterable[str]):
     """
-    The print_all_name_contacts function prints all the names of contacts in a sorted list.
-        Args:
-            all_contacts (List): A list of contact dictionaries.
-
-    :param all_contacts: List: Specify the type of the parameter
-    :return: A list of all the names in the contacts
+    The print_all_name_contacts function prints the names of contacts.
+    :param all_contacts: Iterable[str]: The names, already in alphabetical order
     """
     print_green_message("all names:")
-    for contact in sorted(all_contacts):
+    for contact in all_contacts:
         print_white_message(contact)
 
 
-def print_all_titles(all_titles: List):
+def print_all_titles(all_titles: Iterable[str]):
     """
-    The print_all_titles function prints all the titles in a list of dictionaries.
-    :param all_titles: List: Specify that the function expects a list of strings
+    The print_all_titles function prints the titles of notes.
+    :param all_titles: Iterable[str]: The titles, already in alphabetical order
     """
     print_green_message("all titles:")
-    for title in sorted(all_titles):
+    for title in all_titles:
         print_white_message(title)
 
 
@@ -186,6 +202,109 @@ def print_congratulate(congratulate: Dict):
                 print_white_message(f"{', '.join(contact)}")
 
 
+def print_birthdays(birthdays: List):
+    """
+    The print_birthdays function prints the upcoming birthdays with their dates.
+    :param birthdays: List: A list of (date, record) tuples ordered by date
+    """
+    for day, contact in birthdays:
+        print_green_message(f"{day.strftime('%d.%m.%Y')}: ", end="")
+        print_white_message(f"{contact['firstname']} {contact['lastname']}")
+
+
+def print_import_report(report):
+    """
+    The print_import_report function prints how many records were imported and why the other rows were rejected.
+    :param report: ImportReport: The report returned by an import
+    """
+    print_yellow_message(f"imported: {report.imported}, rejected: {len(report.rejected)}")
+    for row, reason in report.rejected:
+        print_red_message(f"row {row}: ", end="")
+        print_white_message(reason)
+
+
+def print_query_result(result):
+    """
+    The print_query_result function prints the contacts found by a query, followed by the query plan and timings.
+    :param result: QueryResult: The result returned by a query
+    """
+    for record in result.records:
+        print_record(record)
+    print_yellow_message("plan:")
+    for line in result.plan:
+        print_white_message(f"  {line}")
+    print_yellow_message(
+        "time: " + ", ".join(f"{phase} {seconds * 1000:.2f} ms" for phase, seconds in result.timings.items())
+    )
+
+
+def print_fuzzy_result(found: List):
+    """
+    The print_fuzzy_result function prints the contacts found by a typo tolerant search with their edit distances.
+    :param found: List: A list of (edit distance, record) tuples
+    """
+    for distance, record in found:
+        print_yellow_message(f"distance: {distance}")
+        print_record(record)
+
+
+def print_search_result(found: List):
+    """
+    The print_search_result function prints the notes found by a full text search with their scores.
+    :param found: List: A list of (score, note) tuples, the best match first
+    """
+    for score, note in found:
+        print_yellow_message(f"score: {score:.2f}")
+        print_record(note)
+
+
+def print_tag_cloud(counts: Dict, limit: int = 30):
+    """
+    The print_tag_cloud function prints the tags of the notes with the number of notes of each, the most used first.
+    :param counts: Dict: The number of notes by tag
+    :param limit: int: How many tags to print at most
+    """
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    for tag, count in ranked[:limit]:
+        print_green_message(f"  {tag}: ", end="")
+        print_white_message(str(count))
+    if len(ranked) > limit:
+        print_white_message(f"  ... {len(ranked) - limit} more")
+
+
+def print_statistics(statistics: Dict, limit: int = 10):
+    """
+    The print_statistics function prints the number of contacts per status and per email domain, the most frequent first.
+    :param statistics: Dict: The counts by value of each facet, as returned by statistics
+    :param limit: int: How many values of a facet to print at most
+    """
+    labels = {"status": ("status", "no status"), "domain": ("email domain", "no email")}
+    for name, counts in statistics.items():
+        title, empty = labels.get(name, (name, "empty"))
+        print_yellow_message(f"{title}:")
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        for value, count in ranked[:limit]:
+            print_green_message(f"  {value or empty}: ", end="")
+            print_white_message(str(count))
+        if len(ranked) > limit:
+            print_white_message(f"  ... {len(ranked) - limit} more")
+
+
+def print_duplicates(clusters: List, scores: List[float]):
+    """
+    The print_duplicates function prints the groups of contacts found to be the same person.
+    :param clusters: List: The clusters as lists of records, the one kept on merge first
+    :param scores: List[float]: The score of each cluster
+    """
+    for number, (records, score) in enumerate(zip(clusters, scores), 1):
+        print_yellow_message(f"duplicates {number}, score {score:.2f}:")
+        for record in records:
+            print_white_message(
+                f"  {record['firstname']} {record['lastname']}, "
+                f"phone: {record['phone']}, email: {record['email']}, birthday: {record['birthday']}"
+            )
+
+
 def print_goodbye():
     """
     The print_goodbye function prints a yellow goodbye message to the user.
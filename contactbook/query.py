@@ -0,0 +1,342 @@
+__author__ = "VadimTrubay"
+
+import re
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+MONTHS = [
+    "january",
+    "february",
+    "march",
+    "april",
+    "may",
+    "june",
+    "july",
+    "august",
+    "september",
+    "october",
+    "november",
+    "december",
+]
+TEXT_OPERATORS = ("=", "^=", "$=", "~")
+COMPARISON_OPERATORS = ("<", "<=", ">", ">=")
+# compared in lower case, like the email domains of the statistics
+CASELESS_FIELDS = ("email",)
+TOKEN_PATTERN = re.compile(
+    r'\s*(?:(?P<paren>[()])|(?P<operator>\^=|\$=|<=|>=|=|~|<|>)'
+    r'|"(?P<quoted>(?:[^"\\]|\\.)*)"'
+    r"|'(?P<single_quoted>(?:[^'\\]|\\.)*)'"
+    r"""|(?P<word>(?:[^\s()"'=~<>^$]|[\^$](?!=))+))"""
+)
+
+
+def _parse_date(text: str) -> Optional[date]:
+    try:
+        return datetime.strptime(text, "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+def _parse_day(text: str) -> Tuple[int, int]:
+    day, month = text.split(".")
+    date(2000, int(month), int(day))
+    return int(month), int(day)
+
+
+def _parse_days(text: str) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """
+    The _parse_days function reads the days of the year a birthday query asks for.
+    :param text: str: A month name such as march, or a range of days such as 20.12..10.01
+    :return: A list of ((month, day), (month, day)) ranges, a range over the new year is split in two
+    """
+    name = text.lower()
+    for number, month in enumerate(MONTHS, 1):
+        if name == month or name == month[:3]:
+            return [((number, 1), (number, 31))]
+    first, separator, last = text.partition("..")
+    try:
+        first = _parse_day(first)
+        last = _parse_day(last) if separator else first
+    except ValueError:
+        raise ValueError(f"expected a month, a day like 29.02 or days like 01.03..31.03 - '{text}'")
+    if first <= last:
+        return [(first, last)]
+    return [(first, (12, 31)), ((1, 1), last)]
+
+
+class Condition:
+    def __init__(self, field: str, operator: str, value: str):
+        """
+        The __init__ function creates one condition of a query, such as status = work.
+        :param self: Represent the instance of the class
+        :param field: str: The field of the record to check
+        :param operator: str: = equal, ^= starts with, $= ends with, ~ contains,
+            <, <=, >, >= compare, in a birthday falls on the given days of the year
+        :param value: str: The value to compare with, in lower case for the fields of CASELESS_FIELDS
+        """
+        self.field = field
+        self.operator = operator
+        self.value = value.lower() if field in CASELESS_FIELDS else value
+        self.days = None
+        self.date = None
+        if operator == "in":
+            if field != "birthday":
+                raise ValueError(f"'in' works with birthday only, not with {field}")
+            self.days = _parse_days(value)
+        elif operator in COMPARISON_OPERATORS and field == "birthday":
+            self.date = _parse_date(value)
+            if self.date is None:
+                raise ValueError(f"expected a date like 01.03.1990 - '{value}'")
+
+    def matches(self, record: Mapping) -> bool:
+        value = record[self.field]
+        if self.field in CASELESS_FIELDS:
+            value = value.lower()
+        if self.operator == "=":
+            return value == self.value
+        if self.operator == "^=":
+            return value.startswith(self.value)
+        if self.operator == "$=":
+            return value.endswith(self.value)
+        if self.operator == "~":
+            return self.value in value
+        if self.field == "birthday":
+            birth_day = _parse_date(value)
+            if birth_day is None:
+                return False
+            if self.days is not None:
+                day = (birth_day.month, birth_day.day)
+                return any(first <= day <= last for first, last in self.days)
+            value, other = birth_day, self.date
+        else:
+            other = self.value
+        if self.operator == "<":
+            return value < other
+        if self.operator == "<=":
+            return value <= other
+        if self.operator == ">":
+            return value > other
+        return value >= other
+
+    def __str__(self) -> str:
+        return f"{self.field} {self.operator} '{self.value}'"
+
+
+class And:
+    def __init__(self, children: List):
+        self.children = children
+
+    def matches(self, record: Mapping) -> bool:
+        return all(child.matches(record) for child in self.children)
+
+    def __str__(self) -> str:
+        return "(" + " AND ".join(str(child) for child in self.children) + ")"
+
+
+class Or:
+    def __init__(self, children: List):
+        self.children = children
+
+    def matches(self, record: Mapping) -> bool:
+        return any(child.matches(record) for child in self.children)
+
+    def __str__(self) -> str:
+        return "(" + " OR ".join(str(child) for child in self.children) + ")"
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def matches(self, record: Mapping) -> bool:
+        return not self.child.matches(record)
+
+    def __str__(self) -> str:
+        return f"NOT {self.child}"
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"unexpected character at {position + 1} - '{text[position:]}'")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind in ("quoted", "single_quoted"):
+            kind, value = "quoted", re.sub(r"\\(.)", r"\1", value)
+        tokens.append((kind, value))
+    return tokens
+
+
+class Parser:
+    def __init__(self, text: str, fields: Iterable[str]):
+        """
+        The __init__ function prepares a query for parsing.
+        A query is conditions like field = value joined with AND, OR, NOT and parentheses,
+        values with spaces go in quotes: status = work AND NOT (address ~ "main street" OR birthday in march)
+        :param self: Represent the instance of the class
+        :param text: str: The query
+        :param fields: Iterable[str]: The fields of the records
+        """
+        self.tokens = tokenize(text)
+        self.position = 0
+        self.fields = list(fields)
+
+    def _peek(self) -> Tuple[Optional[str], Optional[str]]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def _take(self) -> Tuple[Optional[str], str]:
+        kind, value = self._peek()
+        self.position += 1
+        return kind, "end of query" if kind is None else value
+
+    def _keyword(self, keyword: str) -> bool:
+        kind, value = self._peek()
+        if kind == "word" and value.upper() == keyword:
+            self.position += 1
+            return True
+        return False
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("empty query")
+        node = self._or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"unexpected '{self._peek()[1]}'")
+        return node
+
+    def _or(self):
+        children = [self._and()]
+        while self._keyword("OR"):
+            children.append(self._and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def _and(self):
+        children = [self._not()]
+        while self._keyword("AND"):
+            children.append(self._not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def _not(self):
+        if self._keyword("NOT"):
+            return Not(self._not())
+        kind, value = self._peek()
+        if kind == "paren" and value == "(":
+            self.position += 1
+            node = self._or()
+            if self._take() != ("paren", ")"):
+                raise ValueError("missing ')'")
+            return node
+        return self._condition()
+
+    def _condition(self) -> Condition:
+        kind, field = self._take()
+        if kind != "word" or field not in self.fields:
+            raise ValueError(f"expected a field of {', '.join(self.fields)}, got {field}")
+        kind, operator = self._take()
+        if kind == "word" and operator.lower() == "in":
+            operator = "in"
+        elif kind != "operator":
+            raise ValueError(f"expected an operator after {field}, got {operator}")
+        kind, value = self._take()
+        if kind not in ("word", "quoted"):
+            raise ValueError(f"expected a value after {field} {operator}")
+        return Condition(field, operator, value)
+
+
+def parse_query(text: str, fields: Iterable[str]):
+    return Parser(text, fields).parse()
+
+
+class QueryResult:
+    def __init__(self, records: List[Mapping], plan: List[str], timings: Dict[str, float]):
+        """
+        The __init__ function keeps the outcome of a query with the details of how it was found.
+        :param self: Represent the instance of the class
+        :param records: List[Mapping]: The matching records in book order
+        :param plan: List[str]: The steps the planner chose, one per line
+        :param timings: Dict[str, float]: Seconds spent per phase
+        """
+        self.records = records
+        self.plan = plan
+        self.timings = timings
+
+
+Lookup = Callable[[Condition], Optional[Tuple[str, Set[int]]]]
+
+
+def plan_query(node, lookup: Lookup, depth: int = 0) -> Tuple[Optional[Set[int]], List[str]]:
+    """
+    The plan_query function finds the candidates of a query with the indexes, without checking any record.
+    A condition uses the most selective index the lookup offers, AND intersects the candidate sets
+    of its indexed parts from the smallest up, OR unites them if every branch is indexed.
+    NOT and conditions without an index give no candidates and are only checked on the records.
+    :param node: The parsed query
+    :param lookup: Lookup: Returns (description, record ids) of the best index for a condition, or None
+    :param depth: int: The nesting level, used to indent the plan
+    :return: The candidate record ids, or None if every record has to be checked, and the plan lines
+    """
+    indent = "  " * depth
+    if isinstance(node, Condition):
+        found = lookup(node)
+        if found is None:
+            return None, [f"{indent}{node}: no index, checked on the records"]
+        description, ids = found
+        return ids, [f"{indent}{node}: {description}, {len(ids)} candidates"]
+    if isinstance(node, Not):
+        _, lines = plan_query(node.child, lambda condition: None, depth + 1)
+        return None, [f"{indent}NOT: checked on the records"] + lines
+    results = [plan_query(child, lookup, depth + 1) for child in node.children]
+    lines = [line for _, child_lines in results for line in child_lines]
+    sets = [ids for ids, _ in results if ids is not None]
+    if isinstance(node, And):
+        if not sets:
+            return None, [f"{indent}AND: no indexed part"] + lines
+        sets.sort(key=len)
+        ids = set(sets[0])
+        for other in sets[1:]:
+            if not ids:
+                break
+            ids &= other
+        sizes = " & ".join(str(len(other)) for other in sets)
+        return ids, [f"{indent}AND: intersect {sizes} -> {len(ids)} candidates"] + lines
+    if len(sets) < len(results):
+        return None, [f"{indent}OR: a branch has no index"] + lines
+    ids = set().union(*sets)
+    return ids, [f"{indent}OR: union -> {len(ids)} candidates"] + lines
+
+
+def run_query(text: str, fields: Iterable[str], lookup: Lookup, records: Dict[int, Mapping]) -> QueryResult:
+    """
+    The run_query function parses a query, plans it over the indexes and checks the candidates.
+    :param text: str: The query
+    :param fields: Iterable[str]: The fields of the records
+    :param lookup: Lookup: Returns (description, record ids) of the best index for a condition, or None
+    :param records: Dict[int, Mapping]: All records by id, ids grow in book order
+    :return: A QueryResult
+    """
+    start = time.perf_counter()
+    node = parse_query(text, fields)
+    parsed = time.perf_counter()
+    ids, plan = plan_query(node, lookup)
+    planned = time.perf_counter()
+    if ids is None:
+        plan.append(f"full scan of {len(records)} records")
+        ids = records.keys()
+    else:
+        plan.append(f"check {len(ids)} candidates")
+    matched = [records[rid] for rid in sorted(rid for rid in ids if node.matches(records[rid]))]
+    checked = time.perf_counter()
+    plan.append(f"{len(matched)} matches")
+    return QueryResult(
+        matched,
+        plan,
+        {"parse": parsed - start, "plan": planned - parsed, "check": checked - planned},
+    )
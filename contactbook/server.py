@@ -0,0 +1,301 @@
+__author__ = "VadimTrubay"
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from logs import log
+
+SERVER_HOST = "127.0.0.1"
+SAVE_INTERVAL = 5.0
+# the reads share the interpreter lock, the threads let a slow query run alongside quick reads rather than before them
+READ_WORKERS = 8
+MAX_BODY = 1 << 20
+STATUS_TEXT = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        """
+        The __init__ function creates an error answered with an HTTP status and a JSON body {"error": message}.
+        :param self: Represent the instance of the class
+        :param status: int: The HTTP status code
+        :param message: str: What went wrong
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class RWLock:
+    def __init__(self):
+        """
+        The __init__ function creates a reader/writer lock for the coroutines of one event loop.
+        Any number of readers hold it at once, a writer holds it alone,
+        and a waiting writer keeps new readers out, so a steady stream of reads cannot starve it.
+        Taking a free lock does not wait, so an uncontended read costs a few attribute updates.
+        :param self: Represent the instance of the class
+        """
+        self.readers = 0
+        self.writer = False
+        self._writers_waiting = 0
+        self._waiters = []
+
+    async def _wait(self):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        await future
+
+    def _wake(self):
+        waiters, self._waiters = self._waiters, []
+        for future in waiters:
+            if not future.done():
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def reading(self):
+        while self.writer or self._writers_waiting:
+            await self._wait()
+        self.readers += 1
+        try:
+            yield
+        finally:
+            self.readers -= 1
+            if not self.readers:
+                self._wake()
+
+    @asynccontextmanager
+    async def writing(self):
+        self._writers_waiting += 1
+        try:
+            while self.writer or self.readers:
+                await self._wait()
+        finally:
+            self._writers_waiting -= 1
+        self.writer = True
+        try:
+            yield
+        finally:
+            self.writer = False
+            self._wake()
+
+
+class Route:
+    def __init__(self, method: str, pattern: str, handler: Callable, writes: bool = False, status: int = 200):
+        """
+        The __init__ function describes one endpoint of the server.
+        :param self: Represent the instance of the class
+        :param method: str: The HTTP method, GET, POST, PATCH or DELETE
+        :param pattern: str: The path, parts in braces are parameters, for example /contacts/{firstname}/{lastname}
+        :param handler: Callable: Called with the path parameters, the query parameters and the JSON body,
+            returns what is sent back as JSON
+        :param writes: bool: The handler changes a book, so it runs alone and the books are saved afterwards
+        :param status: int: The HTTP status of a successful answer
+        """
+        self.method = method
+        self.segments = pattern.strip("/").split("/")
+        self.handler = handler
+        self.writes = writes
+        self.status = status
+
+    def match(self, segments: List[str]) -> Optional[Dict[str, str]]:
+        if len(segments) != len(self.segments):
+            return None
+        params = {}
+        for expected, segment in zip(self.segments, segments):
+            if expected.startswith("{"):
+                params[expected[1:-1]] = segment
+            elif expected != segment:
+                return None
+        return params
+
+
+class JsonServer:
+    def __init__(
+        self,
+        routes: List[Route],
+        books: List[Tuple[Any, str]],
+        save_interval: float = SAVE_INTERVAL,
+        read_workers: int = READ_WORKERS,
+    ):
+        """
+        The __init__ function creates an HTTP server answering JSON requests from the local machine only.
+        The books stay in memory and the requests are read and answered on one event loop.
+        Read handlers run on a pool of read_workers threads under the read lock, so a slow query
+        neither holds up the other reads nor the loop, while a change runs on the loop alone under the write lock.
+        The changed books are saved every save_interval seconds: the save is prepared under the write lock,
+        which only copies what has to be written, and written on a worker thread while requests go on.
+        :param self: Represent the instance of the class
+        :param routes: List[Route]: The endpoints
+        :param books: List[Tuple[Any, str]]: The books to save, with their save file names
+        :param save_interval: float: Seconds between two saves
+        :param read_workers: int: The threads answering reads, 0 answers them on the event loop one at a time
+            for books that cannot be read from another thread
+        """
+        self.routes = routes
+        self.books = books
+        self.save_interval = save_interval
+        self.lock = RWLock()
+        self.readers = ThreadPoolExecutor(read_workers, "server read") if read_workers else None
+        self.requests = 0
+
+    def _route(self, method: str, segments: List[str]) -> Tuple[Route, Dict[str, str]]:
+        allowed = False
+        for route in self.routes:
+            params = route.match(segments)
+            if params is not None:
+                if route.method == method:
+                    return route, params
+                allowed = True
+        if allowed:
+            raise HttpError(405, f"method {method} is not allowed here")
+        raise HttpError(404, "no such endpoint")
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        """
+        The dispatch function answers one request.
+        :param self: Represent the instance of the class
+        :param method: str: The HTTP method
+        :param target: str: The path with the query string
+        :param body: bytes: The request body, JSON or empty
+        :return: The HTTP status and the answer to send as JSON
+        """
+        try:
+            url = urlsplit(target)
+            path = url.path.strip("/")
+            segments = [unquote(segment) for segment in path.split("/")] if path else []
+            route, params = self._route(method, segments)
+            query = dict(parse_qsl(url.query))
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                raise HttpError(400, "the body is not valid JSON")
+            if route.writes or self.readers is None:
+                async with self.lock.writing() if route.writes else self.lock.reading():
+                    return route.status, self._call(route, params, query, data)
+            async with self.lock.reading():
+                return route.status, await asyncio.get_running_loop().run_in_executor(
+                    self.readers, self._call, route, params, query, data)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            log(f"server error on {method} {target}: {e}")
+            return 500, {"error": str(e)}
+
+    @staticmethod
+    def _call(route: Route, params: Dict[str, str], query: Dict[str, str], data) -> Any:
+        try:
+            return route.handler(params, query, data)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.split(" ")
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    self._respond(writer, 400, {"error": "malformed request"}, False)
+                    break
+                if length > MAX_BODY:
+                    self._respond(writer, 413, {"error": f"the body is over {MAX_BODY} bytes"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                self.requests += 1
+                status, answer = await self.dispatch(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                self._respond(writer, status, answer, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: int, answer: Any, keep_alive: bool):
+        data = json.dumps(answer, ensure_ascii=False).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+        )
+
+    async def save(self):
+        """
+        The save function writes the books changed since their last save.
+        A book that cannot be written from another thread (background_save is False) is saved on the event loop.
+        :param self: Represent the instance of the class
+        """
+        loop = asyncio.get_running_loop()
+        for book, file_name in self.books:
+            async with self.lock.writing():
+                if not book.needs_save(file_name):
+                    continue
+                if not book.background_save:
+                    book.save(file_name)
+                    continue
+                book.save_lock.acquire()
+                try:
+                    write = book.prepare_save(file_name, wait=False)
+                except Exception:
+                    book.save_lock.release()
+                    raise
+            try:
+                if write is not None:
+                    # None: another session is saving to the same files, the next round tries again
+                    await loop.run_in_executor(None, write)
+                    log(f"'{file_name}' saved by the server")
+            finally:
+                book.save_lock.release()
+
+    async def _persist(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            try:
+                await self.save()
+            except Exception as e:
+                log(f"server save failed: {e}")
+
+    async def serve(self, port: int, ready: Optional[Callable[[int], None]] = None):
+        """
+        The serve function answers requests on localhost until it is cancelled, then saves the books once more.
+        :param self: Represent the instance of the class
+        :param port: int: The TCP port, 0 picks a free one
+        :param ready: Optional[Callable[[int], None]]: Called with the port once the server listens
+        """
+        server = await asyncio.start_server(self._connection, SERVER_HOST, port)
+        persist = asyncio.create_task(self._persist())
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            persist.cancel()
+            await self.save()
+            if self.readers is not None:
+                self.readers.shutdown()
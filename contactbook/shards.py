@@ -0,0 +1,141 @@
+__author__ = "VadimTrubay"
+
+import os
+import pickle
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+from logs import log
+from storage import write_atomic
+
+SHARD_COUNT = 16
+# below this many bytes of shards starting worker processes costs more than it saves
+POOL_MIN_SIZE = 4 << 20
+
+
+def shard_of(firstname: str, lastname: str, count: int) -> int:
+    """
+    The shard_of function picks the shard file of a contact from a hash of its name.
+    The hash is CRC-32, which unlike hash() is the same in every process and every run.
+    :param firstname: str: The firstname of the contact
+    :param lastname: str: The lastname of the contact
+    :param count: int: The number of shards
+    :return: The index of the shard
+    """
+    return zlib.crc32(f"{firstname}\0{lastname}".encode()) % count
+
+
+def shard_path(file_name: str, index: int, generation: int = 0) -> str:
+    # generation 0 is the name of the shards of a save from before the manifest listed them
+    if not generation:
+        return f"{file_name}.{index:02d}.shard"
+    return f"{file_name}.{index:02d}.{generation}.shard"
+
+
+def read_manifest(file_name: str) -> Tuple[int, List[str]]:
+    """
+    The read_manifest function reads which shard files make up a sharded save from file_name.shards.
+    The manifest holds the generation of the last save followed by the file name of every shard, one per line.
+    A manifest holding only the number of shards is the older format, whose shards are named file_name.NN.shard.
+    :param file_name: str: The save file name without the extension
+    :return: The generation of the save and the paths of its shards in shard order
+    """
+    with open(f"{file_name}.shards", encoding="utf-8") as file:
+        lines = file.read().split("\n")
+    if len(lines) == 1:
+        return 0, [shard_path(file_name, index) for index in range(int(lines[0]))]
+    folder = os.path.dirname(file_name)
+    return int(lines[0]), [os.path.join(folder, name) for name in lines[1:]]
+
+
+def write_shards(file_name: str, count: int, parts: Sequence[Tuple[int, Sequence[int], Sequence[Mapping]]],
+                 fields: Sequence[str]):
+    """
+    The write_shards function saves the changed shards of a book as one atomic step.
+    The changed shards are written to new files named after the next generation, which no reader looks at yet,
+    and are published together by replacing the manifest in one rename.
+    A crash before the rename leaves the previous save whole, the files it replaced are deleted only after it.
+    :param file_name: str: The save file name without the extension
+    :param count: int: The number of shards
+    :param parts: Sequence[Tuple[int, Sequence[int], Sequence[Mapping]]]: The index, ids and records of every changed shard
+    :param fields: Sequence[str]: The fields of a record
+    """
+    try:
+        generation, paths = read_manifest(file_name)
+    except FileNotFoundError:
+        generation, paths = 0, []
+    generation += 1
+    if len(paths) == count:
+        current, stale = list(paths), []
+    else:
+        # a new save or another number of shards, parts holds every shard
+        current, stale = [None] * count, list(paths)
+    for index, rids, records in parts:
+        path = shard_path(file_name, index, generation)
+        write_shard(path, rids, records, fields)
+        if current[index] is not None:
+            stale.append(current[index])
+        current[index] = path
+    names = "\n".join([str(generation)] + [os.path.basename(path) for path in current])
+    write_atomic(f"{file_name}.shards", lambda file: file.write(names.encode()))
+    # files of this generation the manifest does not list were left by a save that crashed before its rename
+    stale += [shard_path(file_name, index, generation) for index in range(count)
+              if current[index] != shard_path(file_name, index, generation)]
+    for path in stale:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def write_shard(path: str, rids: Sequence[int], records: Sequence[Mapping], fields: Sequence[str]):
+    """
+    The write_shard function writes the contacts of one shard with their ids.
+    Records are stored as tuples of field values, which are smaller and quicker to read back than dictionaries,
+    and the ids keep the order of the book across shards.
+    :param path: str: The path of the shard file
+    :param rids: Sequence[int]: The ids of the records in ascending order
+    :param records: Sequence[Mapping]: The records in the same order
+    :param fields: Sequence[str]: The fields of a record
+    """
+    rows = [tuple(record[field] for field in fields) for record in records]
+    write_atomic(path, lambda file: pickle.dump((list(rids), rows), file, pickle.HIGHEST_PROTOCOL))
+
+
+def read_shard(path: str, fields: Sequence[str]) -> Tuple[List[int], List[Dict]]:
+    with open(path, "rb") as file:
+        rids, rows = pickle.load(file)
+    return rids, [dict(zip(fields, row)) for row in rows]
+
+
+def read_shards(paths: List[str], fields: Sequence[str]) -> Tuple[List[int], List[Dict]]:
+    """
+    The read_shards function reads the shards of a book and merges them back into the order of the book.
+    Big books are read by a pool of worker processes, one shard per task,
+    each turning its rows back into record dictionaries.
+    When the pool cannot be used the shards are read in this process instead.
+    :param paths: List[str]: The paths of the shard files
+    :param fields: Sequence[str]: The fields of a record
+    :return: The ids in ascending order and the records in the same order
+    """
+    parts = None
+    workers = min(len(paths), os.cpu_count() or 1)
+    if workers > 1 and sum(os.path.getsize(path) for path in paths) >= POOL_MIN_SIZE:
+        try:
+            with ProcessPoolExecutor(workers) as pool:
+                parts = list(pool.map(read_shard, paths, repeat(fields)))
+        except Exception as e:
+            # a worker that cannot start or import this module (spawn on Windows and macOS) must not stop the load,
+            # a shard that really cannot be read fails again below
+            log(f"reading shards in worker processes failed, reading them in this process: {e}")
+    if parts is None:
+        parts = [read_shard(path, fields) for path in paths]
+    rids = []
+    records = []
+    for part_rids, part_records in parts:
+        rids += part_rids
+        records += part_records
+    order = sorted(range(len(rids)), key=rids.__getitem__)
+    return [rids[i] for i in order], [records[i] for i in order]
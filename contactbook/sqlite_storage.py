@@ -0,0 +1,471 @@
+__author__ = "VadimTrubay"
+
+import sqlite3
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from indexes import PHONE_TAIL_LENGTH, BirthdayIndex, PhoneIndex, anniversary, calendar_ranges
+from paging import month_day
+from query import CASELESS_FIELDS, And, Condition, Not, Or
+
+FACET_SQL = {
+    "status": "status",
+    "domain": "CASE WHEN instr(email, '@') > 0 THEN lower(substr(email, instr(email, '@') + 1)) ELSE '' END",
+}
+
+
+class SqliteTable:
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        table: str,
+        fields: List[str],
+        key: Sequence[str],
+        indexes: Dict[str, Sequence[str]],
+    ):
+        """
+        The __init__ function creates the table and its indexes if the database does not have them yet.
+        Rows keep the order they were added in through the integer primary key.
+        :param self: Represent the instance of the class
+        :param connection: sqlite3.Connection: The open database
+        :param table: str: The name of the table
+        :param fields: List[str]: The record fields, one text column each
+        :param key: Sequence[str]: The fields a record is looked up by
+        :param indexes: Dict[str, Sequence[str]]: Index names with the columns they cover
+        """
+        self.connection = connection
+        self.table = table
+        self.fields = list(fields)
+        self.key = list(key)
+        self.columns = ", ".join(self.fields)
+        self.where_key = " AND ".join(f"{field} = ?" for field in self.key)
+        columns = ", ".join(
+            f"{column} TEXT NOT NULL DEFAULT ''" for column in self.fields)
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            f"(id INTEGER PRIMARY KEY, {columns}{self.extra_columns()})"
+        )
+        for name, index_columns in indexes.items():
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(index_columns)})"
+            )
+
+    def extra_columns(self) -> str:
+        return ""
+
+    def extra_values(self, record: Dict) -> Dict:
+        return {}
+
+    def _check_field(self, field: str):
+        if field not in self.fields:
+            raise KeyError(field)
+
+    def _record(self, row: Sequence) -> Dict:
+        return dict(zip(self.fields, row))
+
+    def count(self) -> int:
+        return self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def rows(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        The rows function streams all records in order, fetching them from the database in batches.
+        :param self: Represent the instance of the class
+        :param batch_size: int: How many rows to fetch at once
+        :return: An iterator of record dictionaries
+        """
+        cursor = self.connection.execute(
+            f"SELECT {self.columns} FROM {self.table} ORDER BY id")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield self._record(row)
+
+    def page(self, offset: int, limit: int) -> List[Dict]:
+        cursor = self.connection.execute(
+            f"SELECT {self.columns} FROM {self.table} ORDER BY id LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+        return [self._record(row) for row in cursor]
+
+    def _row_id(self, position: int) -> int:
+        row = self.connection.execute(
+            f"SELECT id FROM {self.table} ORDER BY id LIMIT 1 OFFSET ?", (
+                position,)
+        ).fetchone()
+        if row is None:
+            raise IndexError("list index out of range")
+        return row[0]
+
+    def find(self, *key: str) -> Optional[Dict]:
+        row = self.connection.execute(
+            f"SELECT {self.columns} FROM {self.table} WHERE {self.where_key} ORDER BY id LIMIT 1",
+            key,
+        ).fetchone()
+        return None if row is None else self._record(row)
+
+    def sorted_keys(self, prefix: str = "") -> Iterator[tuple]:
+        """
+        The sorted_keys function streams the key fields of all records in key order, read along the key index.
+        :param self: Represent the instance of the class
+        :param prefix: str: Keep only the records whose first key field starts with it
+        :return: An iterator of key tuples
+        """
+        keys = ", ".join(self.key)
+        cursor = self.connection.execute(
+            f"SELECT {keys} FROM {self.table} WHERE {self.key[0]} >= ? AND {self.key[0]} < ? "
+            f"ORDER BY {keys}, id",
+            (prefix, prefix + chr(0x10FFFF)),
+        )
+        for row in cursor:
+            yield tuple(row)
+
+    def query(self, node) -> Tuple[List[Dict], List[str]]:
+        """
+        The query function runs a parsed query as one SELECT and reports how SQLite plans it.
+        :param self: Represent the instance of the class
+        :param node: The parsed query
+        :return: The matching records in order and the lines of the SQLite query plan
+        """
+        where, parameters = query_sql(node)
+        statement = f"SELECT {self.columns} FROM {self.table} WHERE {where} ORDER BY id"
+        plan = [
+            row[3]
+            for row in self.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        ]
+        records = [self._record(row) for row in self.connection.execute(statement, parameters)]
+        return records, plan
+
+    def find_id(self, *key: str) -> Optional[int]:
+        row = self.connection.execute(
+            f"SELECT id FROM {self.table} WHERE {self.where_key} ORDER BY id LIMIT 1", key
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def get(self, row_id: int) -> Optional[Dict]:
+        row = self.connection.execute(
+            f"SELECT {self.columns} FROM {self.table} WHERE id = ?", (row_id,)
+        ).fetchone()
+        return None if row is None else self._record(row)
+
+    def id_rows(self, batch_size: int = 1000) -> Iterator[Tuple[int, Dict]]:
+        cursor = self.connection.execute(
+            f"SELECT id, {self.columns} FROM {self.table} ORDER BY id")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield row[0], self._record(row[1:])
+
+    def insert(self, record: Dict) -> int:
+        values = {field: record[field] for field in self.fields}
+        values.update(self.extra_values(values))
+        cursor = self.connection.execute(
+            f"INSERT INTO {self.table} ({', '.join(values)}) "
+            f"VALUES ({', '.join('?' * len(values))})",
+            list(values.values()),
+        )
+        return cursor.lastrowid
+
+    def replace(self, position: int, record: Dict):
+        self.replace_row(self._row_id(position), record)
+
+    def replace_row(self, row_id: int, record: Dict):
+        values = {field: record[field] for field in self.fields}
+        values.update(self.extra_values(values))
+        self.connection.execute(
+            f"UPDATE {self.table} SET {', '.join(f'{column} = ?' for column in values)} WHERE id = ?",
+            [*values.values(), row_id],
+        )
+
+    def delete_rows(self, row_ids: List[int]):
+        self.connection.executemany(
+            f"DELETE FROM {self.table} WHERE id = ?", [(row_id,) for row_id in row_ids])
+
+    def update(self, key: Sequence[str], parameter: str, new_value: str):
+        self._check_field(parameter)
+        record = self.find(*key)
+        if record is None:
+            return
+        record[parameter] = new_value
+        values = {parameter: new_value, **self.extra_values(record)}
+        self.connection.execute(
+            f"UPDATE {self.table} SET {', '.join(f'{column} = ?' for column in values)} "
+            f"WHERE id = (SELECT id FROM {self.table} WHERE {self.where_key} ORDER BY id LIMIT 1)",
+            [*values.values(), *key],
+        )
+
+    def delete(self, *key: str):
+        self.connection.execute(
+            f"DELETE FROM {self.table} "
+            f"WHERE id = (SELECT id FROM {self.table} WHERE {self.where_key} ORDER BY id LIMIT 1)",
+            key,
+        )
+
+    def clear(self):
+        self.connection.execute(f"DELETE FROM {self.table}")
+
+    def search(self, field: str, pattern: str) -> List[Dict]:
+        """
+        The search function finds the records whose field contains the pattern, case-sensitive like str.__contains__.
+        :param self: Represent the instance of the class
+        :param field: str: The field to search in
+        :param pattern: str: The substring to look for
+        :return: A list of record dictionaries in order
+        """
+        self._check_field(field)
+        cursor = self.connection.execute(
+            f"SELECT {self.columns} FROM {self.table} WHERE instr({field}, ?) > 0 ORDER BY id",
+            (pattern,),
+        )
+        return [self._record(row) for row in cursor]
+
+
+class SqliteContactTable(SqliteTable):
+    def __init__(self, connection: sqlite3.Connection, fields: List[str]):
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(contacts)")}
+        if columns and "phone_tail" not in columns:
+            # databases written before the phone index have no digits columns yet
+            connection.execute("ALTER TABLE contacts ADD COLUMN phone_digits TEXT NOT NULL DEFAULT ''")
+            connection.execute("ALTER TABLE contacts ADD COLUMN phone_tail TEXT NOT NULL DEFAULT ''")
+            connection.executemany(
+                "UPDATE contacts SET phone_digits = ?, phone_tail = ? WHERE id = ?",
+                [
+                    (*self._phone_values(phone), row_id)
+                    for row_id, phone in connection.execute("SELECT id, phone FROM contacts").fetchall()
+                ],
+            )
+        super().__init__(
+            connection,
+            "contacts",
+            fields,
+            ("firstname", "lastname"),
+            {
+                "contacts_name": ("firstname", "lastname"),
+                "contacts_birthday": ("birth_month_day",),
+                "contacts_status": ("status",),
+                "contacts_lastname": ("lastname", "firstname"),
+                "contacts_phone_tail": ("phone_tail",),
+            },
+        )
+        # databases written before the birthday order kept NULL for contacts without a birthday
+        self.connection.execute(
+            "UPDATE contacts SET birth_month_day = ? WHERE birth_month_day IS NULL", (
+                month_day(None),)
+        )
+
+    @staticmethod
+    def _phone_values(phone: str) -> Tuple[str, str]:
+        digits = PhoneIndex.normalize(phone)
+        return digits, digits[-PHONE_TAIL_LENGTH:]
+
+    def extra_columns(self) -> str:
+        return (
+            ", birth_month_day INTEGER, phone_digits TEXT NOT NULL DEFAULT '', "
+            "phone_tail TEXT NOT NULL DEFAULT ''"
+        )
+
+    def extra_values(self, record: Dict) -> Dict:
+        digits, tail = self._phone_values(record["phone"])
+        return {
+            "birth_month_day": month_day(BirthdayIndex.parse(record["birthday"])),
+            "phone_digits": digits,
+            "phone_tail": tail,
+        }
+
+    @staticmethod
+    def _facet_where(filters: Dict[str, str]) -> Tuple[str, list]:
+        if not filters:
+            return "1", []
+        return " AND ".join(f"{FACET_SQL[name]} = ?" for name in filters), list(filters.values())
+
+    def facet_counts(self, filters: Dict[str, str]) -> Dict[str, Dict[str, int]]:
+        """
+        The facet_counts function counts the contacts per status and per email domain with a GROUP BY each.
+        :param self: Represent the instance of the class
+        :param filters: Dict[str, str]: Count only the contacts with these facet values
+        :return: The counts by value of the facets "status" and "domain"
+        """
+        where, parameters = self._facet_where(filters)
+        return {
+            name: dict(self.connection.execute(
+                f"SELECT {expression}, COUNT(*) FROM contacts WHERE {where} GROUP BY 1", parameters))
+            for name, expression in FACET_SQL.items()
+        }
+
+    def facet_rows(self, filters: Dict[str, str]) -> List[Dict]:
+        where, parameters = self._facet_where(filters)
+        cursor = self.connection.execute(
+            f"SELECT {self.columns} FROM contacts WHERE {where} ORDER BY id", parameters)
+        return [self._record(row) for row in cursor]
+
+    def find_phone(self, digits: str) -> List[Dict]:
+        """
+        The find_phone function finds the contacts with a phone number by its digits, like PhoneIndex.find.
+        Seven digits or more are looked up in the index of the last digits,
+        a record matches if its digits end with the digits looked for or the other way round.
+        :param self: Represent the instance of the class
+        :param digits: str: The digits of the number or of a part of it
+        :return: A list of record dictionaries in order
+        """
+        if len(digits) < PHONE_TAIL_LENGTH:
+            cursor = self.connection.execute(
+                f"SELECT {self.columns} FROM contacts WHERE phone_digits != '' "
+                f"AND instr(phone_digits, ?) > 0 ORDER BY id",
+                (digits,),
+            )
+        else:
+            cursor = self.connection.execute(
+                f"SELECT {self.columns} FROM contacts WHERE phone_tail = ? "
+                f"AND (substr(phone_digits, -?) = ? OR substr(?, -length(phone_digits)) = phone_digits) "
+                f"ORDER BY id",
+                (digits[-PHONE_TAIL_LENGTH:], len(digits), digits, digits),
+            )
+        return [self._record(row) for row in cursor]
+
+    def birthdays_between(self, start: date, end: date) -> List[Tuple[date, Dict]]:
+        """
+        The birthdays_between function finds all birthdays between two dates, both inclusive,
+        with one range scan of the birthday index per calendar year.
+        :param self: Represent the instance of the class
+        :param start: date: The first day of the interval
+        :param end: date: The last day of the interval
+        :return: A list of (birthday date, record) tuples ordered by date
+        """
+        result = []
+        for year, first, last in calendar_ranges(start, end):
+            cursor = self.connection.execute(
+                f"SELECT {self.columns} FROM contacts WHERE birth_month_day BETWEEN ? AND ? "
+                f"ORDER BY birth_month_day, id",
+                (first[0] * 100 + first[1], last[0] * 100 + last[1]),
+            )
+            for row in cursor:
+                record = self._record(row)
+                birth_day = BirthdayIndex.parse(record["birthday"])
+                result.append((anniversary(birth_day, year), record))
+        return result
+
+
+class SqliteNoteTable(SqliteTable):
+    def __init__(self, connection: sqlite3.Connection, fields: List[str]):
+        super().__init__(
+            connection,
+            "notes",
+            fields,
+            ("title",),
+            {"notes_title": ("title",), "notes_tag": ("tag",)},
+        )
+
+
+def query_sql(node) -> Tuple[str, list]:
+    """
+    The query_sql function translates a parsed query into an SQL condition with the same meaning.
+    :param node: The parsed query
+    :return: The condition and its parameters
+    """
+    if isinstance(node, (And, Or)):
+        parts = [query_sql(child) for child in node.children]
+        joiner = " AND " if isinstance(node, And) else " OR "
+        return (
+            "(" + joiner.join(sql for sql, _ in parts) + ")",
+            [parameter for _, parameters in parts for parameter in parameters],
+        )
+    if isinstance(node, Not):
+        sql, parameters = query_sql(node.child)
+        return f"NOT {sql}", parameters
+    column, operator, value = node.field, node.operator, node.value
+    if column in CASELESS_FIELDS:
+        column = f"lower({column})"
+    if operator == "=":
+        return f"{column} = ?", [value]
+    if operator == "^=":
+        return f"({column} >= ? AND {column} < ?)", [value, value + chr(0x10FFFF)]
+    if operator == "$=":
+        return f"substr({column}, length({column}) - ? + 1) = ?", [len(value), value]
+    if operator == "~":
+        return f"instr({column}, ?) > 0", [value]
+    if operator == "in":
+        return (
+            "(" + " OR ".join("birth_month_day BETWEEN ? AND ?" for _ in node.days) + ")",
+            [
+                month * 100 + day
+                for first, last in node.days
+                for month, day in (first, last)
+            ],
+        )
+    if node.date is not None:
+        # dd.mm.YYYY compares as a date once rearranged into YYYYmmdd, invalid dates have no month day
+        return (
+            f"(birth_month_day < ? AND substr(birthday, 7, 4) || substr(birthday, 4, 2) "
+            f"|| substr(birthday, 1, 2) {operator} ?)",
+            [month_day(None), node.date.strftime("%Y%m%d")],
+        )
+    return f"{column} {operator} ?", [value]
+
+
+class SqliteOrder:
+    def __init__(self, table: SqliteTable, expressions: Sequence[str], prefix: Callable[[str], tuple]):
+        """
+        The __init__ function creates a page source that reads a table in the order of some columns.
+        Pages are found by keyset seeks: the rows right after or before the key of a known row,
+        which an index on the expressions turns into a range scan instead of skipping rows with OFFSET.
+        :param self: Represent the instance of the class
+        :param table: SqliteTable: The table to read
+        :param expressions: Sequence[str]: The columns or SQL expressions to order by, the row id breaks ties
+        :param prefix: Callable[[str], tuple]: Turns the text to seek into the leading part of a key
+        """
+        self.table = table
+        self.expressions = [*expressions, "id"]
+        self.prefix = prefix
+        self.select = (
+            f"SELECT {table.columns}, {', '.join(self.expressions)} FROM {table.table}"
+        )
+        self.order = ", ".join(self.expressions)
+        self.order_descending = ", ".join(
+            f"{expression} DESC" for expression in self.expressions)
+
+    def _condition(self, key: tuple, operator: str) -> str:
+        columns = ", ".join(self.expressions[: len(key)])
+        return f"({columns}) {operator} ({', '.join('?' * len(key))})"
+
+    def _entries(self, rows) -> List[Tuple[tuple, Dict]]:
+        width = len(self.table.fields)
+        return [(tuple(row[width:]), self.table._record(row[:width])) for row in rows]
+
+    def count(self) -> int:
+        return self.table.count()
+
+    def rank(self, key: tuple) -> int:
+        return self.table.connection.execute(
+            f"SELECT COUNT(*) FROM {self.table.table} WHERE {self._condition(key, '<')}", key
+        ).fetchone()[0]
+
+    def page_at(self, offset: int, limit: int) -> List[Tuple[tuple, Dict]]:
+        return self._entries(self.table.connection.execute(
+            f"{self.select} ORDER BY {self.order} LIMIT ? OFFSET ?", (limit, offset)))
+
+    def page_from(self, key: tuple, limit: int) -> List[Tuple[tuple, Dict]]:
+        return self._entries(self.table.connection.execute(
+            f"{self.select} WHERE {self._condition(key, '>=')} ORDER BY {self.order} LIMIT ?",
+            (*key, limit),
+        ))
+
+    def page_after(self, key: tuple, limit: int) -> List[Tuple[tuple, Dict]]:
+        return self._entries(self.table.connection.execute(
+            f"{self.select} WHERE {self._condition(key, '>')} ORDER BY {self.order} LIMIT ?",
+            (*key, limit),
+        ))
+
+    def page_before(self, key: tuple, limit: int) -> List[Tuple[tuple, Dict]]:
+        entries = self._entries(self.table.connection.execute(
+            f"{self.select} WHERE {self._condition(key, '<')} ORDER BY {self.order_descending} LIMIT ?",
+            (*key, limit),
+        ))
+        entries.reverse()
+        return entries
+
+
+def connect(file_name: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"{file_name}.db")
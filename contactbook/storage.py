@@ -0,0 +1,260 @@
+__author__ = "VadimTrubay"
+
+import mmap
+import os
+import pickle
+import struct
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+COMPACT_MIN_OPERATIONS = 1000
+PACKED_MAGIC = b"CBPACK1\0"
+
+
+def write_atomic(path: str, write: Callable[[BinaryIO], None]):
+    """
+    The write_atomic function writes a file through a temporary file moved over it once complete,
+    so a crash or a full disk leaves either the old file or the new one, never a half written file.
+    :param path: str: The path of the file
+    :param write: Callable[[BinaryIO], None]: Writes the content to the file opened for binary writing
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+class Journal:
+    def __init__(self, file_name: str):
+        """
+        The __init__ function sets up the append-only journal that sits next to a save file.
+        The journal starts with a header naming the snapshot it applies to, followed by pickled operations.
+        :param self: Represent the instance of the class
+        :param file_name: str: The save file name without the extension
+        """
+        self.file_name = file_name
+        self.snapshot = f"{file_name}.bin"
+        self.path = f"{file_name}.journal"
+        self.size = 0
+        self.active = False
+        # the snapshot this journal continues and where its last operation ends
+        self.header = None
+        self.offset = 0
+
+    def _header(self) -> Tuple[str, int, int]:
+        stat = os.stat(self.snapshot)
+        return "snapshot", stat.st_size, stat.st_mtime_ns
+
+    def replay(self) -> List[tuple]:
+        """
+        The replay function reads the operations recorded since the current snapshot was written.
+        A journal written for an older snapshot is ignored, and a record cut short by a crash is truncated away.
+        :param self: Represent the instance of the class
+        :return: A list of operations in the order they were made
+        """
+        operations = []
+        self.size = 0
+        self.active = False
+        self.header = self._header()
+        if not os.path.exists(self.path):
+            return operations
+        with open(self.path, "r+b") as file:
+            try:
+                header = pickle.load(file)
+            except Exception:
+                return operations
+            if header != self.header:
+                return operations
+            end = file.tell()
+            while True:
+                try:
+                    operations.append(pickle.load(file))
+                    end = file.tell()
+                except EOFError:
+                    break
+                except Exception:
+                    file.truncate(end)
+                    break
+        self.size = len(operations)
+        self.active = True
+        self.offset = end
+        return operations
+
+    def read_new(self) -> Optional[List[tuple]]:
+        """
+        The read_new function reads the operations another session appended since this journal was last read or written.
+        Call it with the save files locked, so no operation is half written.
+        :param self: Represent the instance of the class
+        :return: The new operations, or None if the snapshot was rewritten meanwhile,
+            so the journal does not continue the book in memory any more
+        """
+        if self.header is None or self._header() != self.header:
+            return None
+        operations = []
+        if not os.path.exists(self.path):
+            return operations
+        with open(self.path, "r+b") as file:
+            try:
+                header = pickle.load(file)
+            except Exception:
+                return operations
+            if header != self.header:
+                # left from an older snapshot, nobody has appended to it
+                return operations
+            if self.active:
+                file.seek(self.offset)
+            end = file.tell()
+            while True:
+                try:
+                    operations.append(pickle.load(file))
+                    end = file.tell()
+                except EOFError:
+                    break
+                except Exception:
+                    # cut short by a crashed session, appending after it would hide the new operations
+                    file.truncate(end)
+                    break
+            self.offset = end
+        self.size = (self.size if self.active else 0) + len(operations)
+        self.active = True
+        return operations
+
+    def append(self, operations: List[tuple]):
+        if not self.active:
+            self.reset()
+        with open(self.path, "ab") as file:
+            for operation in operations:
+                pickle.dump(operation, file)
+            file.flush()
+            os.fsync(file.fileno())
+            self.offset = file.tell()
+        self.size += len(operations)
+
+    def reset(self):
+        """
+        The reset function starts an empty journal for the current snapshot.
+        :param self: Represent the instance of the class
+        """
+        header = self._header()
+        write_atomic(self.path, lambda file: pickle.dump(header, file))
+        self.header = header
+        self.offset = len(pickle.dumps(header))
+        self.size = 0
+        self.active = True
+
+    def compact(self, data: Sequence, dump: Callable[[Sequence, BinaryIO], None] = pickle.dump):
+        """
+        The compact function folds the journal into a new snapshot of the whole book.
+        The snapshot is written to a temporary file first, so a crash never leaves a half written save file.
+        :param self: Represent the instance of the class
+        :param data: Sequence: All records of the book
+        :param dump: Callable[[Sequence, BinaryIO], None]: Writes the records in the save file format
+        """
+        write_atomic(self.snapshot, lambda file: dump(data, file))
+        self.reset()
+
+    def needs_compaction(self, book_size: int, pending: int = 0) -> bool:
+        """
+        The needs_compaction function tells if the journal has outgrown the book.
+        :param self: Represent the instance of the class
+        :param book_size: int: The number of records of the book
+        :param pending: int: The number of operations about to be appended
+        :return: True if the journal should be folded into a new snapshot
+        """
+        size = self.size if self.active else 0
+        return size + pending > max(COMPACT_MIN_OPERATIONS, book_size)
+
+
+def is_packed(path: str) -> bool:
+    with open(path, "rb") as file:
+        return file.read(len(PACKED_MAGIC)) == PACKED_MAGIC
+
+
+def write_packed(records: Sequence[Dict], file: BinaryIO, key: Tuple[str, ...]):
+    """
+    The write_packed function writes records in the packed save format.
+    The file starts with the magic bytes and the record count, followed by a table of record offsets,
+    a table of record numbers ordered by the key fields and the pickled records themselves.
+    :param records: Sequence[Dict]: The records to write, read one at a time
+    :param file: BinaryIO: The file opened for binary writing
+    :param key: Tuple[str, ...]: The fields the lookup table is ordered by
+    """
+    count = len(records)
+    header_size = len(PACKED_MAGIC) + 8 + 8 * (count + 1) + 8 * count
+    file.write(PACKED_MAGIC + struct.pack("<Q", count))
+    file.seek(header_size)
+    offsets = [header_size]
+    keys = []
+    for number, record in enumerate(records):
+        file.write(pickle.dumps(dict(record), pickle.HIGHEST_PROTOCOL))
+        offsets.append(file.tell())
+        keys.append((tuple(record[field] for field in key), number))
+    keys.sort()
+    file.seek(len(PACKED_MAGIC) + 8)
+    file.write(struct.pack(f"<{count + 1}Q", *offsets))
+    file.write(struct.pack(f"<{count}Q", *(number for _, number in keys)))
+    file.seek(offsets[-1])
+
+
+class PackedRecords:
+    def __init__(self, path: str, key: Tuple[str, ...]):
+        """
+        The __init__ function maps a packed save file into memory without reading it.
+        Records are unpickled only when they are accessed and are not kept afterwards,
+        so the memory used stays proportional to the records actually touched.
+        :param self: Represent the instance of the class
+        :param path: str: The path of the packed file
+        :param key: Tuple[str, ...]: The fields the lookup table of the file is ordered by
+        """
+        self.path = os.path.abspath(path)
+        self.key = key
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = struct.unpack_from("<Q", self.map, len(PACKED_MAGIC))[0]
+        self.offsets_start = len(PACKED_MAGIC) + 8
+        self.order_start = self.offsets_start + 8 * (self.count + 1)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _offset(self, number: int) -> int:
+        return struct.unpack_from("<Q", self.map, self.offsets_start + 8 * number)[0]
+
+    def __getitem__(self, number: int) -> Dict:
+        if number < 0:
+            number += self.count
+        if not 0 <= number < self.count:
+            raise IndexError("list index out of range")
+        return pickle.loads(self.map[self._offset(number): self._offset(number + 1)])
+
+    def __iter__(self) -> Iterator[Dict]:
+        for number in range(self.count):
+            yield self[number]
+
+    def find(self, *key: str) -> Optional[Dict]:
+        """
+        The find function looks a record up by its key fields with a binary search over the lookup table.
+        Only the records on the search path are unpickled.
+        :param self: Represent the instance of the class
+        :param key: str: The values of the key fields
+        :return: The first record with this key in file order, or None
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            number = struct.unpack_from("<Q", self.map, self.order_start + 8 * middle)[0]
+            record = self[number]
+            if tuple(record[field] for field in self.key) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            record = self[struct.unpack_from("<Q", self.map, self.order_start + 8 * low)[0]]
+            if tuple(record[field] for field in self.key) == key:
+                return record
+        return None
+
+    def close(self):
+        self.map.close()
+        self.file.close()
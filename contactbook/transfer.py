@@ -0,0 +1,341 @@
+__author__ = "VadimTrubay"
+
+import csv
+import json
+from itertools import islice
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from validation import CONTACT_VALIDATOR, NOTE_VALIDATOR, Validator
+
+BATCH_SIZE = 1000
+
+
+class ImportReport:
+    def __init__(self):
+        """
+        The __init__ function creates an empty report of an import.
+        :param self: Represent the instance of the class
+        """
+        self.imported = 0
+        self.rejected = []
+
+    def reject(self, row: int, reason: str):
+        self.rejected.append((row, reason))
+
+
+def batched(rows: Iterable, size: int) -> Iterator[List]:
+    """
+    The batched function splits a stream of rows into lists of at most size rows,
+    so only one batch is held in memory at a time.
+    :param rows: Iterable: The rows to split
+    :param size: int: The number of rows per batch
+    :return: An iterator of lists of rows
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            break
+        yield batch
+
+
+def normalize_contact(raw: Dict, fields: List[str]) -> Dict:
+    """
+    The normalize_contact function cleans the fields of an imported contact the way the add command does:
+    values are stripped and names are lowercased.
+    :param raw: Dict: The fields read from the file, missing ones are empty
+    :param fields: List[str]: The fields of a contact
+    :return: A contact dictionary with all fields
+    """
+    record = {field: (raw.get(field) or "").strip() for field in fields}
+    record["firstname"] = record["firstname"].lower()
+    record["lastname"] = record["lastname"].lower()
+    return record
+
+
+def normalize_note(raw: Dict, fields: List[str]) -> Dict:
+    return {field: (raw.get(field) or "").strip().lower() for field in fields}
+
+
+def read_csv(path: str) -> Iterator[Tuple[int, Dict]]:
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def write_csv(path: str, fields: List[str], records: Iterable[Dict]) -> int:
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        for record in records:
+            writer.writerow({field: record[field] for field in fields})
+            count += 1
+    return count
+
+
+def read_jsonl(path: str) -> Iterator[Tuple[int, Dict]]:
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                row = {"__error__": f"invalid json - {error}"}
+            if not isinstance(row, dict):
+                row = {"__error__": "a json object expected"}
+            yield number, row
+
+
+def write_jsonl(path: str, fields: List[str], records: Iterable[Dict]) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for record in records:
+            file.write(json.dumps({field: record[field] for field in fields}))
+            file.write("\n")
+            count += 1
+    return count
+
+
+def _vcard_escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(",", "\\,")
+        .replace(";", "\\;")
+        .replace("\n", "\\n")
+    )
+
+
+def _vcard_unescape(value: str) -> str:
+    result = []
+    chars = iter(value)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            result.append("\n" if char in "nN" else char)
+        else:
+            result.append(char)
+    return "".join(result)
+
+
+def _vcard_split(value: str, separator: str = ";") -> List[str]:
+    parts, current, escaped = [], [], False
+    for char in value:
+        if escaped:
+            current.append("\\" + char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == separator:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return [_vcard_unescape(part) for part in parts]
+
+
+def _vcard_birthday(value: str) -> str:
+    # BDAY comes as YYYY-MM-DD or YYYYMMDD, the contactbook keeps dd.mm.YYYY
+    digits = value.replace("-", "")[:8]
+    if len(digits) == 8 and digits.isdigit():
+        return f"{digits[6:8]}.{digits[4:6]}.{digits[0:4]}"
+    return value
+
+
+def read_vcard(path: str) -> Iterator[Tuple[int, Dict]]:
+    """
+    The read_vcard function streams the cards of a vCard file as contact dictionaries.
+    Folded lines are joined and property parameters such as TEL;TYPE=CELL are ignored.
+    :param path: str: The path of the .vcf file
+    :return: An iterator of (line number of BEGIN:VCARD, contact fields) tuples
+    """
+    card, start = None, 0
+
+    def lines():
+        with open(path, encoding="utf-8") as file:
+            previous, previous_number = None, 0
+            for number, line in enumerate(file, 1):
+                line = line.rstrip("\r\n")
+                if line[:1] in (" ", "\t") and previous is not None:
+                    previous += line[1:]
+                    continue
+                if previous is not None:
+                    yield previous_number, previous
+                previous, previous_number = line, number
+            if previous is not None:
+                yield previous_number, previous
+
+    for number, line in lines():
+        name, _, value = line.partition(":")
+        name = name.split(";")[0].upper()
+        if name == "BEGIN" and value.upper() == "VCARD":
+            card, start = {}, number
+        elif card is None:
+            continue
+        elif name == "END" and value.upper() == "VCARD":
+            yield start, card
+            card = None
+        elif name == "N":
+            parts = _vcard_split(value) + ["", ""]
+            card["lastname"], card["firstname"] = parts[0], parts[1]
+        elif name == "FN" and "firstname" not in card:
+            first, _, last = _vcard_unescape(value).partition(" ")
+            card["firstname"], card["lastname"] = first, last
+        elif name == "TEL" and "phone" not in card:
+            card["phone"] = _vcard_unescape(value)
+        elif name == "BDAY":
+            card["birthday"] = _vcard_birthday(value)
+        elif name == "ADR" and "address" not in card:
+            card["address"] = " ".join(
+                part for part in _vcard_split(value) if part)
+        elif name == "EMAIL" and "email" not in card:
+            card["email"] = _vcard_unescape(value)
+        elif name == "CATEGORIES":
+            card["status"] = _vcard_split(value, ",")[0]
+        elif name == "NOTE":
+            card["note"] = _vcard_unescape(value)
+
+
+def write_vcard(path: str, records: Iterable[Dict]) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        for record in records:
+            lines = [
+                "BEGIN:VCARD",
+                "VERSION:3.0",
+                f"N:{_vcard_escape(record['lastname'])};{_vcard_escape(record['firstname'])};;;",
+                f"FN:{_vcard_escape(record['firstname'] + ' ' + record['lastname'])}",
+            ]
+            if record["phone"]:
+                lines.append(f"TEL:{_vcard_escape(record['phone'])}")
+            if record["birthday"]:
+                day, month, year = (record["birthday"].split(".") + ["", ""])[:3]
+                lines.append(f"BDAY:{year}-{month}-{day}")
+            if record["address"]:
+                lines.append(f"ADR:;;{_vcard_escape(record['address'])};;;;")
+            if record["email"]:
+                lines.append(f"EMAIL:{_vcard_escape(record['email'])}")
+            if record["status"]:
+                lines.append(f"CATEGORIES:{_vcard_escape(record['status'])}")
+            if record["note"]:
+                lines.append(f"NOTE:{_vcard_escape(record['note'])}")
+            lines.append("END:VCARD")
+            file.write("\r\n".join(lines) + "\r\n")
+            count += 1
+    return count
+
+
+def _import(
+    rows: Iterable[Tuple[int, Dict]],
+    fields: List[str],
+    normalize: Callable[[Dict, List[str]], Dict],
+    validator: Validator,
+    exists: Callable[[Dict], bool],
+    add: Callable[[Dict], None],
+    batch_size: int,
+) -> ImportReport:
+    report = ImportReport()
+    for batch in batched(rows, batch_size):
+        numbers, records = [], []
+        for number, raw in batch:
+            if "__error__" in raw:
+                report.reject(number, raw["__error__"])
+            else:
+                numbers.append(number)
+                records.append(normalize(raw, fields))
+        errors = validator.validate_batch(records)
+        for position, (number, record) in enumerate(zip(numbers, records)):
+            if position in errors:
+                report.reject(number, ", ".join(errors[position]))
+            elif exists(record):
+                report.reject(number, "already exists")
+            else:
+                add(record)
+                report.imported += 1
+    report.rejected.sort()
+    return report
+
+
+def import_contacts(contactbook, path: str, batch_size: int = BATCH_SIZE) -> ImportReport:
+    """
+    The import_contacts function adds the contacts from a .csv or .vcf file to the contactbook.
+    The file is read in batches of batch_size rows, rows that break the field rules
+    or repeat an existing name are skipped and listed in the report.
+    :param contactbook: The Contactbook to fill
+    :param path: str: The path of the file, the format is taken from the extension
+    :param batch_size: int: The number of rows read at once
+    :return: An ImportReport with the number of imported contacts and the rejected rows
+    """
+    if path.lower().endswith(".vcf"):
+        rows = read_vcard(path)
+    else:
+        rows = read_csv(path)
+    return _import(
+        rows,
+        contactbook.fields,
+        normalize_contact,
+        CONTACT_VALIDATOR,
+        lambda record: contactbook.find_contact(
+            record["firstname"], record["lastname"]) is not None,
+        contactbook.add,
+        batch_size,
+    )
+
+
+def export_contacts(contactbook, path: str) -> int:
+    """
+    The export_contacts function writes all contacts to a .csv or .vcf file, one record at a time.
+    :param contactbook: The Contactbook to export
+    :param path: str: The path of the file, the format is taken from the extension
+    :return: The number of exported contacts
+    """
+    if path.lower().endswith(".vcf"):
+        return write_vcard(path, contactbook)
+    return write_csv(path, contactbook.fields, contactbook)
+
+
+def import_notes(notebook, path: str, batch_size: int = BATCH_SIZE) -> ImportReport:
+    """
+    The import_notes function adds the notes from a .csv or .jsonl file to the notebook.
+    The file is read in batches of batch_size rows, rows that break the field rules
+    or repeat an existing title are skipped and listed in the report.
+    :param notebook: The NoteBook to fill
+    :param path: str: The path of the file, the format is taken from the extension
+    :param batch_size: int: The number of rows read at once
+    :return: An ImportReport with the number of imported notes and the rejected rows
+    """
+    if path.lower().endswith(".jsonl"):
+        rows = read_jsonl(path)
+    else:
+        rows = read_csv(path)
+    titles = {note["title"] for note in notebook}
+
+    def add(record: Dict):
+        notebook.add(SimpleNamespace(**record))
+        titles.add(record["title"])
+
+    return _import(
+        rows,
+        notebook.fields,
+        normalize_note,
+        NOTE_VALIDATOR,
+        lambda record: record["title"] in titles,
+        add,
+        batch_size,
+    )
+
+
+def export_notes(notebook, path: str) -> int:
+    """
+    The export_notes function writes all notes to a .csv or .jsonl file, one record at a time.
+    :param notebook: The NoteBook to export
+    :param path: str: The path of the file, the format is taken from the extension
+    :return: The number of exported notes
+    """
+    if path.lower().endswith(".jsonl"):
+        return write_jsonl(path, notebook.fields, notebook)
+    return write_csv(path, notebook.fields, notebook)
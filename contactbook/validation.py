@@ -0,0 +1,158 @@
+__author__ = "VadimTrubay"
+
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Sequence
+
+from indexes import TAG_SEPARATOR
+
+NAME_PATTERN = r"^[a-zA-Z\d,. !_-]{1,20}$"
+PHONE_PATTERN = r"^[0-9-+() ]{8,17}$"
+BIRTHDAY_PATTERN = r"^(0[1-9]|[12][0-9]|3[01])[.](0[1-9]|1[012])[.](19|20)[0-9]{2}$"
+EMAIL_PATTERN = r"^(\w|\.|_|-)+@(\w|_|-|\.)+[.]\w{2,3}$"
+STATUS_TYPES = ["", "family", "friend", "work"]
+TITLE_PATTERN = r"^[a-zA-Z\d,. !_-]{1,50}$"
+NOTE_PATTERN = r"^[a-zA-Z()?\d,. \-_!]{1,250}$"
+# one tag, the field holds any number of them split the way parse_tags splits them
+TAG_PATTERN = r"^#?[a-zA-Z\d.!_-]{1,20}$"
+
+
+class FieldRule:
+    __slots__ = ("field", "pattern", "allow_empty", "choices", "separator")
+
+    def __init__(
+        self,
+        field: str,
+        pattern: Optional[str] = None,
+        allow_empty: bool = False,
+        choices: Optional[Sequence[str]] = None,
+        separator: Optional[Pattern] = None,
+    ):
+        """
+        The __init__ function creates the rule one field of a record has to follow.
+        The pattern is compiled once here instead of on every check.
+        :param self: Represent the instance of the class
+        :param field: str: The name of the field
+        :param pattern: Optional[str]: The regular expression of a correct value, None accepts any text
+        :param allow_empty: bool: Whether an empty value is correct
+        :param choices: Optional[Sequence[str]]: The only correct values, None accepts any
+        :param separator: Optional[Pattern]: Splits a value holding a list, every item of which has to match the pattern
+        """
+        self.field = field
+        self.pattern = None if pattern is None else re.compile(pattern)
+        self.allow_empty = allow_empty
+        self.choices = None if choices is None else frozenset(choices)
+        self.separator = separator
+
+    def check(self, value: str) -> bool:
+        if value == "" and self.allow_empty:
+            return True
+        if self.choices is not None and value not in self.choices:
+            return False
+        if self.separator is not None:
+            items = [item for item in self.separator.split(value) if item]
+            return bool(items) and (self.pattern is None or all(self.pattern.match(item) is not None for item in items))
+        return self.pattern is None or self.pattern.match(value) is not None
+
+    def error(self, value: str) -> str:
+        return f"incorrect {self.field} - '{value}'"
+
+
+class Validator:
+    def __init__(self, rules: Iterable[FieldRule]):
+        """
+        The __init__ function collects the rules of all fields of a record.
+        :param self: Represent the instance of the class
+        :param rules: Iterable[FieldRule]: One rule per checked field, in the order errors are reported
+        """
+        self.rules = {rule.field: rule for rule in rules}
+
+    def check(self, field: str, value: str) -> bool:
+        return self.rules[field].check(value)
+
+    def errors(self, record: Dict) -> List[str]:
+        """
+        The errors function checks one record against all rules.
+        :param self: Represent the instance of the class
+        :param record: Dict: The record fields
+        :return: A list of error messages, empty if the record is correct
+        """
+        return [
+            rule.error(record[field])
+            for field, rule in self.rules.items()
+            if not rule.check(record[field])
+        ]
+
+    def validate_column(self, field: str, values: Iterable[str]) -> List[int]:
+        """
+        The validate_column function checks all values of one field at once.
+        Each distinct value is matched only once, so columns with repeated values
+        such as statuses, birthdays or empty fields cost one dictionary lookup per row.
+        :param self: Represent the instance of the class
+        :param field: str: The field the values belong to
+        :param values: Iterable[str]: The values in row order
+        :return: The positions of the incorrect values
+        """
+        rule = self.rules[field]
+        seen = {}
+        invalid = []
+        for position, value in enumerate(values):
+            correct = seen.get(value)
+            if correct is None:
+                correct = seen[value] = rule.check(value)
+            if not correct:
+                invalid.append(position)
+        return invalid
+
+    def validate_batch(self, records: Sequence[Dict]) -> Dict[int, List[str]]:
+        """
+        The validate_batch function checks a batch of records column by column.
+        :param self: Represent the instance of the class
+        :param records: Sequence[Dict]: The records to check
+        :return: The error messages of every incorrect record by its position in the batch,
+            correct records are left out
+        """
+        report = {}
+        for field, rule in self.rules.items():
+            for position in self.validate_column(field, (record[field] for record in records)):
+                report.setdefault(position, []).append(
+                    rule.error(records[position][field]))
+        return report
+
+
+CONTACT_VALIDATOR = Validator(
+    [
+        FieldRule("firstname", NAME_PATTERN),
+        FieldRule("lastname", NAME_PATTERN),
+        FieldRule("phone", PHONE_PATTERN, allow_empty=True),
+        FieldRule("birthday", BIRTHDAY_PATTERN, allow_empty=True),
+        FieldRule("address", allow_empty=True),
+        FieldRule("email", EMAIL_PATTERN, allow_empty=True),
+        FieldRule("status", choices=STATUS_TYPES),
+        FieldRule("note", allow_empty=True),
+    ]
+)
+NOTE_VALIDATOR = Validator(
+    [
+        FieldRule("title", TITLE_PATTERN),
+        FieldRule("note", NOTE_PATTERN, allow_empty=True),
+        FieldRule("tag", TAG_PATTERN, allow_empty=True, separator=TAG_SEPARATOR),
+    ]
+)
+
+
+def validate_contact(record: Dict) -> List[str]:
+    """
+    The validate_contact function checks a contact with the same rules as the *Contactbook field classes.
+    :param record: Dict: The contact fields
+    :return: A list of error messages, empty if the contact is correct
+    """
+    return CONTACT_VALIDATOR.errors(record)
+
+
+def validate_note(record: Dict) -> List[str]:
+    """
+    The validate_note function checks a note with the same rules as the *Notebook field classes.
+    :param record: Dict: The note fields
+    :return: A list of error messages, empty if the note is correct
+    """
+    return NOTE_VALIDATOR.errors(record)
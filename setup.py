@@ -16,6 +16,7 @@ setup(
     license='MIT',
     include_package_data=True,
     packages=find_namespace_packages(),
+    python_requires='>=3.10',
     install_requires=['colorama', 'numexpr'],
     entry_points={'console_scripts': ['contactbook=contactbook.main:main']}
 )
\ No newline at end of file
@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+
+import pytest
+
+# the modules of the package import each other by their plain names
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "contactbook"))
+
+FIRSTNAMES = ["ann", "bob", "cid", "dan", "eve", "fay", "gus", "hal", "ivy", "jon"]
+LASTNAMES = ["lee", "ray", "smith", "stone", "brown", "green", "white", "black"]
+STATUSES = ["", "work", "family", "friend"]
+DOMAINS = ["corp.com", "Corp.com", "mail.org", "home.net"]
+WORDS = ["milk", "bread", "fresh", "call", "mom", "buy", "python", "work", "meeting", "the", "a", "of"]
+TAGS = ["work", "home", "python", "#urgent", "Later", "misc"]
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # save files and logs.txt are written to the current directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def make_contact():
+    def make(rng: random.Random, step: int = 0) -> dict:
+        firstname, lastname = rng.choice(FIRSTNAMES), rng.choice(LASTNAMES)
+        return {
+            "firstname": firstname,
+            "lastname": lastname,
+            "phone": rng.choice(["", "+38 (050) ", "050", "+380"]) + "".join(rng.choice("0123456789") for _ in range(7)),
+            "birthday": rng.choice(["", f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1950, 2010)}"]),
+            "address": f"{rng.choice(WORDS)} street {step}",
+            "email": rng.choice(["", f"{firstname}.{lastname}@{rng.choice(DOMAINS)}"]),
+            "status": rng.choice(STATUSES),
+            "note": " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 4))),
+        }
+
+    return make
+
+
+@pytest.fixture
+def make_note():
+    def make(rng: random.Random, step: int = 0) -> dict:
+        return {
+            "title": f"title {step} {rng.choice(WORDS)}",
+            "note": " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 12))),
+            "tag": ", ".join(rng.sample(TAGS, rng.randint(0, 3))),
+        }
+
+    return make
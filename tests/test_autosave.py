@@ -0,0 +1,50 @@
+import random
+import time
+
+from autosave import Autosaver
+from main import Contactbook, RecordContactbook
+
+
+def records(book):
+    return [dict(item) for item in book.data]
+
+
+def test_a_prepared_save_writes_the_book_as_it_was(make_contact):
+    rng = random.Random(0)
+    book = Contactbook()
+    for step in range(50):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    book.save("book")
+    with book.save_lock:
+        write = book.prepare_save("book")
+        before = records(book)
+        for item in book.data[:10]:
+            book.edit(item["firstname"], item["lastname"], "phone", "1234567")
+        book.add(RecordContactbook("ann", "new"))
+        write()
+    saved = Contactbook()
+    saved.load("book")
+    assert records(saved) == before
+
+
+def test_autosaver_writes_once_the_book_is_left_alone(make_contact):
+    rng = random.Random(1)
+    book = Contactbook()
+    book.save("book")
+    saver = Autosaver(book, "book", 0.05)
+    try:
+        for step in range(5):
+            with saver.lock:
+                book.add(RecordContactbook(**make_contact(rng, step)))
+            saver.touch()
+        deadline = time.monotonic() + 5
+        saved = Contactbook()
+        while time.monotonic() < deadline:
+            saved.load("book")
+            if len(saved.data) == 5:
+                break
+            time.sleep(0.02)
+        assert records(saved) == records(book)
+    finally:
+        saver.close()
+    assert saver.error is None
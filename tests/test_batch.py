@@ -0,0 +1,90 @@
+import pytest
+
+from main import BotBatch, Contactbook, NoteBook, RecordContactbook, RecordExistsError, RecordNotebook
+
+
+def run(*lines):
+    bot = BotBatch("book", "notes")
+    return bot, bot.run(lines)
+
+
+def test_batch_rename_refuses_a_taken_name(capsys):
+    bot, errors = run(
+        "contact add firstname=ann lastname=lee",
+        "contact add firstname=bob lastname=lee",
+        "contact edit bob lee firstname ann",
+        "contact edit bob lee firstname cid",
+    )
+    assert errors == 1
+    assert "contact 'ann lee' already exists" in capsys.readouterr().out
+    assert sorted(bot.contactbook.sorted_names()) == ["ann lee", "cid lee"]
+
+
+def test_batch_delete_is_saved_and_can_be_undone():
+    run(
+        "contact add firstname=ann lastname=lee",
+        "contact add firstname=bob lastname=ray",
+        "contact delete ann lee",
+        "note add title=todo note=milk",
+        "note add title=done note=bread",
+        "note delete todo",
+    )
+    book = Contactbook(journaled=True)
+    book.load("book")
+    assert list(book.sorted_names()) == ["bob ray"]
+    notes = NoteBook(journaled=True)
+    notes.load("notes")
+    assert [note["title"] for note in notes.data] == ["done"]
+    bot, errors = run("contact delete bob ray", "contact undo", "note delete missing", "note edit done title todo")
+    assert errors == 1
+    assert list(bot.contactbook.sorted_names()) == ["bob ray"]
+    assert [note["title"] for note in bot.notebook.data] == ["todo"]
+
+
+def test_rename_and_delete_of_the_books():
+    book = Contactbook()
+    book.add(RecordContactbook("ann", "lee"))
+    book.add(RecordContactbook("bob", "lee"))
+    with pytest.raises(RecordExistsError):
+        book.rename("bob", "lee", "ann", "lee")
+    assert book.rename("bob", "lee", "cid", "fox")["lastname"] == "fox"
+    assert book.rename("nobody", "here", "x", "y") is None
+    assert book.delete_contact("cid", "fox")["firstname"] == "cid"
+    assert book.delete_contact("cid", "fox") is None
+    notes = NoteBook()
+    notes.add(RecordNotebook("a", "x", ""))
+    notes.add(RecordNotebook("b", "y", ""))
+    with pytest.raises(RecordExistsError):
+        notes.rename("b", "a")
+    assert notes.rename("b", "c") == {"title": "c", "note": "y", "tag": ""}
+    assert notes.delete_note("c") == {"title": "c", "note": "y", "tag": ""}
+    assert notes.delete_note("c") is None
+
+
+def test_rename_of_a_note_to_its_own_title_changes_nothing():
+    book = NoteBook()
+    book.add(RecordNotebook("todo", "milk", ""))
+    assert book.rename("todo", "todo")["note"] == "milk"
+    assert len(book.history.undo_steps) == 1
+
+
+def test_rename_is_one_undo_step_and_one_journal_operation():
+    book = Contactbook(journaled=True)
+    book.add(RecordContactbook("ann", "lee", phone="1"))
+    book.add(RecordContactbook("ann", "lee", phone="2"))
+    book.save("book")
+    book.rename("ann", "lee", "bob", "ray")
+    assert len(book._operations) == 1
+    book.save("book")
+    loaded = Contactbook(journaled=True)
+    loaded.load("book")
+    assert [(item["firstname"], item["phone"]) for item in loaded.data] == [("bob", "1"), ("ann", "2")]
+    assert book.undo() == "rename 'ann lee'"
+    assert [item["firstname"] for item in book.data] == ["ann", "ann"]
+    assert book.undo() == "add 'ann lee'"
+    notes = NoteBook(journaled=True)
+    notes.add(RecordNotebook("a", "x", ""))
+    notes.rename("a", "b")
+    assert len(notes._operations) == 2
+    notes.undo()
+    assert notes.data == [{"title": "a", "note": "x", "tag": ""}]
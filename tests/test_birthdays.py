@@ -0,0 +1,64 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from main import Contactbook, RecordContactbook
+
+
+def next_birthday(birthday, today):
+    try:
+        birth_day = datetime.strptime(birthday, "%d.%m.%Y").date()
+    except ValueError:
+        return None
+    for year in (today.year, today.year + 1):
+        try:
+            day = birth_day.replace(year=year)
+        except ValueError:
+            day = date(year, 2, 28)
+        if day >= today:
+            return day
+
+
+def scan(book, days):
+    today = date.today()
+    found = []
+    for item in book.data:
+        birthday = next_birthday(item["birthday"], today)
+        if birthday is not None and birthday <= today + timedelta(days=days):
+            found.append((birthday, id(item)))
+    return sorted(found)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_upcoming_birthdays_agree_with_a_scan(make_contact, monkeypatch, seed):
+    monkeypatch.setattr("builtins.input", lambda prompt="": "y")
+    rng = random.Random(seed)
+    book = Contactbook()
+    for step in range(150):
+        action = rng.choice(["add", "add", "edit", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordContactbook(**make_contact(rng, step)))
+        elif action == "edit":
+            item = rng.choice(book.data)
+            book.edit(item["firstname"], item["lastname"], "birthday", make_contact(rng, step)["birthday"])
+        else:
+            item = rng.choice(book.data)
+            book.delete(item["firstname"], item["lastname"])
+    for days in (0, 7, 60, 300):
+        assert sorted((birthday, id(item)) for birthday, item in book.upcoming_birthdays(days)) == scan(book, days)
+    today = date.today()
+    for item in book.data:
+        if book.find_contact(item["firstname"], item["lastname"]) is item:
+            birthday = next_birthday(item["birthday"], today)
+            expected = 0 if birthday is None else (birthday - today).days
+            assert book.days_to_birthday(item["firstname"], item["lastname"]) == expected
+
+
+def test_birthdays_of_a_leap_day_fall_on_february_28():
+    book = Contactbook()
+    book.add(RecordContactbook("ann", "lee", birthday="29.02.2000"))
+    found = book.birthdays.between(date(2023, 2, 27), date(2023, 3, 1))
+    assert [birthday for birthday, _ in found] == [date(2023, 2, 28)]
+    found = book.birthdays.between(date(2024, 2, 27), date(2024, 3, 1))
+    assert [birthday for birthday, _ in found] == [date(2024, 2, 29)]
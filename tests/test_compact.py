@@ -0,0 +1,28 @@
+import random
+
+from main import Contactbook, RecordContactbook
+
+
+def test_compact_book_reads_like_a_dictionary_book(make_contact, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda prompt="": "y")
+    rng = random.Random(0)
+    books = [Contactbook(), Contactbook(compact=True)]
+    for step in range(100):
+        contact = make_contact(rng, step)
+        action = rng.choice(["add", "add", "edit", "delete"])
+        item = rng.choice(books[0].data) if books[0].data else None
+        for book in books:
+            if action == "add" or item is None:
+                book.add(RecordContactbook(**contact))
+            elif action == "edit":
+                book.edit(item["firstname"], item["lastname"], "note", contact["note"])
+            else:
+                book.delete(item["firstname"], item["lastname"])
+    plain, compact = books
+    assert all(isinstance(item, RecordContactbook) for item in compact.data)
+    assert [dict(item) for item in compact.data] == plain.data
+    assert [dict(item) for item in compact.find_info("note", "milk")] == plain.find_info("note", "milk")
+    compact.save("book")
+    loaded = Contactbook(compact=True)
+    loaded.load("book")
+    assert [dict(item) for item in loaded.data] == plain.data
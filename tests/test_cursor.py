@@ -0,0 +1,102 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from main import Contactbook, NoteBook, RecordContactbook, RecordNotebook
+
+
+def birthday_key(item):
+    try:
+        birth_day = datetime.strptime(item["birthday"], "%d.%m.%Y").date()
+    except ValueError:
+        return 1300
+    return birth_day.month * 100 + birth_day.day
+
+
+def expected(book, order):
+    records = list(enumerate(book.data))
+    if order == "lastname":
+        records.sort(key=lambda pair: (pair[1]["lastname"], pair[1]["firstname"], pair[0]))
+    elif order == "birthday":
+        records.sort(key=lambda pair: (birthday_key(pair[1]), pair[0]))
+    return [dict(item) for _, item in records]
+
+
+def walk(cursor):
+    records = [dict(item) for item in cursor.records]
+    while cursor.next():
+        records += [dict(item) for item in cursor.records]
+    return records
+
+
+def changed_book(make_contact, seed, **options):
+    rng = random.Random(seed)
+    book = Contactbook(**options)
+    for step in range(120):
+        action = rng.choice(["add", "add", "add", "edit", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordContactbook(**make_contact(rng, step)))
+        elif action == "edit":
+            item = rng.choice(book.data)
+            parameter = rng.choice(["lastname", "birthday"])
+            book.edit(item["firstname"], item["lastname"], parameter, make_contact(rng, step)[parameter])
+        else:
+            book._remove_record(rng.choice(book.data))
+    return book
+
+
+@pytest.mark.parametrize("order", ["added", "lastname", "birthday"])
+@pytest.mark.parametrize("seed", range(2))
+def test_pages_follow_the_order_as_the_book_changes(make_contact, order, seed):
+    book = changed_book(make_contact, seed)
+    assert walk(book.cursor(order, page_size=7)) == expected(book, order)
+    cursor = book.cursor(order, page_size=7)
+    assert cursor.page(cursor.pages)
+    back = [dict(item) for item in cursor.records]
+    while cursor.previous():
+        back = [dict(item) for item in cursor.records] + back
+    assert back == expected(book, order)
+
+
+def test_seek_jumps_to_the_first_key_at_or_after_the_text(make_contact):
+    book = changed_book(make_contact, 3)
+    cursor = book.cursor("lastname", page_size=5)
+    assert cursor.seek("s")
+    lastnames = [item["lastname"] for item in expected(book, "lastname")]
+    start = next(position for position, lastname in enumerate(lastnames) if lastname >= "s")
+    assert [item["lastname"] for item in cursor.records] == lastnames[start: start + 5]
+    cursor = book.cursor("birthday", page_size=5)
+    assert cursor.seek("01.07")
+    assert all(birthday_key(item) >= 701 for item in cursor.records)
+
+
+@pytest.mark.parametrize("order", ["lastname", "birthday"])
+def test_packed_book_pages_without_being_decoded(make_contact, order):
+    book = changed_book(make_contact, 4, packed=True)
+    book.save("book")
+    loaded = Contactbook(packed=True)
+    loaded.load("book")
+    assert walk(loaded.cursor(order, page_size=9)) == expected(book, order)
+    assert loaded._lazy
+
+
+def test_notes_are_paged_by_title_as_the_notebook_changes(make_note):
+    rng = random.Random(5)
+    book = NoteBook()
+    for step in range(80):
+        action = rng.choice(["add", "add", "rename", "delete", "undo"])
+        if action == "add" or not book.data:
+            book.add(RecordNotebook(**{**make_note(rng, step), "title": rng.choice(["a", "b", "c"]) + str(step % 9)}))
+        elif action == "rename":
+            book.edit_note(rng.choice(book.data)["title"], "title", f"r{step}")
+        elif action == "delete":
+            book._remove_note(rng.choice(book.data)["title"])
+        else:
+            book.undo()
+    notes = walk(book.cursor("title", page_size=6))
+    assert [note["title"] for note in notes] == sorted(note["title"] for note in book.data)
+    assert sorted(map(repr, notes)) == sorted(map(repr, book.data))
+    cursor = book.cursor("title", page_size=6)
+    assert cursor.seek("b")
+    assert cursor.records[0]["title"] == min(note["title"] for note in book.data if note["title"] >= "b")
@@ -0,0 +1,46 @@
+import pytest
+
+from main import Contactbook, RecordContactbook, SqliteContactbook
+
+
+def contact(firstname, lastname, phone="", birthday="", email="", note=""):
+    return RecordContactbook(firstname, lastname, phone, birthday, "", email, "", note)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def book(request):
+    if request.param == "memory":
+        book = Contactbook()
+    else:
+        book = SqliteContactbook()
+        book.load("book")
+    book.add(contact("ann", "lee", phone="+38 (050) 123-45-67", note="first"))
+    book.add(contact("bob", "ray", phone="0671112233"))
+    book.add(contact("anne", "lee", phone="0501234567", email="ann@corp.com", note="second"))
+    book.add(contact("cid", "stone", email="Cid@Mail.org"))
+    book.add(contact("sid", "stone", email="cid@mail.org", birthday="01.02.1990"))
+    yield book
+    if request.param == "sqlite":
+        book.connection.close()
+
+
+def names(records):
+    return [(item["firstname"], item["lastname"]) for item in records]
+
+
+def test_duplicates_are_found_by_phone_and_email(book):
+    clusters = book.find_duplicates().clusters
+    assert sorted(names(book.duplicate_records(cluster)) for cluster in clusters) == [
+        [("ann", "lee"), ("anne", "lee")],
+        [("cid", "stone"), ("sid", "stone")],
+    ]
+
+
+def test_merge_keeps_the_first_contact_and_fills_its_empty_fields(book):
+    assert book.merge_duplicates(book.find_duplicates().clusters) == 2
+    records = [dict(item) for item in book]
+    assert names(records) == [("ann", "lee"), ("bob", "ray"), ("cid", "stone")]
+    assert records[0]["email"] == "ann@corp.com"
+    assert records[0]["note"] == "first; second"
+    assert records[2]["birthday"] == "01.02.1990"
+    assert book.find_duplicates().clusters == []
@@ -0,0 +1,78 @@
+import random
+
+from main import Contactbook, NoteBook, RecordContactbook, RecordNotebook
+
+
+def filled(book, make_contact, count=50, seed=0):
+    rng = random.Random(seed)
+    for step in range(count):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    return book
+
+
+def test_unchanged_book_is_not_saved_again(make_contact, workdir):
+    book = filled(Contactbook(), make_contact)
+    book.save("book")
+    written = (workdir / "book.bin").stat().st_mtime_ns
+    assert not book.needs_save("book")
+    book.save("book")
+    assert (workdir / "book.bin").stat().st_mtime_ns == written
+    assert book.needs_save("copy")
+    book.add(RecordContactbook("ann", "new"))
+    assert book.needs_save("book")
+
+
+def test_unchanged_packed_book_is_saved_as_it_is(make_contact, workdir):
+    book = filled(Contactbook(packed=True), make_contact)
+    book.save("book")
+    loaded = Contactbook(packed=True)
+    loaded.load("book")
+    loaded.save("copy")
+    assert (workdir / "copy.bin").read_bytes() == (workdir / "book.bin").read_bytes()
+
+
+def test_changes_leave_out_records_changed_back(make_contact):
+    book = filled(Contactbook(), make_contact, count=10)
+    book.save("book")
+    first, second = book.data[0], book.data[1]
+    phone = first["phone"]
+    book.edit(first["firstname"], first["lastname"], "phone", "1234567")
+    book.edit(first["firstname"], first["lastname"], "phone", phone)
+    book.edit(second["firstname"], second["lastname"], "status", "changed")
+    book.add(RecordContactbook("ann", "new"))
+    book._remove_record(book.data[-1])
+    changes = book.changes()
+    assert len(changes) == 1
+    before, after = changes[0]
+    assert before["status"] != "changed" and after["status"] == "changed"
+    book.clear_contactbook()
+    assert book.changes() is None
+
+
+def test_notebook_changes_are_counted(make_note):
+    rng = random.Random(0)
+    book = NoteBook()
+    for step in range(5):
+        book.add(RecordNotebook(**make_note(rng, step)))
+    book.save("notes")
+    assert not book.needs_save("notes")
+    book.edit_note(book.data[0]["title"], "note", "changed")
+    assert book.needs_save("notes")
+    assert [after["note"] for _, after in book.changes()] == ["changed"]
+
+
+def test_notebook_changes_tell_apart_notes_with_the_same_title():
+    book = NoteBook()
+    book.add(RecordNotebook("todo", "milk", ""))
+    book.add(RecordNotebook("todo", "bread", ""))
+    book.save("notes")
+    book._replace_at(1, {"title": "todo", "note": "fresh bread", "tag": ""})
+    book._remove_note("todo")
+    assert book.changes() == [
+        ({"title": "todo", "note": "milk", "tag": ""}, None),
+        ({"title": "todo", "note": "bread", "tag": ""}, {"title": "todo", "note": "fresh bread", "tag": ""}),
+    ]
+    book.undo()
+    assert book.changes() == [
+        ({"title": "todo", "note": "bread", "tag": ""}, {"title": "todo", "note": "fresh bread", "tag": ""}),
+    ]
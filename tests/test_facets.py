@@ -0,0 +1,53 @@
+import random
+from collections import Counter
+
+import pytest
+
+from main import Contactbook, RecordContactbook, SqliteContactbook
+
+
+def domain_of(item):
+    return item["email"].rpartition("@")[2].lower() if "@" in item["email"] else ""
+
+
+def scan(records, status=None, domain=None):
+    within = [
+        item
+        for item in records
+        if (status is None or item["status"] == status) and (domain is None or domain_of(item) == domain)
+    ]
+    return within, {
+        "status": dict(Counter(item["status"] for item in within)),
+        "domain": dict(Counter(domain_of(item) for item in within)),
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def book(request, make_contact):
+    if request.param == "memory":
+        book = Contactbook()
+    else:
+        book = SqliteContactbook()
+        book.load("book")
+    rng = random.Random(0)
+    for step in range(200):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    for item in list(book)[:40]:
+        book.edit(item["firstname"], item["lastname"], "status", rng.choice(["", "work", "family"]))
+    yield book
+    if request.param == "sqlite":
+        book.connection.close()
+
+
+@pytest.mark.parametrize("status, domain", [(None, None), ("work", None), ("", None), (None, "corp.com"),
+                                            ("work", "corp.com"), ("missing", None)])
+def test_statistics_agree_with_a_scan(book, status, domain):
+    within, counts = scan(list(book), status, domain)
+    assert book.statistics(status=status, domain=domain) == counts
+    if status is not None or domain is not None:
+        assert [dict(item) for item in book.facet_contacts(status, domain)] == [dict(item) for item in within]
+
+
+def test_facet_contacts_needs_a_facet(book):
+    with pytest.raises(ValueError):
+        book.facet_contacts()
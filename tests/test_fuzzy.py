@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from main import Contactbook, RecordContactbook, SqliteContactbook
+
+
+def distance(first, second):
+    # optimal string alignment: a swap of two neighbouring characters is one edit
+    table = [[i + j if not i or not j else 0 for j in range(len(second) + 1)] for i in range(len(first) + 1)]
+    for i in range(1, len(first) + 1):
+        for j in range(1, len(second) + 1):
+            table[i][j] = min(
+                table[i - 1][j] + 1, table[i][j - 1] + 1, table[i - 1][j - 1] + (first[i - 1] != second[j - 1])
+            )
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                table[i][j] = min(table[i][j], table[i - 2][j - 2] + 1)
+    return table[-1][-1]
+
+
+def scan(records, text):
+    words = text.lower().split()
+    result = []
+    for position, item in enumerate(records):
+        if len(words) == 1:
+            found = min(distance(words[0], item["firstname"]), distance(words[0], item["lastname"]))
+            if found <= 2:
+                result.append((found, position))
+        else:
+            # up to two typos in each name
+            first, last = distance(words[0], item["firstname"]), distance(words[1], item["lastname"])
+            if first <= 2 and last <= 2:
+                result.append((first + last, position))
+    return sorted(result)
+
+
+def random_book(make_contact, seed, steps=150):
+    rng = random.Random(seed)
+    book = Contactbook()
+    for step in range(steps):
+        action = rng.choice(["add", "add", "add", "edit", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordContactbook(**make_contact(rng, step)))
+        elif action == "edit":
+            item = rng.choice(book.data)
+            parameter = rng.choice(["firstname", "lastname"])
+            book.edit(item["firstname"], item["lastname"], parameter, make_contact(rng, step)[parameter])
+        else:
+            book._remove_record(rng.choice(book.data))
+    return book
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_fuzzy_find_agrees_with_a_scan(make_contact, seed):
+    book = random_book(make_contact, seed)
+    for text in ("jhon", "smiht", "an le", "bbo ray", "Ann", "xyzxyz"):
+        found = [(distance, book.data.index(item)) for distance, item in book.fuzzy_find(text, limit=len(book.data) + 1)]
+        assert found == scan(book.data, text)
+
+
+def test_fuzzy_find_of_a_database_matches_the_memory_book(make_contact):
+    book = random_book(make_contact, 0)
+    database = SqliteContactbook()
+    database.load("book")
+    for item in book.data:
+        database.add(RecordContactbook(**item))
+    for text in ("jhon", "smiht", "an le"):
+        assert [distance for distance, _ in database.fuzzy_find(text, limit=5)] == [
+            distance for distance, _ in book.fuzzy_find(text, limit=5)
+        ]
+    database.connection.close()
@@ -0,0 +1,126 @@
+import random
+
+from main import Contactbook, NoteBook, RecordContactbook, RecordNotebook
+
+
+def records(book):
+    return [dict(item) for item in book.data]
+
+
+def rebuilt(book):
+    fresh = Contactbook()
+    for item in book.data:
+        fresh.add(RecordContactbook(**item))
+    return fresh
+
+
+def assert_indexes_of_a_rebuilt_book(book):
+    """
+    Compares the lookups of a book changed by undo and redo with those of a book built from its records.
+    """
+    fresh = rebuilt(book)
+    for item in book.data:
+        assert dict(book.find_contact(item["firstname"], item["lastname"])) == dict(
+            fresh.find_contact(item["firstname"], item["lastname"])
+        )
+    for parameter, pattern in [("firstname", "an"), ("lastname", "smi"), ("address", "street 1"), ("note", "milk")]:
+        assert list(map(dict, book.find_info(parameter, pattern))) == list(map(dict, fresh.find_info(parameter, pattern)))
+    for item in book.data[:10]:
+        assert list(map(dict, book.find_phone(item["phone"]))) == list(map(dict, fresh.find_phone(item["phone"])))
+    for days in (7, 300):
+        assert [(day, dict(item)) for day, item in book.upcoming_birthdays(days)] == [
+            (day, dict(item)) for day, item in fresh.upcoming_birthdays(days)
+        ]
+    assert book.statistics() == fresh.statistics()
+    assert list(book.sorted_names()) == list(fresh.sorted_names())
+    for text in ("jhon", "an le"):
+        assert [distance for distance, _ in book.fuzzy_find(text)] == [distance for distance, _ in fresh.fuzzy_find(text)]
+    assert list(map(dict, book.query("status = work OR email $= @corp.com").records)) == list(
+        map(dict, fresh.query("status = work OR email $= @corp.com").records)
+    )
+
+
+def change(book, rng, make_contact, step):
+    action = rng.choice(["add", "add", "edit", "replace", "delete", "clear", "merge"])
+    if action == "add" or not book.data:
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    elif action == "edit":
+        item = rng.choice(book.data)
+        book.edit(item["firstname"], item["lastname"], rng.choice(["firstname", "phone", "birthday"]), str(step))
+    elif action == "replace":
+        book[rng.randrange(len(book.data))] = RecordContactbook(**make_contact(rng, step))
+    elif action == "delete":
+        book._remove_record(rng.choice(book.data))
+    elif action == "clear" and rng.random() < 0.3:
+        book.clear_contactbook()
+    else:
+        book.merge_duplicates(book.find_duplicates().clusters)
+
+
+def test_undo_and_redo_are_inverses(make_contact):
+    rng = random.Random(7)
+    book = Contactbook()
+    states = [records(book)]
+    for step in range(60):
+        change(book, rng, make_contact, step)
+        states.append(records(book))
+    for state in reversed(states[:-1]):
+        assert book.undo() is not None
+        assert records(book) == state
+    assert book.undo() is None
+    assert_indexes_of_a_rebuilt_book(book)
+    for state in states[1:]:
+        assert book.redo() is not None
+        assert records(book) == state
+    assert book.redo() is None
+    assert_indexes_of_a_rebuilt_book(book)
+
+
+def test_a_new_change_drops_the_redo_steps(make_contact):
+    rng = random.Random(1)
+    book = Contactbook()
+    for step in range(3):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    book.undo()
+    book.add(RecordContactbook("ann", "new"))
+    assert book.redo() is None
+    assert len(book.data) == 3
+
+
+def test_undo_of_a_clear_gives_back_the_indexed_book(make_contact):
+    rng = random.Random(2)
+    book = Contactbook()
+    for step in range(40):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    before = records(book)
+    book.clear_contactbook()
+    assert book.data == []
+    assert book.undo() == "clear contactbook"
+    assert records(book) == before
+    assert_indexes_of_a_rebuilt_book(book)
+
+
+def test_notebook_undo_and_redo_are_inverses(make_note):
+    rng = random.Random(5)
+    book = NoteBook()
+    states = [list(map(dict, book.data))]
+    for step in range(40):
+        action = rng.choice(["add", "add", "edit", "delete", "clear"])
+        if action == "add" or not book.data:
+            book.add(RecordNotebook(**make_note(rng, step)))
+        elif action == "edit":
+            note = rng.choice(book.data)
+            book.edit_note(note["title"], rng.choice(["note", "tag"]), make_note(rng, step)["tag"])
+        elif action == "delete":
+            book._remove_note(rng.choice(book.data)["title"])
+        else:
+            book.clear_notebook()
+        states.append(list(map(dict, book.data)))
+    for state in reversed(states[:-1]):
+        book.undo()
+        assert book.data == state
+    assert list(book.sorted_titles()) == sorted(note["title"] for note in book.data)
+    for state in states[1:]:
+        book.redo()
+        assert book.data == state
+    assert list(book.sorted_titles()) == sorted(note["title"] for note in book.data)
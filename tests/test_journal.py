@@ -0,0 +1,173 @@
+import random
+
+import pytest
+
+import main
+import storage
+from main import Contactbook, NoteBook, RecordContactbook, RecordNotebook
+
+
+def records(book):
+    return [dict(item) for item in book.data]
+
+
+def reload(file_name, **options):
+    book = Contactbook(journaled=True, **options)
+    book.load(file_name)
+    return book
+
+
+def change(book, rng, make_contact, step):
+    # every contact gets its own name, contacts sharing a name are covered on their own
+    contact = {**make_contact(rng, step), "firstname": f"n{step}"}
+    action = rng.choice(["add", "add", "edit", "replace", "delete"])
+    if action == "add" or not book.data:
+        book.add(RecordContactbook(**contact))
+    elif action == "edit":
+        item = rng.choice(book.data)
+        parameter = rng.choice(["note", "phone", "firstname"])
+        book.edit(item["firstname"], item["lastname"], parameter, contact[parameter])
+    elif action == "replace":
+        book[rng.randrange(len(book.data))] = RecordContactbook(**contact)
+    else:
+        book._remove_record(rng.choice(book.data))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_journal_replays_to_the_saved_book(seed, make_contact):
+    rng = random.Random(seed)
+    book = Contactbook(journaled=True)
+    book.save("book")
+    for step in range(200):
+        change(book, rng, make_contact, step)
+        if step % 7 == 0:
+            book.save("book")
+            assert records(reload("book")) == records(book), step
+    book.save("book")
+    assert records(reload("book")) == records(book)
+
+
+def test_replace_of_a_duplicate_name_replays_at_its_position():
+    book = Contactbook(journaled=True)
+    book.save("book")
+    book.add(RecordContactbook("ann", "lee", phone="1"))
+    book.add(RecordContactbook("ann", "lee", phone="2"))
+    book.save("book")
+    book[1] = RecordContactbook("ann", "lee", phone="3")
+    book.save("book")
+    assert [item["phone"] for item in reload("book").data] == ["1", "3"]
+
+
+def test_delete_of_a_duplicate_name_replays_at_its_position():
+    book = Contactbook(journaled=True)
+    book.add(RecordContactbook("ann", "lee", phone="1"))
+    book.add(RecordContactbook("ann", "lee", phone="2"))
+    book.save("book")
+    book._remove_record(book.data[1])
+    book.save("book")
+    assert [item["phone"] for item in reload("book").data] == ["1"]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_changes_of_shared_names_replay_to_the_saved_book(seed):
+    rng = random.Random(seed)
+    book = Contactbook(journaled=True)
+    book.save("book")
+    for step in range(200):
+        names = [("ann", "lee"), ("bob", "ray"), (f"n{step}", "x")]
+        action = rng.choice(["add", "add", "edit", "replace", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordContactbook(*rng.choice(names), phone=str(step)))
+        elif action == "edit":
+            item = rng.choice(book.data)
+            book.edit(item["firstname"], item["lastname"], "note", str(step))
+        elif action == "replace":
+            book[rng.randrange(len(book.data))] = RecordContactbook(*rng.choice(names), phone=str(step))
+        else:
+            book._remove_record(rng.choice(book.data))
+        if step % 7 == 0:
+            book.save("book")
+            assert records(reload("book")) == records(book), step
+    book.save("book")
+    assert records(reload("book")) == records(book)
+
+
+def test_save_appends_to_the_journal_until_it_is_compacted(monkeypatch, workdir, make_contact):
+    monkeypatch.setattr(storage, "COMPACT_MIN_OPERATIONS", 10)
+    rng = random.Random(1)
+    book = Contactbook(journaled=True)
+    for step in range(5):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    book.save("book")
+    snapshot = (workdir / "book.bin").stat().st_mtime_ns
+    for step in range(5, 10):
+        change(book, rng, make_contact, step)
+        book.save("book")
+    assert (workdir / "book.bin").stat().st_mtime_ns == snapshot
+    assert book._journal.size == 5
+    assert records(reload("book")) == records(book)
+    for step in range(10, 30):
+        change(book, rng, make_contact, step)
+        book.save("book")
+    assert (workdir / "book.bin").stat().st_mtime_ns != snapshot
+    assert book._journal.size <= max(10, len(book.data))
+    reloaded = reload("book")
+    assert records(reloaded) == records(book)
+    assert reloaded._journal.size == book._journal.size
+
+
+def test_operation_cut_short_by_a_crash_is_dropped(workdir, make_contact):
+    rng = random.Random(2)
+    book = Contactbook(journaled=True)
+    book.save("book")
+    for step in range(3):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    book.save("book")
+    with open(workdir / "book.journal", "ab") as file:
+        file.write(b"\x80\x04\x95")
+    assert records(reload("book")) == records(book)
+
+
+def test_notebook_journal_replays_to_the_saved_notebook(make_note):
+    rng = random.Random(3)
+    book = NoteBook(journaled=True)
+    book.save("notes")
+    for step in range(100):
+        action = rng.choice(["add", "add", "edit", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordNotebook(**make_note(rng, step)))
+        elif action == "edit":
+            note = rng.choice(book.data)
+            book.edit_note(note["title"], rng.choice(["note", "tag"]), str(step))
+        else:
+            book._remove_note(rng.choice(book.data)["title"])
+        if step % 9 == 0:
+            book.save("notes")
+    book.save("notes")
+    loaded = NoteBook(journaled=True)
+    loaded.load("notes")
+    assert loaded.data == book.data
+
+
+def test_journal_is_opt_in(monkeypatch):
+    assert not main.new_contactbook().journaled
+    assert not main.new_notebook().journaled
+    monkeypatch.setattr(main, "STORAGE", "journal")
+    assert main.new_contactbook().journaled
+    assert main.new_notebook().journaled
+
+
+def test_plain_book_reads_the_journal_a_journaled_session_left(workdir, make_contact):
+    rng = random.Random(4)
+    book = Contactbook(journaled=True)
+    book.save("book")
+    for step in range(5):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    book.save("book")
+    assert book._journal.size == 5
+    plain = Contactbook()
+    plain.load("book")
+    assert records(plain) == records(book)
+    plain.add(RecordContactbook("ann", "new"))
+    plain.save("book")
+    assert records(reload("book")) == records(plain)
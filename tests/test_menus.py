@@ -0,0 +1,34 @@
+import pytest
+
+from main import BotContactbook, BotNotebook, Contactbook, NoteBook, SqliteContactbook, SqliteNoteBook
+from printing import print_contactbook_menu, print_notebook_menu
+
+
+@pytest.mark.parametrize("undoable", [True, False])
+def test_undo_entries_are_shown_only_for_books_that_can_undo(capsys, undoable):
+    print_contactbook_menu(undoable)
+    print_notebook_menu(undoable)
+    out = capsys.readouterr().out
+    assert ("18. undo last change" in out) == undoable
+    assert ("13. redo" in out) == undoable
+    assert "20. exit" in out and "17. exit" in out
+
+
+def test_sqlite_books_hide_undo_and_ignore_its_menu_numbers(capsys):
+    contactbook, notebook = SqliteContactbook(), SqliteNoteBook()
+    contactbook.load("book")
+    notebook.load("notes")
+    assert not contactbook.undoable and not notebook.undoable
+    for command in ("18", "19"):
+        BotContactbook(contactbook).handle(command)
+    for command in ("12", "13"):
+        BotNotebook(notebook).handle(command)
+    assert capsys.readouterr().out == ""
+    contactbook.connection.close()
+    notebook.connection.close()
+
+
+def test_memory_books_undo_from_the_menu(capsys):
+    assert Contactbook.undoable and NoteBook.undoable
+    BotContactbook(Contactbook()).handle("18")
+    assert "nothing to undo" in capsys.readouterr().out
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from main import Contactbook, NoteBook, RecordContactbook, RecordNotebook
+
+
+def filled(book, make_contact, count=50, seed=0):
+    rng = random.Random(seed)
+    for step in range(count):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    return book
+
+
+def records(book):
+    return [dict(item) for item in book.data]
+
+
+@pytest.mark.parametrize("journaled", [False, True])
+def test_two_sessions_keep_both_edits(make_contact, journaled):
+    filled(Contactbook(journaled=journaled), make_contact).save("book")
+    first = Contactbook(journaled=journaled)
+    first.load("book")
+    second = Contactbook(journaled=journaled)
+    second.load("book")
+    a, b = first.data[0], first.data[-1]
+    first.edit(a["firstname"], a["lastname"], "note", "from the first")
+    first.add(RecordContactbook("new", "first"))
+    second.edit(b["firstname"], b["lastname"], "phone", "0501234567")
+    second.add(RecordContactbook("new", "second"))
+    first.save("book")
+    second.save("book")
+    merged = Contactbook(journaled=journaled)
+    merged.load("book")
+    assert merged.find_contact(a["firstname"], a["lastname"])["note"] == "from the first"
+    assert merged.find_contact(b["firstname"], b["lastname"])["phone"] == "0501234567"
+    assert merged.find_contact("new", "first") is not None
+    assert merged.find_contact("new", "second") is not None
+    # the second session now holds the merged contacts, the ones new to it at the end
+    assert sorted(tuple(item.items()) for item in records(second)) == sorted(
+        tuple(item.items()) for item in records(merged)
+    )
+
+
+def test_two_notebook_sessions_keep_both_edits():
+    book = NoteBook(journaled=True)
+    for title in ("a", "b", "c"):
+        book.add(RecordNotebook(title, f"text of {title}", "tag"))
+    book.save("notes")
+    first = NoteBook(journaled=True)
+    first.load("notes")
+    second = NoteBook(journaled=True)
+    second.load("notes")
+    first.edit_note("a", "note", "first")
+    second.edit_note("c", "note", "second")
+    second._remove_note("b")
+    first.save("notes")
+    second.save("notes")
+    merged = NoteBook(journaled=True)
+    merged.load("notes")
+    assert [(note["title"], note["note"]) for note in merged.data] == [("a", "first"), ("c", "second")]
+
+
@@ -0,0 +1,48 @@
+import random
+
+from main import Contactbook, RecordContactbook
+
+
+def scan(book, firstname, lastname):
+    return next((item for item in book.data if (item["firstname"], item["lastname"]) == (firstname, lastname)), None)
+
+
+def assert_names(book, names):
+    for firstname, lastname in names:
+        assert book.find_contact(firstname, lastname) is scan(book, firstname, lastname)
+
+
+def test_name_index_follows_the_changes(make_contact, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda prompt="": "y")
+    rng = random.Random(4)
+    book = Contactbook()
+    names = set()
+    for step in range(150):
+        action = rng.choice(["add", "add", "edit", "rename", "replace", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordContactbook(**{**make_contact(rng, step), "firstname": f"n{step}"}))
+        elif action == "edit":
+            item = rng.choice(book.data)
+            book.edit(item["firstname"], item["lastname"], "phone", str(step))
+        elif action == "rename":
+            item = rng.choice(book.data)
+            book.edit(item["firstname"], item["lastname"], "firstname", f"r{step}")
+        elif action == "replace":
+            book[rng.randrange(len(book.data))] = RecordContactbook(**{**make_contact(rng, step), "firstname": f"p{step}"})
+        else:
+            item = rng.choice(book.data)
+            book.delete(item["firstname"], item["lastname"])
+        names.update((item["firstname"], item["lastname"]) for item in book.data)
+    assert_names(book, names)
+    book.save("book")
+    loaded = Contactbook()
+    loaded.load("book")
+    assert_names(loaded, names)
+
+
+def test_first_of_two_contacts_with_the_same_name_is_found():
+    book = Contactbook()
+    book.add(RecordContactbook("ann", "lee", phone="1"))
+    book.add(RecordContactbook("ann", "lee", phone="2"))
+    assert book.find_contact("ann", "lee")["phone"] == "1"
+    assert book.find_contact("ann", "ray") is None
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+import main
+from main import Contactbook, RecordContactbook
+from storage import PackedRecords, is_packed
+
+
+def filled(book, make_contact, count=50, seed=0):
+    rng = random.Random(seed)
+    for step in range(count):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    return book
+
+
+def records(book):
+    return [dict(item) for item in book.data]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_packed_file_roundtrip(make_contact, compact):
+    book = filled(Contactbook(compact=compact, packed=True), make_contact)
+    book.save("book")
+    loaded = Contactbook(compact=compact, packed=True)
+    loaded.load("book")
+    assert isinstance(loaded.data, PackedRecords)
+    assert records(loaded) == records(book)
+    for item in book.data:
+        assert loaded.find_contact(item["firstname"], item["lastname"]) == book.find_contact(
+            item["firstname"], item["lastname"]
+        )
+    assert loaded.find_contact("nobody", "here") is None
+
+
+def test_packed_book_is_decoded_on_its_first_change(make_contact):
+    book = filled(Contactbook(packed=True, journaled=True), make_contact)
+    book.save("book")
+    loaded = Contactbook(packed=True, journaled=True)
+    loaded.load("book")
+    item = book.data[3]
+    loaded.edit(item["firstname"], item["lastname"], "note", "changed")
+    book.edit(item["firstname"], item["lastname"], "note", "changed")
+    assert not isinstance(loaded.data, PackedRecords)
+    loaded.save("book")
+    again = Contactbook(packed=True, journaled=True)
+    again.load("book")
+    assert records(again) == records(book)
+
+
+def test_packed_file_is_read_by_a_plain_book(make_contact):
+    book = filled(Contactbook(packed=True), make_contact)
+    book.save("book")
+    loaded = Contactbook()
+    loaded.load("book")
+    assert records(loaded) == records(book)
+
+
+@pytest.mark.parametrize("storage, packed", [("pickle", False), ("journal", False), ("packed", True)])
+def test_packed_format_is_chosen_by_the_storage_setting(make_contact, monkeypatch, storage, packed):
+    monkeypatch.setattr(main, "STORAGE", storage)
+    book = filled(main.new_contactbook(), make_contact)
+    book.save("book")
+    assert is_packed("book.bin") == packed
@@ -0,0 +1,42 @@
+import random
+
+from main import Contactbook, RecordContactbook, SqliteContactbook
+
+
+def scan(records, number):
+    digits = "".join(char for char in number if char.isdigit())
+    result = []
+    for item in records:
+        stored = "".join(char for char in item["phone"] if char.isdigit())
+        if not stored:
+            continue
+        if len(digits) < 7:
+            found = digits in stored
+        else:
+            found = stored[-7:] == digits[-7:] and (stored.endswith(digits) or digits.endswith(stored))
+        if found:
+            result.append(item)
+    return result
+
+
+def test_find_phone_agrees_with_a_scan(make_contact):
+    rng = random.Random(0)
+    book = Contactbook()
+    for step in range(200):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    for item in book.data[:30]:
+        book.edit(item["firstname"], item["lastname"], "phone", make_contact(rng)["phone"])
+    for item in book.data[:30]:
+        for number in (item["phone"], item["phone"][-7:], item["phone"][-4:], "+38" + item["phone"][-10:]):
+            assert book.find_phone(number) == scan(book.data, number)
+
+
+def test_any_formatting_finds_the_same_contact():
+    for book in (Contactbook(), SqliteContactbook()):
+        if isinstance(book, SqliteContactbook):
+            book.load("book")
+        book.add(RecordContactbook("ann", "lee", "+38 (050) 123-45-67", "", "", "", "", ""))
+        book.add(RecordContactbook("bob", "ray", "0671112233", "", "", "", "", ""))
+        for number in ("+38 (050) 123-45-67", "0501234567", "1234567", "123-45"):
+            assert [item["firstname"] for item in book.find_phone(number)] == ["ann"]
+        assert book.find_phone("0991234567") == []
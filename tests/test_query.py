@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from main import FIELDS_CONTACT, Contactbook, RecordContactbook, SqliteContactbook
+from query import parse_query
+
+QUERIES = [
+    "status = work",
+    "status = work AND email $= @corp.com",
+    "email $= @Corp.com OR phone $= 1234567",
+    "firstname = ann AND NOT status = family",
+    "firstname ^= b OR lastname ~ ee",
+    "birthday in march OR birthday in 20.12..10.01",
+    "birthday < 01.01.1980 AND address ~ street",
+    "note ~ milk AND (status = friend OR status = work)",
+]
+
+
+def scan(records, text):
+    node = parse_query(text, FIELDS_CONTACT)
+    return [dict(item) for item in records if node.matches(item)]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def book(request, make_contact):
+    if request.param == "memory":
+        book = Contactbook()
+    else:
+        book = SqliteContactbook()
+        book.load("book")
+    rng = random.Random(0)
+    for step in range(200):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    yield book
+    if request.param == "sqlite":
+        book.connection.close()
+
+
+@pytest.mark.parametrize("text", QUERIES)
+def test_query_agrees_with_a_scan(book, text):
+    assert [dict(item) for item in book.query(text).records] == scan(list(book), text)
+
+
+@pytest.mark.parametrize("text", ["status =", "firstname ~ a AND", "colour = red", "phone in march", "(status = work"])
+def test_malformed_query_is_refused(book, text):
+    with pytest.raises(ValueError):
+        book.query(text)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def mixed_case_book(request):
+    if request.param == "memory":
+        book = Contactbook()
+    else:
+        book = SqliteContactbook()
+        book.load("book")
+    book.add(RecordContactbook("ann", "lee", email="a@Corp.com", status="work"))
+    book.add(RecordContactbook("bob", "ray", email="b@corp.com", status="work"))
+    book.add(RecordContactbook("cid", "fox", email="c@mail.org", status="work"))
+    book.add(RecordContactbook("dan", "day", email="D@CORP.COM", status="family"))
+    yield book
+    if request.param == "sqlite":
+        book.connection.close()
+
+
+def names(records):
+    return [record["firstname"] for record in records]
+
+
+def test_email_domain_ignores_case_like_the_statistics(mixed_case_book):
+    book = mixed_case_book
+    assert book.statistics(status="work")["domain"]["corp.com"] == 2
+    assert names(book.query("status = work AND email $= @corp.com").records) == ["ann", "bob"]
+    assert names(book.query("email $= @CORP.com").records) == ["ann", "bob", "dan"]
+    assert names(book.facet_contacts(domain="Corp.com")) == ["ann", "bob", "dan"]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("email = a@corp.com", ["ann"]),
+        ("email ^= D@", ["dan"]),
+        ("email ~ CORP", ["ann", "bob", "dan"]),
+        ("NOT email ~ corp", ["cid"]),
+        ("firstname = Ann", []),
+    ],
+)
+def test_only_emails_are_compared_in_lower_case(mixed_case_book, text, expected):
+    assert names(mixed_case_book.query(text).records) == expected
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from main import Contactbook, RecordContactbook
+
+PATTERNS = [
+    ("firstname", "an"),
+    ("firstname", "ann"),
+    ("lastname", "smi"),
+    ("lastname", "x"),
+    ("address", "street 1"),
+    ("email", "corp.com"),
+    ("note", "milk"),
+    ("note", "zzz"),
+]
+
+
+def scan(book, parameter, pattern):
+    return [item for item in book.data if pattern in item[parameter]]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_find_info_agrees_with_a_scan(make_contact, monkeypatch, seed):
+    monkeypatch.setattr("builtins.input", lambda prompt="": "y")
+    rng = random.Random(seed)
+    book = Contactbook()
+    for step in range(150):
+        action = rng.choice(["add", "add", "edit", "replace", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordContactbook(**make_contact(rng, step)))
+        elif action == "edit":
+            item = rng.choice(book.data)
+            parameter = rng.choice(["firstname", "address", "note"])
+            book.edit(item["firstname"], item["lastname"], parameter, make_contact(rng, step)[parameter])
+        elif action == "replace":
+            book[rng.randrange(len(book.data))] = RecordContactbook(**make_contact(rng, step))
+        else:
+            item = rng.choice(book.data)
+            book.delete(item["firstname"], item["lastname"])
+    for parameter, pattern in PATTERNS:
+        assert book.find_info(parameter, pattern) == scan(book, parameter, pattern)
+    book.save("book")
+    loaded = Contactbook()
+    loaded.load("book")
+    for parameter, pattern in PATTERNS:
+        assert loaded.find_info(parameter, pattern) == scan(loaded, parameter, pattern)
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from main import BotServer
+from server import JsonServer, Route
+
+
+@pytest.fixture
+def request_json():
+    bot = BotServer("book", "notes")
+    server = JsonServer(bot.routes, [])
+
+    def send(method, target, body=None):
+        data = b"" if body is None else json.dumps(body).encode()
+        return asyncio.run(server.dispatch(method, target, data))
+
+    send.bot = bot
+    return send
+
+
+def test_contacts_are_renamed_and_deleted_through_the_book(request_json):
+    assert request_json("POST", "/contacts", {"firstname": "ann", "lastname": "lee"})[0] == 201
+    assert request_json("POST", "/contacts", {"firstname": "bob", "lastname": "lee"})[0] == 201
+    status, answer = request_json("PATCH", "/contacts/bob/lee", {"firstname": "ann"})
+    assert (status, answer) == (409, {"error": "contact 'ann lee' already exists"})
+    status, answer = request_json("PATCH", "/contacts/bob/lee", {"firstname": "cid", "phone": "0501234567"})
+    assert status == 200
+    assert (answer["firstname"], answer["phone"]) == ("cid", "0501234567")
+    assert request_json("DELETE", "/contacts/cid/lee")[0] == 200
+    assert request_json("DELETE", "/contacts/cid/lee")[0] == 404
+    assert list(request_json.bot.contactbook.sorted_names()) == ["ann lee"]
+    # the changes went through the history like any other
+    assert request_json.bot.contactbook.undo() == "delete 'cid lee'"
+
+
+def test_notes_are_renamed_and_deleted_through_the_book(request_json):
+    request_json("POST", "/notes", {"title": "a", "note": "x"})
+    request_json("POST", "/notes", {"title": "b", "note": "y"})
+    assert request_json("PATCH", "/notes/b", {"title": "a"})[0] == 409
+    status, answer = request_json("PATCH", "/notes/b", {"title": "c", "tag": "work"})
+    assert (status, answer) == (200, {"title": "c", "note": "y", "tag": "work"})
+    assert request_json("DELETE", "/notes/c") == (200, {"title": "c", "note": "y", "tag": "work"})
+    assert request_json("DELETE", "/notes/c")[0] == 404
+
+
+def test_reads_run_together_and_a_change_waits_for_them():
+    both_reading = threading.Barrier(2, timeout=5)
+    events = []
+
+    def read(params, query, body):
+        both_reading.wait()
+        events.append("read")
+        return {}
+
+    def write(params, query, body):
+        events.append("write")
+        return {}
+
+    server = JsonServer([Route("GET", "/read", read), Route("POST", "/write", write, writes=True)], [])
+
+    async def run():
+        return await asyncio.gather(
+            server.dispatch("GET", "/read", b""),
+            server.dispatch("GET", "/read", b""),
+            server.dispatch("POST", "/write", b""),
+        )
+
+    # each read waits for the other one, so they only finish if they run at the same time
+    assert [status for status, _ in asyncio.run(run())] == [200, 200, 200]
+    assert events == ["read", "read", "write"]
+
+
+def test_book_pages_follow_the_order_and_offset(request_json):
+    for firstname, lastname in (("ann", "lee"), ("bob", "ash"), ("cid", "kim"), ("dan", "bay")):
+        request_json("POST", "/contacts", {"firstname": firstname, "lastname": lastname})
+    status, answer = request_json("GET", "/contacts?order=lastname&offset=1&limit=2")
+    assert status == 200
+    assert answer["count"] == 4
+    assert [item["lastname"] for item in answer["items"]] == ["bay", "kim"]
+    status, answer = request_json("GET", "/contacts?offset=3")
+    assert [item["firstname"] for item in answer["items"]] == ["dan"]
+    assert request_json("GET", "/contacts?offset=9")[1] == {"count": 4, "items": []}
+    assert request_json("GET", "/contacts?order=height")[0] == 400
+    request_json("POST", "/notes", {"title": "b", "note": "x"})
+    request_json("POST", "/notes", {"title": "a", "note": "y"})
+    assert [item["title"] for item in request_json("GET", "/notes?order=title")[1]["items"]] == ["a", "b"]
@@ -0,0 +1,112 @@
+import glob
+import os
+import random
+
+import pytest
+
+import shards
+from main import RecordContactbook, ShardedContactbook
+
+
+def filled(book, make_contact, count=50, seed=0):
+    rng = random.Random(seed)
+    for step in range(count):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    return book
+
+
+def records(book):
+    return [dict(item) for item in book.data]
+
+
+def test_sharded_roundtrip_rewrites_only_changed_shards(make_contact, workdir):
+    book = filled(ShardedContactbook(), make_contact, count=80)
+    book.save("book")
+    _, before = shards.read_manifest("book")
+    times = {path: os.stat(path).st_mtime_ns for path in before}
+    item = book.data[10]
+    book.edit(item["firstname"], item["lastname"], "note", "changed")
+    book.save("book")
+    _, after = shards.read_manifest("book")
+    changed = [path for path in after if path not in times]
+    assert len(changed) == 1
+    assert all(os.stat(path).st_mtime_ns == times[path] for path in after if path in times)
+    # the file the changed shard replaced is gone
+    assert sorted(str(path) for path in workdir.glob("book.*.shard")) == sorted(str(workdir / path) for path in after)
+    loaded = ShardedContactbook()
+    loaded.load("book")
+    assert records(loaded) == records(book)
+
+
+def test_shards_read_by_worker_processes_keep_the_book_order(make_contact, monkeypatch):
+    book = filled(ShardedContactbook(shard_count=4), make_contact, count=80)
+    book._remove_record(book.data[3])
+    book.save("book")
+    monkeypatch.setattr(shards, "POOL_MIN_SIZE", 0)
+    monkeypatch.setattr(shards.os, "cpu_count", lambda: 4)
+    loaded = ShardedContactbook(shard_count=4)
+    loaded.load("book")
+    assert records(loaded) == records(book)
+
+
+def test_shards_are_read_in_process_when_the_pool_cannot_start(make_contact, monkeypatch):
+    book = filled(ShardedContactbook(shard_count=4), make_contact, count=40)
+    book.save("book")
+
+    def broken_pool(workers):
+        raise OSError("cannot start worker processes")
+
+    monkeypatch.setattr(shards, "POOL_MIN_SIZE", 0)
+    monkeypatch.setattr(shards.os, "cpu_count", lambda: 4)
+    monkeypatch.setattr(shards, "ProcessPoolExecutor", broken_pool)
+    loaded = ShardedContactbook(shard_count=4)
+    loaded.load("book")
+    assert records(loaded) == records(book)
+
+
+def test_save_crashing_between_shards_leaves_the_previous_save(make_contact, monkeypatch):
+    book = filled(ShardedContactbook(shard_count=4), make_contact, count=40)
+    book.save("book")
+    saved = records(book)
+    for item in list(book.data):
+        book.edit(item["firstname"], item["lastname"], "note", "changed")
+    written = []
+    write_shard = shards.write_shard
+
+    def crash_after_one(path, rids, items, fields):
+        if written:
+            raise OSError("disk full")
+        written.append(path)
+        write_shard(path, rids, items, fields)
+
+    monkeypatch.setattr(shards, "write_shard", crash_after_one)
+    with pytest.raises(OSError):
+        book.save("book")
+    loaded = ShardedContactbook(shard_count=4)
+    loaded.load("book")
+    assert records(loaded) == saved
+    monkeypatch.setattr(shards, "write_shard", write_shard)
+    book._rewrite = True
+    book.save("book")
+    loaded.load("book")
+    assert records(loaded) == records(book)
+    # the shard left by the crashed save was overwritten or deleted
+    assert len(list(shards.read_manifest("book")[1])) == len(glob.glob("book.*.shard"))
+
+
+def test_shards_of_a_count_only_manifest_are_read(make_contact):
+    book = filled(ShardedContactbook(shard_count=4), make_contact, count=40)
+    book.save("book")
+    _, paths = shards.read_manifest("book")
+    for index, path in enumerate(paths):
+        os.replace(path, shards.shard_path("book", index))
+    with open("book.shards", "w", encoding="utf-8") as file:
+        file.write("4")
+    loaded = ShardedContactbook()
+    loaded.load("book")
+    assert records(loaded) == records(book)
+    loaded.edit(book.data[0]["firstname"], book.data[0]["lastname"], "note", "changed")
+    loaded.save("book")
+    reloaded = ShardedContactbook()
+    reloaded.load("book")
+    assert records(reloaded) == records(loaded)
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from main import Contactbook, NoteBook, RecordContactbook, RecordNotebook
+
+
+def scan_names(book, prefix):
+    keys = sorted((item["firstname"], item["lastname"], position) for position, item in enumerate(book.data))
+    return [f"{firstname} {lastname}" for firstname, lastname, _ in keys if firstname.startswith(prefix)]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sorted_names_agree_with_a_sort(make_contact, seed):
+    rng = random.Random(seed)
+    book = Contactbook()
+    for step in range(150):
+        action = rng.choice(["add", "add", "rename", "replace", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordContactbook(**make_contact(rng, step)))
+        elif action == "rename":
+            item = rng.choice(book.data)
+            book.edit(item["firstname"], item["lastname"], "firstname", make_contact(rng, step)["firstname"])
+        elif action == "replace":
+            book[rng.randrange(len(book.data))] = RecordContactbook(**make_contact(rng, step))
+        else:
+            book._remove_record(rng.choice(book.data))
+    for prefix in ("", "a", "bo", "zz"):
+        assert list(book.sorted_names(prefix)) == scan_names(book, prefix)
+
+
+def test_sorted_names_of_an_unchanged_packed_book(make_contact):
+    rng = random.Random(1)
+    book = Contactbook(packed=True)
+    for step in range(40):
+        book.add(RecordContactbook(**make_contact(rng, step)))
+    book.save("book")
+    loaded = Contactbook(packed=True)
+    loaded.load("book")
+    assert list(loaded.sorted_names("b")) == scan_names(book, "b")
+
+
+def test_sorted_titles_agree_with_a_sort(make_note):
+    rng = random.Random(2)
+    book = NoteBook()
+    for step in range(100):
+        action = rng.choice(["add", "add", "rename", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordNotebook(**make_note(rng, step)))
+        elif action == "rename":
+            book.edit_note(rng.choice(book.data)["title"], "title", make_note(rng, step)["title"])
+        else:
+            book._remove_note(rng.choice(book.data)["title"])
+    for prefix in ("", "title 1", "x"):
+        assert list(book.sorted_titles(prefix)) == sorted(
+            note["title"] for note in book.data if note["title"].startswith(prefix)
+        )
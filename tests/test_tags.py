@@ -0,0 +1,70 @@
+import random
+from collections import Counter
+
+import pytest
+
+from indexes import parse_tags
+from main import NoteBook, RecordNotebook, SqliteNoteBook
+from validation import NOTE_VALIDATOR
+
+CASES = [{"all_of": ["work"]}, {"all_of": ["work", "python"]}, {"any_of": ["home", "urgent"]},
+         {"all_of": ["later"], "none_of": ["misc"]}, {"none_of": ["work", "home"]}, {"all_of": ["missing"]}]
+
+
+def scan(notes, all_of=(), any_of=(), none_of=()):
+    result = []
+    for note in notes:
+        tags = parse_tags(note["tag"])
+        if set(all_of) <= tags and (not any_of or tags & set(any_of)) and not tags & set(none_of):
+            result.append(dict(note))
+    return result
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def book(request, make_note):
+    if request.param == "memory":
+        book = NoteBook()
+    else:
+        book = SqliteNoteBook()
+        book.load("notes")
+    rng = random.Random(0)
+    for step in range(150):
+        book.add(RecordNotebook(**make_note(rng, step)))
+    for note in list(book)[:30]:
+        book.edit_note(note["title"], "tag", make_note(rng, step)["tag"])
+    yield book
+    if request.param == "sqlite":
+        book.connection.close()
+
+
+def test_tag_queries_agree_with_a_scan(book):
+    notes = list(book)
+    for case in CASES:
+        assert [dict(note) for note in book.find_notes_by_tags(**case)] == scan(notes, **case)
+    assert book.tag_cloud() == dict(Counter(tag for note in notes for tag in parse_tags(note["tag"])))
+
+
+def test_tags_are_split_and_compared_in_lower_case():
+    assert parse_tags("Work, #python;later  misc") == {"work", "python", "later", "misc"}
+    assert parse_tags(" , #") == set()
+
+
+@pytest.mark.parametrize(
+    "value, correct",
+    [
+        ("", True),
+        ("work", True),
+        ("#work, python; later misc", True),
+        ("#Work #Python", True),
+        ("a-very-long-tag_1234", True),
+        ("one two three four five six seven eight nine ten", True),
+        ("a-very-long-tag_12345", False),
+        ("work, #", False),
+        ("wo@rk", False),
+        (" , ;", False),
+    ],
+)
+def test_tag_field_is_checked_tag_by_tag(value, correct):
+    assert NOTE_VALIDATOR.check("tag", value) == correct
+    if correct:
+        assert all(len(tag) <= 20 for tag in parse_tags(value))
@@ -0,0 +1,61 @@
+import random
+from collections import Counter
+from math import log
+
+import pytest
+
+from indexes import TextIndex
+from main import NoteBook, RecordNotebook
+
+
+def scan_scores(notes, text, k1=1.2, b=0.75):
+    index = TextIndex(["title", "note"])
+    words, phrases = index.parse(text)
+    counts = [Counter(index.words(note["title"]) + index.words(note["note"])) for note in notes]
+    lengths = [sum(count.values()) for count in counts]
+    total = sum(lengths)
+    if not words or not total:
+        return {}
+    average = total / len(notes)
+    scores = {}
+    for position, (note, count) in enumerate(zip(notes, counts)):
+        if not all(index._has_phrase(note, phrase) for phrase in phrases):
+            continue
+        score = 0.0
+        for word in words:
+            if count[word]:
+                found = sum(1 for other in counts if other[word])
+                weight = log(1 + (len(notes) - found + 0.5) / (found + 0.5)) * (k1 + 1)
+                score += weight * count[word] / (count[word] + k1 * (1 - b + b * lengths[position] / average))
+        if score:
+            scores[position] = score
+    return scores
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_search_notes_agrees_with_a_scan(make_note, seed):
+    rng = random.Random(seed)
+    book = NoteBook()
+    for step in range(150):
+        action = rng.choice(["add", "add", "edit", "delete"])
+        if action == "add" or not book.data:
+            book.add(RecordNotebook(**make_note(rng, step)))
+        elif action == "edit":
+            note = rng.choice(book.data)
+            book.edit_note(note["title"], "note", make_note(rng, step)["note"])
+        else:
+            book._remove_note(rng.choice(book.data)["title"])
+    for text in ("milk", "fresh bread", '"fresh bread"', "the a of", "python meeting call", "nothing"):
+        scores = scan_scores(book.data, text)
+        found = book.search_notes(text, limit=5)
+        assert [round(score, 9) for score, _ in found] == sorted((round(score, 9) for score in scores.values()), reverse=True)[:5]
+        for score, note in found:
+            assert scores[book.data.index(note)] == pytest.approx(score)
+
+
+def test_search_of_notes_without_words_finds_nothing():
+    book = NoteBook()
+    book.add(RecordNotebook("", "...", "work"))
+    book.add(RecordNotebook("!?", "", ""))
+    assert book.search_notes("milk") == []
+    assert book.search_notes('"fresh bread"') == []